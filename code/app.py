@@ -1,135 +1,88 @@
-from dash import Dash, Input, Output, State, html
+from dash import ALL, MATCH, ClientsideFunction, Dash, Input, Output, State, ctx, dcc, html, no_update
 import dash_bootstrap_components as dbc
 
 from layout import layout
-from recipes import sample_recipes, days, meal_times
-from helpers import create_recipe_widget, rescale_day, normalize_mealplan
-
-import os
+from recipes import sample_recipes, meal_times
+from recipes import days as WEEK_DAYS
+from helpers import ORDER_TYPE, STAR_TYPE, STEPS_TOGGLE_TYPE, STEPS_TYPE, recipe_widget_payload
+from plan_cache import PlanCache
+from plan_store import PlanStore
+from profiles import canonical_profile, profile_key
+from nutrition import estimate_calories
+from plan_templates import lookup_template, rescale_plan, store_template
+from similarity_cache import SimilarityCache
+from singleflight import SingleFlight
+from prompts import build_mealplan_messages, build_recipe_messages
+from compact import COMPACT_PLAN_RESPONSE_FORMAT, PLAN_KEY, expand_day, expand_plan
+from streaming import DayStreamParser
+from fanout import build_summary, fanout_mealplan
+from jobs import JobQueue
+from plan_model import Day, PlanModel, PlanValidationError
+from plan_schema import PLAN_RESPONSE_FORMAT, loads, repair_days, validate_day, validate_plan
+from grocery import build_grocery_list
+from catalog import RecipeCatalog
+from restrictions import scan_days, scan_plan, violations_by_meal
+from nutrition_db import annotate_grocery_list, open_default, verify_calories
+from rescale import rescale_mealplan
+import dispatch
+import llm
+import settings
+
+import asyncio
 import json
+import hashlib
 import re
-import openai
+import flask
 
-# -------------------- OPENAI SETUP --------------------
+app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
+app.title = "CULINAIRE 🥗"
+app.layout = layout
+server = app.server
 
+# -------------------- PLAN CACHE --------------------
 
-openai.api_key = ""
+plan_cache = PlanCache(
+    max_entries=settings.PLAN_CACHE_SIZE,
+    ttl=settings.PLAN_CACHE_TTL,
+    disk_dir=settings.PLAN_CACHE_DIR,
+    disk_max_entries=settings.PLAN_CACHE_DISK_SIZE,
+)
 
-SYSTEM_PROMPT = """
-You are CULINAIRE, an AI meal-planning engine.  
-Your ONLY task is to generate structured meal-plan JSON.  
-Your output MUST be **valid JSON**, with **no Markdown**, **no comments**, **no explanations**, **no trailing commas**, **no text outside the JSON object**.
-
-If you cannot follow the format, output an empty JSON object: {}.
-
--------------------------
-### OUTPUT FORMAT (STRICT)
--------------------------
-
-Your response MUST be a single JSON object with EXACTLY these top-level keys:
-
-1. "meal_plan"
-2. "grocery_list"
-3. "summary"
-
-Nothing else.
-
-=========================
-1) "meal_plan" RULES
-=========================
-
-"meal_plan" MUST be **one of the following structures**:
-
-### OPTION A — Dict form
-{
-  "Monday": { "breakfast": {...}, "lunch": {...}, "dinner": {...} },
-  "Tuesday": { ... },
-  ...
-}
-
-### OPTION B — List form
-[
-  {
-    "day": "Monday",
-    "meals": { "breakfast": {...}, "lunch": {...}, "dinner": {...} }
-  },
-  ...
-]
-
-You may choose either structure, but it must be valid and consistent.
-
-Each meal object MUST contain the following keys:
-
-- "meal": short meal name (string)
-- "ingredients": dict (ingredient → quantity)
-    Example:
-    {
-      "Rolled oats": "50 g",
-      "Banana": "1 unit",
-      "Milk": "200 ml"
-    }
-- "calories": integer or float  
-- "recipe": 2–4 concise sentences describing steps
-
-Rules:
-- EXACTLY 7 days.
-- Each day MUST have breakfast, lunch, and dinner.
-- Total calories per day MUST be within ±5% of the target the user gives.
-- Names must be human-friendly and non-repetitive across days.
-
-=============================
-2) "grocery_list" RULES
-=============================
-
-"grocery_list" MUST be a list of objects, each with:
-
-- "item": ingredient name (string)
-- "quantity": aggregated quantity string (e.g., "450 g", "6 units", "1.2 L")
-- "category": one of:
-  "Produce", "Fruit", "Vegetables", "Dairy", "Bakery", "Protein",
-  "Grains", "Canned", "Frozen", "Condiments", "Beverages",
-  "Snacks", "Spices", "Other"
-
-Rules:
-- Combine identical ingredients from all meals (sum their quantities).
-- Use the most common unit (g, ml, units, tbsp, tsp).
-- Quantities MUST be numeric + unit (never just a number).
-
-===========================
-3) "summary" RULES
-===========================
-
-"summary" MUST contain:
-
-{
-  "average_daily_calories": number,
-  "estimated_weekly_cost": string,  // e.g., "CHF 72"
-  "nutrition_focus": string         // e.g., "High protein, high fiber"
-}
-
-Rules:
-- average_daily_calories MUST match computed plan average.
-- estimated_weekly_cost MUST be realistic for Switzerland.
-- nutrition_focus MUST be concise (5–12 words max).
-
--------------------------
-### GLOBAL RULES
--------------------------
-
-- Output ONLY the JSON object.
-- No markdown formatting.
-- No backticks.
-- No natural language outside JSON.
-- No trailing commas.
-- No placeholders. Use real values.
-- Be deterministic, consistent, and concise.
+recipe_catalog = RecipeCatalog.load(settings.CATALOG_PATH)
+nutrition_table = open_default(settings.NUTRITION_DB)
 
-"""
+plan_jobs = JobQueue(settings.JOB_DB_PATH, stale_after=settings.JOB_STALE_AFTER)
+inflight = SingleFlight(settings.SINGLEFLIGHT_DIR)
+plan_store = PlanStore(settings.PLAN_STORE_PATH)
+similar_plans = SimilarityCache(
+    capacity=settings.SIMILAR_PLAN_INDEX_SIZE,
+    max_distance=settings.SIMILAR_PLAN_MAX_DISTANCE,
+)
 
 
-app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
-app.title = "CULINAIRE 🥗"
-app.layout = layout
+@server.route("/stats/cache")
+def cache_stats():
+    return flask.jsonify({**plan_cache.stats(), "similar": similar_plans.stats()})
+
+
+@server.route("/stats/jobs")
+def job_stats():
+    return flask.jsonify({**plan_jobs.counts(), "singleflight": inflight.stats()})
+
+
+@server.route("/stats/plans")
+def plan_store_stats():
+    return flask.jsonify(plan_store.stats())
+
+
+@server.route("/stats/latency")
+def latency_stats():
+    return flask.jsonify(dispatch.stats())
+
+
+@server.route("/stats/tokens")
+def token_stats():
+    return flask.jsonify(llm.token_usage.snapshot())
 
 # -------------------- GOOGLE ANALYTICS --------------------
 
@@ -190,192 +143,457 @@ def call_openai_mealplan(
     location,
 ):
     """Call OpenAI and return (plan_dict, target_calories, raw_text)."""
-    if not daily_calories or daily_calories <= 0:
-        daily_calories = 2000
+    messages, daily_calories = build_mealplan_messages(
+        body_weight,
+        activity,
+        goals,
+        budget,
+        daily_calories,
+        restrictions,
+        diet_type,
+        location,
+    )
+
+    raw = llm.complete(messages, temperature=0.5, label="plan")
+    plan = attach_grocery_list(parse_plan_text(raw))
+    return plan, daily_calories, raw
+
 
-    goals_str = ", ".join(goals or []) if isinstance(goals, list) else ""
+def parse_plan_text(raw):
+    # Try to extract pure JSON (defensive)
+    match = re.search(r"\{.*\}", raw, re.DOTALL)
+    raw_json = match.group(0) if match else raw
+    return loads(raw_json)
 
-    user_prompt = f"""
-Create a 7-day meal plan with breakfast, lunch, and dinner for each day.
 
-User profile:
-- Body weight: {body_weight or "unknown"} kg
-- Activity level: {activity or "unknown"}
-- Goals: {goals_str or "general health"}
-- Diet type: {diet_type or "Omnivore"}
-- Restrictions / allergies: {restrictions or "None"}
-- Target calories per day: {daily_calories} kcal
-- Weekly budget: {budget} CHF
-- Location: {location or "not specified"}
+def attach_grocery_list(plan):
+    """Fill grocery_list from the plan's ingredients (the model no longer writes it)."""
+    if isinstance(plan, dict) and plan.get("meal_plan") is not None:
+        plan["grocery_list"] = annotate_grocery_list(
+            build_grocery_list(plan["meal_plan"]), nutrition_table
+        )
+    return plan
+
+
+def stream_openai_mealplan(messages, **kwargs):
+    """Open a streamed completion; an async iterator of its text chunks."""
+    return llm.astream(messages, temperature=0.5, label="plan", **kwargs)
+
+
+async def generate_single_plan(progress, messages, engine_args):
+    """One completion for the week (streamed if configured), validated and repaired per day."""
+    compact = settings.COMPACT_PLANS
+    extra = {}
+    if settings.STRUCTURED_OUTPUT:
+        extra["response_format"] = COMPACT_PLAN_RESPONSE_FORMAT if compact else PLAN_RESPONSE_FORMAT
+    parse_error = None
+
+    if settings.STREAM_PLANS:
+        parser = DayStreamParser(PLAN_KEY if compact else "meal_plan")
+        streamed = {}
+        try:
+            async for chunk in stream_openai_mealplan(messages, **extra):
+                for day_name, meals in parser.feed(chunk):
+                    if compact:
+                        day_name, meals = expand_day(day_name, meals)
+                    progress.add_day(day_name, meals)
+                    streamed[day_name] = meals
+        finally:
+            progress.raw = parser.text
+        try:
+            plan = parser.result()
+        except json.JSONDecodeError as e:
+            # The days that arrived intact are kept; only the rest is repaired.
+            plan, parse_error = {"meal_plan": streamed}, e
+    else:
+        progress.raw = await llm.acomplete(
+            messages, temperature=0.5, label="plan", deadline=settings.PLAN_DEADLINE, **extra
+        )
+        try:
+            plan = parse_plan_text(progress.raw)
+        except json.JSONDecodeError as e:
+            plan, parse_error = {"meal_plan": {}}, e
+
+    if compact:
+        plan = expand_plan(plan)
+    plan, invalid_days = validate_plan(plan)
+    if invalid_days:
+        if len(invalid_days) > settings.REPAIR_MAX_DAYS:
+            raise parse_error or PlanValidationError(
+                f"{len(invalid_days)} days of the plan are missing or invalid."
+            )
+        plan = await repair_days(plan, invalid_days, engine_args)
+    if not plan["summary"]:
+        plan["summary"] = build_summary(plan["meal_plan"], engine_args[3], engine_args[2])
+    return plan
+
+
+async def enforce_restrictions(plan, engine_args):
+    """Regenerate the days whose ingredients break the user's restrictions.
+
+    Days that still violate them after one repair (or when too many days do)
+    are kept and flagged when rendered.
+    """
+    violations = scan_plan(plan["meal_plan"], engine_args[5])
+    bad_days = [d for d in WEEK_DAYS if any(v.day == d for v in violations)]
+    if not bad_days or len(bad_days) > settings.REPAIR_MAX_DAYS:
+        return plan
+    try:
+        return await repair_days(plan, bad_days, engine_args)
+    except Exception:
+        return plan
 
-Make meals realistic, structured, and consistent across days. Vary proteins and vegetables.
-"""
 
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0.5,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-    )
+class DayRecorder:
+    """Progress handle that also keeps the days published, for the deadline fallback."""
 
-    raw = response.choices[0].message.content.strip()
+    def __init__(self, progress):
+        self.progress = progress
+        self.days = {}
 
-    # Try to extract pure JSON (defensive)
-    match = re.search(r"\{.*\}", raw, re.DOTALL)
-    raw_json = match.group(0) if match else raw
+    @property
+    def raw(self):
+        return self.progress.raw
 
-    plan = json.loads(raw_json)
-    return plan, daily_calories, raw
+    @raw.setter
+    def raw(self, value):
+        self.progress.raw = value
 
+    def add_day(self, day_name, meals):
+        self.days[day_name] = meals
+        self.progress.add_day(day_name, meals)
 
-def render_mealplan(plan_dict, target_calories):
-    """Render the JSON meal plan in a nice HTML structure (defensive)."""
-    blocks = []
 
-    meal_plan = plan_dict.get("meal_plan")
-    grocery_list = plan_dict.get("grocery_list", [])
-    summary = plan_dict.get("summary", {})
+async def generate_plan(progress, messages, engine_args):
+    """Generate a plan with the configured engine, repairing the days breaking the restrictions."""
+    if settings.PLAN_ENGINE == "fanout":
+        plan = await fanout_mealplan(
+            *engine_args,
+            concurrency=settings.FANOUT_CONCURRENCY,
+            on_day=progress.add_day,
+            compact=settings.COMPACT_PLANS,
+        )
+    else:
+        plan = await generate_single_plan(progress, messages, engine_args)
+    return await enforce_restrictions(plan, engine_args)
+
+
+async def run_generation(progress, messages, engine_args):
+    """Job runner: generate a plan with the configured engine, publishing days as they arrive.
+
+    Past settings.PLAN_DEADLINE, the plan is completed from the recipe catalog
+    when it covers the profile.
+    """
+    recorder = DayRecorder(progress)
+    try:
+        plan = await asyncio.wait_for(
+            generate_plan(recorder, messages, engine_args), settings.PLAN_DEADLINE or None
+        )
+    except asyncio.TimeoutError:
+        received = {d: validate_day(meals) for d, meals in recorder.days.items()}
+        plan = catalog_mealplan(
+            *engine_args, days={d: meals for d, meals in received.items() if meals is not None}
+        )
+        if plan is None:
+            raise
+        return plan
+
+    if settings.VERIFY_CALORIES:
+        plan["meal_plan"], corrected = verify_calories(
+            plan["meal_plan"], nutrition_table, settings.CALORIE_TOLERANCE
+        )
+        if corrected:
+            # Portions of the corrected days are rescaled to meet the target again.
+            plan["meal_plan"].update(
+                rescale_mealplan({d: plan["meal_plan"][d] for d in corrected}, engine_args[4])
+            )
+    return attach_grocery_list(plan)
+
 
+def catalog_mealplan(
+    body_weight, activity, goals, budget, target, restrictions, diet_type, location, days=None
+):
+    """Assemble a plan_dict from the local recipe catalog, or None if it cannot.
+
+    days (valid days already received from the model) are kept; the catalog fills the rest.
+    """
+    meal_plan = recipe_catalog.plan_week(
+        target,
+        diet_type,
+        restrictions,
+        settings.TEMPLATE_MIN_SCALE,
+        settings.TEMPLATE_MAX_SCALE,
+        settings.CATALOG_MAX_USES,
+        days,
+    )
     if meal_plan is None:
-        return html.Div(
-            "Model response does not contain 'meal_plan'.",
-            style={"color": "red"},
+        return None
+    return attach_grocery_list(
+        {"meal_plan": meal_plan, "summary": build_summary(meal_plan, budget, goals)}
+    )
+
+
+def fetch_recipe(meal):
+    """Steps of a stored meal without a recipe: one short completion, cached by meal."""
+    ingredients = meal.get("ingredients") or {}
+    digest = hashlib.sha256(
+        json.dumps([meal.get("meal"), ingredients], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    key = f"recipe:{digest}"
+
+    def lookup():
+        # The plan store is shared by the workers of the node, the cache may not be.
+        recipe = plan_cache.get(key)
+        if recipe is None:
+            recipe = plan_store.get_text(key)
+            if recipe is not None:
+                plan_cache.set(key, recipe)
+        return recipe
+
+    def generate():
+        recipe = llm.complete(
+            build_recipe_messages(meal.get("meal"), ingredients), temperature=0.5, label="recipe"
         )
+        plan_store.put_text(key, recipe)
+        plan_cache.set(key, recipe)
+        return recipe
 
-    # Normalize into list of (day_name, day_meals_dict)
-    normalized = {}
-    if isinstance(meal_plan, dict):
-        # {"Monday": {...}, "Tuesday": {...}}
-        for day_name, day_obj in meal_plan.items():
-            if isinstance(day_obj, dict):
-                meals = day_obj.get("meals", day_obj)
-                normalized[day_name] = meals
-    elif isinstance(meal_plan, list):
-        # [{"day": "Monday", "meals": {...}}, ...]
-        for i, day_obj in enumerate(meal_plan):
-            if not isinstance(day_obj, dict):
-                continue
-            day_name = day_obj.get("day", f"Day {i+1}")
-            meals = day_obj.get("meals", day_obj)
-            normalized[day_name] = meals
-    else:
-        return html.Div(
-            "Unexpected 'meal_plan' structure.",
-            style={"color": "red"},
+    recipe = lookup()
+    if recipe is None:
+        # Users opening the same meal at once, in any worker, share one completion.
+        recipe = inflight.do(key, generate, lookup)
+    return recipe
+
+
+MEAL_RECIPE_BUTTON_TYPE = "meal-recipe-button"
+MEAL_RECIPE_TYPE = "meal-recipe"
+
+
+def render_day(day, target_calories, violations=None, plan_id=None):
+    """Return the components for one plan_model.Day.
+
+    violations: {(day_name, slot): [restrictions.Violation]} to flag on its meals.
+    Meals without a recipe (compact mode) get a button fetching it, once the
+    plan is stored under plan_id.
+    """
+    blocks = [
+        html.H4(
+            f"{day.name} (target: {target_calories} kcal/day)",
+            style={"marginTop": "20px"},
         )
+    ]
 
-    blocks.append(html.H3("Your Weekly Meal Plan 🍲"))
+    if not day.valid:
+        blocks.append(html.P("Invalid meals structure for this day."))
+        return blocks
 
-    for day_name, meals in normalized.items():
+    for meal in day.meals:
+        calories = "?" if meal.calories is None else meal.calories
         blocks.append(
-            html.H4(
-                f"{day_name} (target: {target_calories} kcal/day)",
-                style={"marginTop": "20px"},
+            html.H5(
+                f"{meal.slot.capitalize()} – {meal.name} (~{calories} kcal)",
+                style={"marginTop": "10px"},
             )
         )
 
-        if not isinstance(meals, dict):
-            blocks.append(html.P("Invalid meals structure for this day."))
-            continue
-
-        for meal_name in ["breakfast", "lunch", "dinner"]:
-            if meal_name not in meals:
-                continue
-            meal = meals[meal_name]
+        flagged = (violations or {}).get((day.name, meal.slot))
+        if flagged:
+            blocks.append(
+                html.P(
+                    "⚠️ Conflicts with your restrictions: "
+                    + ", ".join(str(v) for v in flagged),
+                    style={"color": "red"},
+                )
+            )
 
-            title = meal.get("meal", meal_name.capitalize())
-            calories = meal.get("calories", "?")
-            recipe_text = meal.get("recipe", "")
-            ingredients = meal.get("ingredients", {})
+        if meal.ingredients is not None:
+            blocks.append(
+                html.Ul([html.Li(f"{i.name}: {i.quantity}") for i in meal.ingredients])
+            )
+        else:
+            blocks.append(html.P("No ingredients list."))
 
+        if meal.recipe:
+            blocks.append(html.P(meal.recipe))
+        elif plan_id:
+            meal_ref = {"plan": plan_id, "day": day.name, "slot": meal.slot}
             blocks.append(
-                html.H5(
-                    f"{meal_name.capitalize()} – {title} (~{calories} kcal)",
-                    style={"marginTop": "10px"},
+                dbc.Button(
+                    "📖 Recipe",
+                    id={"type": MEAL_RECIPE_BUTTON_TYPE, **meal_ref},
+                    color="link", size="sm", n_clicks=0,
                 )
             )
+            blocks.append(dcc.Loading(html.Div(id={"type": MEAL_RECIPE_TYPE, **meal_ref})))
 
-            if isinstance(ingredients, dict):
-                blocks.append(
-                    html.Ul([html.Li(f"{k}: {v}") for k, v in ingredients.items()])
-                )
-            else:
-                blocks.append(html.P("No ingredients list."))
+    blocks.append(html.Hr())
+    return blocks
+
+
+def render_partial_mealplan(streamed_days, target_calories, restrictions=None):
+    """Render the days received so far while the rest of the plan is generated."""
+    days = [Day.from_json(day_name, meals) for day_name, meals in streamed_days]
+    violations = violations_by_meal(scan_days(days, restrictions))
+    blocks = [html.H3("Your Weekly Meal Plan 🍲")]
+    for day in days:
+        blocks.extend(render_day(day, target_calories, violations))
+    blocks.append(
+        html.P(
+            f"⏳ Generating your plan… ({len(streamed_days)}/7 days ready)",
+            style={"color": "gray"},
+        )
+    )
+    return html.Div(blocks)
 
-            blocks.append(html.P(recipe_text))
 
-        blocks.append(html.Hr())
+def render_mealplan(plan_dict, target_calories, restrictions=None, plan_id=None):
+    """Render the meal plan (a plan_dict or PlanModel) in a nice HTML structure,
+    flagging the meals that conflict with the restriction text. With a plan_id,
+    links to the plan's permalink."""
+    try:
+        plan = PlanModel.from_dict(plan_dict)
+    except PlanValidationError as e:
+        return html.Div(str(e), style={"color": "red"})
+
+    violations = violations_by_meal(scan_days(plan.days, restrictions))
+    blocks = [html.H3("Your Weekly Meal Plan 🍲")]
+    if plan_id:
+        blocks.append(html.P(dcc.Link("🔗 Permalink to this plan", href=f"/plan/{plan_id}")))
+    if violations:
+        blocks.append(
+            html.P(
+                f"⚠️ {len(violations)} meal(s) conflict with your restrictions, see below.",
+                style={"color": "red"},
+            )
+        )
+    for day in plan.days:
+        blocks.extend(render_day(day, target_calories, violations, plan_id))
 
     # Grocery list
-    if grocery_list:
+    if plan.grocery is None:
         blocks.append(html.H3("🛒 Grocery List"))
-        if isinstance(grocery_list, list):
-            blocks.append(
-                html.Ul(
-                    [
-                        html.Li(
-                            f"{g.get('item')} ({g.get('category')}): {g.get('quantity')}"
-                        )
-                        for g in grocery_list
-                        if isinstance(g, dict)
-                    ]
-                )
+        blocks.append(html.P("Unexpected grocery_list format."))
+    elif plan.grocery:
+        blocks.append(html.H3("🛒 Grocery List"))
+        blocks.append(
+            html.Ul(
+                [
+                    html.Li(
+                        f"{g.item} ({g.category}): {g.quantity}"
+                        + (f" (~{g.calories:g} kcal)" if g.calories is not None else "")
+                    )
+                    for g in plan.grocery
+                ]
             )
-        else:
-            blocks.append(html.P("Unexpected grocery_list format."))
+        )
 
     # Summary
+    summary = plan.summary
     blocks.append(html.H3("📋 Summary"))
     blocks.append(
-        html.P(
-            f"Average daily calories: {summary.get('average_daily_calories', '?')} kcal"
-        )
-    )
-    blocks.append(
-        html.P(
-            f"Estimated weekly cost: {summary.get('estimated_weekly_cost', '?')}"
-        )
-    )
-    blocks.append(
-        html.P(f"Nutrition focus: {summary.get('nutrition_focus', '?')}")
+        html.P(f"Average daily calories: {summary.average_daily_calories} kcal")
     )
+    blocks.append(html.P(f"Estimated weekly cost: {summary.estimated_weekly_cost}"))
+    blocks.append(html.P(f"Nutrition focus: {summary.nutrition_focus}"))
 
     return html.Div(blocks)
 
 
+def remember_plan(profile, key, plan, target):
+    """Cache and store a freshly generated plan, and keep it as a template for
+    other targets; returns its plan id."""
+    plan_id = plan_store.save(plan, key, target)
+    plan_cache.set(key, {"plan": plan, "target": target, "id": plan_id})
+    store_template(plan_cache, profile, plan, target)
+    similar_plans.add(profile, {"id": plan_id, "target": target})
+    return plan_id
+
+
+def lookup_similar(profile, target, restrictions):
+    """The plan of the nearest similar profile rescaled to target, if it breaks
+    none of the restrictions; or None."""
+    found = similar_plans.candidates(profile)
+    for _, ref in found:
+        scale = target / ref["target"] if ref["target"] else 0
+        if not settings.TEMPLATE_MIN_SCALE <= scale <= settings.TEMPLATE_MAX_SCALE:
+            continue
+        stored = plan_store.get(ref["id"])
+        if stored is None:
+            continue
+        plan = stored["plan"] if scale == 1 else rescale_plan(stored["plan"], target)
+        if scan_plan(plan["meal_plan"], restrictions):
+            continue
+        similar_plans.record("hits")
+        return plan
+    similar_plans.record("rejected" if found else "misses")
+    return None
+
+
+def render_generation_error(error_type, message, raw=""):
+    if error_type == "JSONDecodeError":
+        return html.Div(
+            [
+                html.P(
+                    f"Error parsing model output as JSON: {message}",
+                    style={"color": "red"},
+                ),
+                html.Hr(),
+                html.P("Raw model output (truncated):"),
+                html.Pre(raw[:3000]),
+            ]
+        )
+    return html.Div(
+        f"Error calling OpenAI: {error_type} – {message}",
+        style={"color": "red"},
+    )
+
+
 # ---------------------- CALLBACKS ----------------------
 
 
-@app.callback(
+# UI-only form behavior runs client-side (assets/form.js).
+app.clientside_callback(
+    ClientsideFunction(namespace="form", function_name="toggle_visibility"),
     Output("budget_slider_container", "style"),
     Input("budget_ignore", "value"),
 )
-def toggle_budget_visibility(ignore_values):
-    if ignore_values and "ignore" in ignore_values:
-        return {"display": "none"}
-    return {"display": "block"}
 
-
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="form", function_name="toggle_visibility"),
     Output("calories_slider_container", "style"),
     Input("calories_ignore", "value"),
 )
-def toggle_calories_visibility(ignore_values):
-    if ignore_values and "ignore" in ignore_values:
-        return {"display": "none"}
-    return {"display": "block"}
+
+# Disabled from the click until the plan is complete: double clicks submit once.
+app.clientside_callback(
+    ClientsideFunction(namespace="form", function_name="generate_busy"),
+    Output("generate", "disabled"),
+    Input("generate", "n_clicks"),
+    Input("plan_job_poll", "disabled"),
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="form", function_name="estimate_calories"),
+    Output("calories_estimate", "children"),
+    Input("calories_ignore", "value"),
+    Input("body_weight", "drag_value"),
+    Input("body_weight", "value"),
+    Input("activity", "value"),
+    Input("goals", "value"),
+)
 
 
 @app.callback(
     Output("plan_output", "children"),
+    Output("plan_job", "data"),
+    Output("plan_job_poll", "disabled"),
     Input("generate", "n_clicks"),
     State("body_weight", "value"),
     State("activity", "value"),
     State("goals", "value"),
     State("budget", "value"),
     State("dayly_calories", "value"),
+    State("calories_ignore", "value"),
     State("restrictions", "value"),
     State("diet_type", "value"),
     State("location", "value"),
@@ -387,49 +605,177 @@ def on_generate_click(
     goals,
     budget,
     daily_calories,
+    calories_ignore,
     restrictions,
     diet_type,
     location,
 ):
     if not n_clicks:
-        return ""
+        return "", None, True
+
+    # "Compute for me": derive the target from the profile instead of the slider.
+    if calories_ignore and "ignore" in calories_ignore:
+        daily_calories = None
+
+    profile = canonical_profile(
+        body_weight,
+        activity,
+        goals,
+        budget,
+        daily_calories,
+        restrictions,
+        diet_type,
+        location,
+    )
+    key = profile_key(profile)
+    cached = plan_cache.get(key)
+    if cached is None:
+        # Evicted or expired from the cache, but served recently: reload it.
+        cached = plan_store.latest(key, settings.PLAN_STORE_REUSE_AGE)
+        if cached is not None:
+            cached = {k: cached[k] for k in ("plan", "target", "id")}
+            plan_cache.set(key, cached)
+    if cached is not None:
+        plan_id = cached.get("id") or plan_store.save(cached["plan"], key, cached["target"])
+        return render_mealplan(cached["plan"], cached["target"], restrictions, plan_id), None, True
+
+    # Same profile with another calorie target: rescale instead of regenerating.
+    target = (
+        daily_calories
+        if daily_calories and daily_calories > 0
+        else estimate_calories(body_weight, activity, goals)
+    )
+    rescaled = lookup_template(
+        plan_cache,
+        profile,
+        target,
+        settings.TEMPLATE_MIN_SCALE,
+        settings.TEMPLATE_MAX_SCALE,
+    )
+    if rescaled is not None:
+        plan_id = plan_store.save(rescaled, key, target)
+        plan_cache.set(key, {"plan": rescaled, "target": target, "id": plan_id})
+        return render_mealplan(rescaled, target, restrictions, plan_id), None, True
+
+    # Nearly the same profile ("peanuts" vs "peanut butter", one more goal...).
+    if settings.SIMILAR_PLANS:
+        similar = lookup_similar(profile, target, restrictions)
+        if similar is not None:
+            plan_id = plan_store.save(similar, key, target)
+            plan_cache.set(key, {"plan": similar, "target": target, "id": plan_id})
+            return render_mealplan(similar, target, restrictions, plan_id), None, True
+
+    engine_args = (
+        body_weight,
+        activity,
+        goals,
+        budget,
+        target,
+        restrictions,
+        diet_type,
+        location,
+    )
 
-    if not openai.api_key:
-        return html.Div(
-            "Error: OPENAI_API_KEY is not set in the environment.",
-            style={"color": "red"},
+    # Common profiles are assembled from the local catalog; the model is for the rest.
+    if settings.CATALOG_PLANS:
+        plan = catalog_mealplan(*engine_args)
+        if plan is not None:
+            plan_id = remember_plan(profile, key, plan, target)
+            return render_mealplan(plan, target, restrictions, plan_id), None, True
+
+    if not llm.get_backend().ready():
+        return (
+            html.Div(
+                "Error: OPENAI_API_KEY is not set in the environment.",
+                style={"color": "red"},
+            ),
+            None,
+            True,
         )
 
-    try:
-        plan_dict, target, raw = call_openai_mealplan(
-            body_weight,
-            activity,
-            goals,
-            budget,
-            daily_calories,
-            restrictions,
-            diet_type,
-            location,
-        )
-        return render_mealplan(plan_dict, target)
+    messages, _ = build_mealplan_messages(*engine_args, compact=settings.COMPACT_PLANS)
 
-    except json.JSONDecodeError as e:
-        return html.Div(
-            [
-                html.P(
-                    f"Error parsing model output as JSON: {e}",
-                    style={"color": "red"},
-                ),
-                html.Hr(),
-                html.P("Raw model output (truncated):"),
-                html.Pre(raw[:3000]),
-            ]
+    async def runner(progress):
+        plan = await run_generation(progress, messages, engine_args)
+        # Validate and normalize once; caches hold the normalized form.
+        plan = PlanModel.from_dict(plan).to_dict()
+        # SQLite and disk writes, off the loop the other completions run on.
+        plan_id = await asyncio.to_thread(remember_plan, profile, key, plan, target)
+        return {"plan": plan, "id": plan_id}
+
+    # Identical in-flight profiles (double clicks, popular defaults) share one job.
+    job_id = plan_jobs.submit(key, target, runner, llm.submit)
+    job_ref = {"id": job_id, "restrictions": restrictions}
+    return render_partial_mealplan([], target), job_ref, False
+
+
+@app.callback(
+    Output("plan_output", "children", allow_duplicate=True),
+    Output("plan_job_poll", "disabled", allow_duplicate=True),
+    Input("plan_job_poll", "n_intervals"),
+    State("plan_job", "data"),
+    prevent_initial_call=True,
+)
+def on_plan_job_poll(n_intervals, job_ref):
+    if not job_ref:
+        return no_update, True
+
+    job = plan_jobs.get(job_ref["id"])
+    if job is None:
+        return (
+            html.Div(
+                "This generation is no longer available, please generate again.",
+                style={"color": "red"},
+            ),
+            True,
         )
+
+    target = job["target"]
+    restrictions = job_ref.get("restrictions")
+    if job["status"] == "failed":
+        return render_generation_error(job["error_type"], job["error"], job["raw"]), True
+    if job["status"] != "done":
+        return render_partial_mealplan(job["days"], target, restrictions), False
+    # Stored once, with its profile key, by the job runner.
+    result = job["result"]
+    return render_mealplan(result["plan"], target, restrictions, result["id"]), True
+
+
+@app.callback(
+    Output("plan_output", "children", allow_duplicate=True),
+    Input("url", "pathname"),
+    prevent_initial_call="initial_duplicate",
+)
+def on_permalink(pathname):
+    # /plan/<id>: re-render a stored plan, without any model call.
+    if not pathname or not pathname.startswith("/plan/"):
+        return no_update
+    stored = plan_store.get(pathname.rsplit("/", 1)[1])
+    if stored is None:
+        return html.Div("This plan does not exist (anymore).", style={"color": "red"})
+    return render_mealplan(stored["plan"], stored["target"], plan_id=stored["id"])
+
+
+@app.callback(
+    Output({"type": MEAL_RECIPE_TYPE, "plan": MATCH, "day": MATCH, "slot": MATCH}, "children"),
+    Input({"type": MEAL_RECIPE_BUTTON_TYPE, "plan": MATCH, "day": MATCH, "slot": MATCH}, "n_clicks"),
+    prevent_initial_call=True,
+)
+def on_meal_recipe_click(n_clicks):
+    # Compact-mode plans carry no recipes: fetch one on first open, toggle after.
+    if not n_clicks or n_clicks % 2 == 0:
+        return ""
+    ref = ctx.triggered_id
+    stored = plan_store.get(ref["plan"])
+    meal = stored and stored["plan"]["meal_plan"].get(ref["day"], {}).get(ref["slot"])
+    if not meal:
+        return html.P("This plan does not exist (anymore).", style={"color": "red"})
+    if not llm.get_backend().ready():
+        return html.P("Error: OPENAI_API_KEY is not set in the environment.", style={"color": "red"})
+    try:
+        return html.P(fetch_recipe(meal))
     except Exception as e:
-        return html.Div(
-            f"Error calling OpenAI: {type(e).__name__} – {e}",
-            style={"color": "red"},
-        )
+        return html.P(f"Error fetching the recipe: {e}", style={"color": "red"})
 
 
 # Test Recipes – still uses your hard-coded recipes
@@ -446,7 +792,7 @@ def display_test_recipes(n_clicks):
     for i in range(len(sample_recipes)):
         day_idx = i // 2
         meal_idx = i % 2
-        day = days[day_idx]
+        day = WEEK_DAYS[day_idx]
         meal = meal_times[meal_idx]
 
         blocks.append(
@@ -455,11 +801,60 @@ def display_test_recipes(n_clicks):
                 style={"marginTop": "20px", "marginBottom": "10px"},
             )
         )
-        blocks.append(create_recipe_widget(sample_recipes[i]))
+        # Serialized once per recipe; repeat clicks ship the cached payload.
+        blocks.append(recipe_widget_payload(sample_recipes[i]))
 
     return blocks
 
 
+# Recipe card interactions: pattern-matching ids, so these few callbacks
+# serve any number of cards. Pure UI state is handled client-side
+# (assets/recipes.js).
+app.clientside_callback(
+    ClientsideFunction(namespace="recipes", function_name="toggle_steps"),
+    Output({"type": STEPS_TYPE, "recipe": MATCH}, "is_open"),
+    Input({"type": STEPS_TOGGLE_TYPE, "recipe": MATCH}, "n_clicks"),
+    State({"type": STEPS_TYPE, "recipe": MATCH}, "is_open"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="recipes", function_name="render_stars"),
+    Output({"type": STAR_TYPE, "recipe": MATCH, "star": ALL}, "children"),
+    Output({"type": STAR_TYPE, "recipe": MATCH, "star": ALL}, "style"),
+    Input({"type": STAR_TYPE, "recipe": MATCH, "star": ALL}, "n_clicks"),
+    State({"type": STAR_TYPE, "recipe": MATCH, "star": ALL}, "id"),
+    State("recipe_ratings", "data"),
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="recipes", function_name="store_rating"),
+    Output("recipe_ratings", "data"),
+    Input({"type": STAR_TYPE, "recipe": ALL, "star": ALL}, "n_clicks"),
+    State("recipe_ratings", "data"),
+    prevent_initial_call=True,
+)
+
+
+@app.callback(
+    Output("order_cart", "data"),
+    Output("order_cart_summary", "children"),
+    Input({"type": ORDER_TYPE, "recipe": ALL, "ingredient": ALL}, "n_clicks"),
+    State("order_cart", "data"),
+    prevent_initial_call=True,
+)
+def on_order_click(n_clicks, cart):
+    # Cards being (re)rendered also fire this, with n_clicks still at 0.
+    if not ctx.triggered or not ctx.triggered[0]["value"]:
+        return no_update, no_update
+
+    cart = dict(cart or {})
+    ingredient = ctx.triggered_id["ingredient"]
+    cart[ingredient] = cart.get(ingredient, 0) + 1
+    items = ", ".join(f"{name} ×{count}" if count > 1 else name for name, count in cart.items())
+    return cart, f"🛒 To order: {items}"
+
+
 # -------------------- MAIN --------------------
 if __name__ == "__main__":
     app.run(debug=True)
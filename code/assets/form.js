@@ -0,0 +1,57 @@
+// Client-side callbacks of the profile form: UI-only behavior that used to
+// be a server round-trip per change.
+
+// Daily energy per kg of body weight at rest, and activity multipliers
+// (keep in line with the labels of the "activity" dropdown).
+var REST_KCAL_PER_KG = 24;
+var ACTIVITY_FACTORS = {
+    "Sedentary": 1.2,
+    "Lightly active": 1.375,
+    "Moderately active": 1.55,
+    "Very active": 1.725,
+    "Extra active": 1.9,
+};
+var GOAL_ADJUSTMENTS = {
+    "Lose weight": -500,
+    "Build muscle": 300,
+};
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    form: {
+        // Hide a slider when its "ignore" box is checked.
+        toggle_visibility: function (ignoreValues) {
+            var hidden = (ignoreValues || []).indexOf("ignore") !== -1;
+            return {display: hidden ? "none" : "block"};
+        },
+
+        // Disable the generate button from its click until the polled job
+        // is over (plan_job_poll disabled again).
+        generate_busy: function (nClicks, pollDisabled) {
+            var triggered = dash_clientside.callback_context.triggered.map(function (t) {
+                return t.prop_id;
+            });
+            if (triggered.indexOf("generate.n_clicks") !== -1) {
+                return nClicks > 0;
+            }
+            return !pollDisabled;
+        },
+
+        // Live calorie estimate shown while "Compute for me" is checked.
+        // dragValue follows the weight slider while it is dragged.
+        estimate_calories: function (ignoreValues, dragValue, weight, activity, goals) {
+            if ((ignoreValues || []).indexOf("ignore") === -1) {
+                return "";
+            }
+            var kg = dragValue || weight;
+            if (!kg) {
+                return "";
+            }
+            var kcal = kg * REST_KCAL_PER_KG * (ACTIVITY_FACTORS[activity] || 1.55);
+            (goals || []).forEach(function (goal) {
+                kcal += GOAL_ADJUSTMENTS[goal] || 0;
+            });
+            kcal = Math.max(1200, Math.round(kcal / 50) * 50);
+            return "≈ " + kcal + " kcal/day, estimated from your weight, activity and goals";
+        },
+    },
+});
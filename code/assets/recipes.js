@@ -0,0 +1,49 @@
+// Client-side callbacks of the recipe cards (see create_recipe_widget).
+// Pure UI state never round-trips to the server.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    recipes: {
+        // Show/hide the steps of one card.
+        toggle_steps: function (nClicks, isOpen) {
+            return nClicks ? !isOpen : isOpen;
+        },
+
+        // Fill the stars of one card up to the clicked one, or to the stored rating.
+        render_stars: function (nClicks, starIds, ratings) {
+            var recipe = starIds.length ? starIds[0].recipe : null;
+            var triggered = triggeredId();
+            var rating = triggered ? triggered.star : ((ratings || {})[recipe] || 0);
+            var style = {cursor: "pointer", fontSize: "20px"};
+            return [
+                starIds.map(function (id) { return id.star <= rating ? "★" : "☆"; }),
+                starIds.map(function (id) {
+                    return Object.assign({}, style, {color: id.star <= rating ? "#f5a623" : "#ccc"});
+                }),
+            ];
+        },
+
+        // Remember ratings in the browser (recipe key -> stars).
+        store_rating: function (nClicks, ratings) {
+            var triggered = triggeredId();
+            if (!triggered) {
+                return window.dash_clientside.no_update;
+            }
+            var updated = Object.assign({}, ratings || {});
+            updated[triggered.recipe] = triggered.star;
+            return updated;
+        },
+    },
+});
+
+function triggeredId() {
+    var triggered = window.dash_clientside.callback_context.triggered;
+    if (!triggered || !triggered.length || !triggered[0].value) {
+        return null;
+    }
+    var propId = triggered[0].prop_id;
+    try {
+        return JSON.parse(propId.slice(0, propId.lastIndexOf(".")));
+    } catch (e) {
+        return null;
+    }
+}
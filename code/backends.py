@@ -0,0 +1,402 @@
+"""Backends answering the chat completions of llm.py.
+
+llm.py keeps what every backend shares (the event loop, the concurrency
+bound, retries, deadlines and hedging, token accounting); a backend only
+turns messages into text:
+
+- OpenAIBackend: the OpenAI API, or any compatible server (OPENAI_BASE_URL),
+  through one pooled keep-alive client. The key comes from OPENAI_API_KEY.
+- ReplayBackend: answers recorded from another backend (RecordingBackend),
+  looked up by prompt, for reproducible offline runs.
+- SyntheticBackend: valid answers assembled from the sample recipes after a
+  configurable latency, for load tests of the whole stack without network.
+
+Backends answer completions rather than whole plans, so that prompting,
+parsing, streaming, validation and repair run exactly as in production: a
+profile becomes a plan through app.run_generation on top of any of them.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+from catalog import sample_catalog_recipes
+from plan_model import MEAL_SLOTS
+from recipes import days as WEEK_DAYS
+
+STREAM_CHUNK_CHARS = 40
+# Share of a synthetic latency spent before the first streamed chunk.
+FIRST_CHUNK_SHARE = 0.2
+
+
+class BackendError(Exception):
+    """Transient failure of a local backend (retried like a provider 5xx)."""
+
+
+class ReplayMiss(LookupError):
+    pass
+
+
+class Usage:
+    __slots__ = ("prompt_tokens", "completion_tokens")
+
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+def estimate_usage(messages, text):
+    """Token counts estimated at 4 characters per token, for local backends."""
+    prompt = sum(len(m.get("content") or "") for m in messages)
+    return Usage(prompt // 4, len(text) // 4)
+
+
+def prompt_key(messages):
+    payload = json.dumps(messages, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def prompt_kind(messages):
+    """Key of the system prompt alone: which kind of answer is expected."""
+    return prompt_key(messages[:1])
+
+
+async def _chunked(text, delay=0.0):
+    for i in range(0, len(text), STREAM_CHUNK_CHARS):
+        if delay:
+            await asyncio.sleep(delay)
+        yield text[i : i + STREAM_CHUNK_CHARS]
+
+
+class Backend:
+    name = "backend"
+
+    def ready(self):
+        """Whether requests can be sent (credentials present...)."""
+        return True
+
+    async def complete(self, messages, model, temperature, timeout, **kwargs):
+        """Return (text, usage) of a completion."""
+        raise NotImplementedError
+
+    async def stream(self, messages, model, temperature, timeout, **kwargs):
+        """Open a streamed completion; return an async iterator of text deltas,
+        followed by one Usage-like object when the backend reports it."""
+        raise NotImplementedError
+
+
+# -------------------- OPENAI --------------------
+
+
+class OpenAIBackend(Backend):
+    name = "openai"
+
+    def __init__(self, api_key=None, pool_size=100, timeout=90.0):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._client = None
+
+    def ready(self):
+        return bool(self.api_key)
+
+    def client(self):
+        """The shared AsyncOpenAI client (created on first use, on the LLM loop)."""
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=60,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=10),
+            )
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                http_client=http_client,
+                max_retries=0,  # retried by llm.py, with its own backoff
+            )
+        return self._client
+
+    async def complete(self, messages, model, temperature, timeout, **kwargs):
+        response = await self.client().chat.completions.create(
+            model=model, temperature=temperature, messages=messages, timeout=timeout, **kwargs
+        )
+        return response.choices[0].message.content.strip(), getattr(response, "usage", None)
+
+    async def stream(self, messages, model, temperature, timeout, **kwargs):
+        response = await self.client().chat.completions.create(
+            model=model,
+            temperature=temperature,
+            messages=messages,
+            timeout=timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs,
+        )
+        return self._deltas(response)
+
+    @staticmethod
+    async def _deltas(response):
+        async for chunk in response:
+            # The last chunk carries the usage of the request, and no choices.
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                yield usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+# -------------------- RECORD / REPLAY --------------------
+
+
+class RecordingBackend(Backend):
+    """Wraps a backend and appends each of its answers to a JSON Lines file."""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self.name = f"{inner.name}+record"
+        self._lock = threading.Lock()
+
+    def ready(self):
+        return self.inner.ready()
+
+    def _record(self, messages, text, seconds):
+        line = json.dumps(
+            {
+                "key": prompt_key(messages),
+                "kind": prompt_kind(messages),
+                "seconds": round(seconds, 3),
+                "text": text,
+            }
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    async def complete(self, messages, model, temperature, timeout, **kwargs):
+        started = time.monotonic()
+        text, usage = await self.inner.complete(messages, model, temperature, timeout, **kwargs)
+        self._record(messages, text, time.monotonic() - started)
+        return text, usage
+
+    async def stream(self, messages, model, temperature, timeout, **kwargs):
+        started = time.monotonic()
+        deltas = await self.inner.stream(messages, model, temperature, timeout, **kwargs)
+
+        async def recorded():
+            parts = []
+            async for item in deltas:
+                if isinstance(item, str):
+                    parts.append(item)
+                yield item
+            self._record(messages, "".join(parts), time.monotonic() - started)
+
+        return recorded()
+
+
+class ReplayBackend(Backend):
+    """Answers recorded by RecordingBackend, looked up by prompt.
+
+    A prompt never recorded gets, in turn, the recorded answers of the same
+    system prompt unless strict, so a small recording serves any profile.
+    speed scales the recorded latencies (0: answer at once).
+    """
+
+    name = "replay"
+
+    def __init__(self, path, strict=False, speed=0.0):
+        self.strict = strict
+        self.speed = speed
+        self._by_key = {}
+        self._by_kind = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    answer = (record["text"], record.get("seconds", 0.0))
+                    self._by_key.setdefault(record["key"], answer)
+                    self._by_kind.setdefault(record["kind"], []).append(answer)
+        self._cycles = {kind: itertools.cycle(answers) for kind, answers in self._by_kind.items()}
+        self._lock = threading.Lock()
+
+    def _lookup(self, messages):
+        answer = self._by_key.get(prompt_key(messages))
+        if answer is None and not self.strict:
+            with self._lock:
+                cycle = self._cycles.get(prompt_kind(messages))
+                answer = next(cycle) if cycle is not None else None
+        if answer is None:
+            raise ReplayMiss("no recorded answer for this prompt")
+        return answer
+
+    async def complete(self, messages, model, temperature, timeout, **kwargs):
+        text, seconds = self._lookup(messages)
+        if self.speed:
+            await asyncio.sleep(seconds * self.speed)
+        return text, estimate_usage(messages, text)
+
+    async def stream(self, messages, model, temperature, timeout, **kwargs):
+        text, seconds = self._lookup(messages)
+        chunks = max(1, -(-len(text) // STREAM_CHUNK_CHARS))
+
+        async def deltas():
+            async for chunk in _chunked(text, seconds * self.speed / chunks):
+                yield chunk
+            yield estimate_usage(messages, text)
+
+        return deltas()
+
+
+# -------------------- SYNTHETIC --------------------
+
+
+class LatencyModel:
+    """Log-normal latencies with occasional hiccups (much longer waits) and errors."""
+
+    def __init__(self, median=1.0, sigma=0.5, hiccup_rate=0.0, hiccup=30.0, error_rate=0.0, seed=None):
+        self.median = median
+        self.sigma = sigma
+        self.hiccup_rate = hiccup_rate
+        self.hiccup = hiccup
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec):
+        """"median=1.5,sigma=0.5,hiccup_rate=0.01" -> LatencyModel."""
+        params = {}
+        for part in (spec or "").split(","):
+            if part.strip():
+                name, value = part.split("=", 1)
+                params[name.strip()] = int(value) if name.strip() == "seed" else float(value)
+        return cls(**params)
+
+    def draw(self):
+        """(seconds to wait, whether to fail the request)."""
+        with self._lock:
+            if self._random.random() < self.hiccup_rate:
+                return self.hiccup, False
+            seconds = self.median * self._random.lognormvariate(0.0, self.sigma)
+            return seconds, self._random.random() < self.error_rate
+
+
+class SyntheticBackend(Backend):
+    """Valid answers in whichever format the system prompt asks for (week,
+    single day, compact, recipe steps), built from the sample recipes."""
+
+    name = "synthetic"
+
+    def __init__(self, latency=None):
+        self.latency = latency or LatencyModel(median=0.0, sigma=0.0)
+        recipes = sample_catalog_recipes()
+        self._meals = {
+            slot: itertools.cycle(
+                [r.to_meal() for r in recipes if slot in r.slots] or [recipes[0].to_meal()]
+            )
+            for slot in MEAL_SLOTS
+        }
+        self._lock = threading.Lock()
+
+    async def complete(self, messages, model, temperature, timeout, **kwargs):
+        seconds, fail = self.latency.draw()
+        await asyncio.sleep(seconds)
+        if fail:
+            raise BackendError("injected failure")
+        text = self.answer(messages)
+        return text, estimate_usage(messages, text)
+
+    async def stream(self, messages, model, temperature, timeout, **kwargs):
+        seconds, fail = self.latency.draw()
+        await asyncio.sleep(seconds * FIRST_CHUNK_SHARE)
+        if fail:
+            raise BackendError("injected failure")
+        text = self.answer(messages)
+        chunks = max(1, -(-len(text) // STREAM_CHUNK_CHARS))
+
+        async def deltas():
+            async for chunk in _chunked(text, seconds * (1 - FIRST_CHUNK_SHARE) / chunks):
+                yield chunk
+            yield estimate_usage(messages, text)
+
+        return deltas()
+
+    # -------------------- ANSWERS --------------------
+
+    def _day(self):
+        with self._lock:
+            return {slot: dict(next(self._meals[slot])) for slot in MEAL_SLOTS}
+
+    @staticmethod
+    def _compact_meal(meal):
+        return {
+            "n": meal["meal"],
+            "i": [[name, quantity] for name, quantity in meal["ingredients"].items()],
+            "k": meal["calories"],
+        }
+
+    def answer(self, messages):
+        """Completion text for the prompt."""
+        system = messages[0]["content"] if messages else ""
+        compact = '"p":' in system
+        if "preparation steps" in system:
+            return "Prepare the ingredients. Cook them together for 15 minutes. Season and serve."
+        if "ONE day" in system:
+            day = self._day()
+            if compact:
+                return json.dumps({slot[0]: self._compact_meal(meal) for slot, meal in day.items()})
+            return json.dumps(day)
+
+        week = {day_name: self._day() for day_name in WEEK_DAYS}
+        if compact:
+            return json.dumps(
+                {
+                    "p": {
+                        day_name[:3]: {slot[0]: self._compact_meal(m) for slot, m in meals.items()}
+                        for day_name, meals in week.items()
+                    },
+                    "s": {"c": "CHF 80", "f": "Balanced, varied whole foods"},
+                }
+            )
+        return json.dumps(
+            {
+                "meal_plan": week,
+                "summary": {
+                    "average_daily_calories": 2000,
+                    "estimated_weekly_cost": "CHF 80",
+                    "nutrition_focus": "Balanced, varied whole foods",
+                },
+            }
+        )
+
+
+# -------------------- FACTORY --------------------
+
+
+def from_settings(settings):
+    """The backend configured by CULINAIRE_LLM_BACKEND (and CULINAIRE_LLM_RECORD)."""
+    name = settings.LLM_BACKEND
+    if name == "openai":
+        backend = OpenAIBackend(pool_size=settings.LLM_POOL_SIZE, timeout=settings.LLM_TIMEOUT)
+    elif name == "replay":
+        if not settings.LLM_REPLAY_PATH:
+            raise ValueError("CULINAIRE_LLM_BACKEND=replay needs CULINAIRE_LLM_REPLAY")
+        backend = ReplayBackend(settings.LLM_REPLAY_PATH, speed=settings.LLM_REPLAY_SPEED)
+    elif name == "synthetic":
+        backend = SyntheticBackend(LatencyModel.from_spec(settings.SYNTHETIC_LATENCY))
+    else:
+        raise ValueError(f"unknown CULINAIRE_LLM_BACKEND {name!r}")
+    if settings.LLM_RECORD_PATH:
+        backend = RecordingBackend(backend, settings.LLM_RECORD_PATH)
+    return backend
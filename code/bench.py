@@ -0,0 +1,541 @@
+"""Load and latency benchmarks of the Dash app, against a local model.
+
+Two suites, results appended to a JSON Lines file (--results) with the commit
+they were measured on:
+
+- load: simulated users post to the real callback endpoint
+  (/_dash-update-component) like the browser does: a generate click with a
+  profile drawn from a realistic distribution, then polls of the plan job
+  every --poll seconds until the plan is rendered. By default the app runs in
+  process (one app: one gunicorn worker) on the synthetic model backend,
+  whose latency is CULINAIRE_SYNTHETIC_LATENCY; with --url a running server
+  is driven over HTTP instead (start it with CULINAIRE_LLM_BACKEND=synthetic,
+  and pass its worker --pids to measure their memory). Reports throughput,
+  p50/p95/p99 of every callback and of the whole click-to-plan wait, and the
+  resident memory of the worker.
+- micro: per-call time of the steps of a request: the model call pipeline
+  without model latency (call_openai_mealplan), parsing the answer,
+  render_mealplan, Dash JSON serialization, recipe widgets and the helpers.
+
+    python bench.py load --users 20 --plans 200
+    python bench.py micro --compare
+
+--compare prints the change of every metric from the latest result of
+another commit, marking regressions beyond --threshold.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import urllib.request
+
+DEFAULT_RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results.jsonl")
+UPDATE_PATH = "/_dash-update-component"
+
+# -------------------- PROFILES --------------------
+
+# Rough shares of the traffic; the form's defaults (layout.py) dominate.
+ACTIVITIES = (
+    ("Sedentary", 0.25),
+    ("Lightly active", 0.3),
+    ("Moderately active", 0.3),
+    ("Very active", 0.12),
+    ("Extra active", 0.03),
+)
+DIETS = (
+    ("Omnivore", 0.55),
+    ("Vegetarian", 0.15),
+    ("Vegan", 0.08),
+    ("Pescatarian", 0.07),
+    ("Keto", 0.06),
+    ("Gluten free", 0.06),
+    ("Other", 0.03),
+)
+GOALS = (
+    "Lose weight",
+    "Build muscle",
+    "Maintain muscle mass",
+    "Reduce meat consumption",
+    "Discover new recipes",
+    "Reduce processed food consumption",
+)
+RESTRICTIONS = (
+    ("", 0.7),
+    ("peanut", 0.06),
+    ("lactose intolerant", 0.06),
+    ("gluten", 0.05),
+    ("no pork", 0.04),
+    ("shellfish allergy", 0.03),
+    ("egg", 0.03),
+    ("no mushrooms, no olives", 0.03),
+)
+LOCATIONS = (("", 0.4), ("Lausanne", 0.25), ("Zurich", 0.15), ("Geneva", 0.12), ("Bern", 0.08))
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def random_profile(rng, repeat=0.3):
+    """Form values of one user; a share repeat of them keep the form's defaults."""
+    if rng.random() < repeat:
+        return {
+            "body_weight": 69,
+            "activity": "Moderately active",
+            "goals": [],
+            "budget": 80,
+            "dayly_calories": 2000,
+            "calories_ignore": [],
+            "restrictions": "",
+            "diet_type": "Omnivore",
+            "location": "",
+        }
+    compute = rng.random() < 0.6
+    return {
+        "body_weight": int(min(150, max(40, rng.gauss(72, 13)))),
+        "activity": _weighted(rng, ACTIVITIES),
+        "goals": rng.sample(GOALS, rng.choice((0, 1, 1, 2, 2, 3))),
+        "budget": rng.randrange(40, 160, 10),
+        "dayly_calories": rng.randrange(1400, 3600, 100),
+        "calories_ignore": ["ignore"] if compute else [],
+        "restrictions": _weighted(rng, RESTRICTIONS),
+        "diet_type": _weighted(rng, DIETS),
+        "location": _weighted(rng, LOCATIONS),
+    }
+
+
+# -------------------- CLIENTS --------------------
+
+
+class TestClient:
+    """Requests to the app of this process, through Flask's test client."""
+
+    def __init__(self, server):
+        self._client = server.test_client()
+
+    def get(self, path):
+        return self._client.get(path).get_json()
+
+    def post(self, path, payload):
+        response = self._client.post(path, json=payload)
+        if response.status_code == 204:  # PreventUpdate
+            return None
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response.get_json()
+
+
+class HTTPClient:
+    """Requests to a running server."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def get(self, path):
+        with urllib.request.urlopen(self.url + path, timeout=60) as response:
+            return json.load(response)
+
+    def post(self, path, payload):
+        request = urllib.request.Request(
+            self.url + path,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return json.load(response) if response.status == 200 else None
+
+
+# -------------------- CALLBACKS --------------------
+
+
+def _split_output(output):
+    """"..a.children...b.data.." -> [("a", "children"), ("b", "data")]."""
+    parts = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [tuple(part.rsplit(".", 1)) for part in parts]
+
+
+class Callback:
+    """One server callback, called the way the Dash renderer does."""
+
+    def __init__(self, dependency):
+        self.output = dependency["output"]
+        self.outputs = [{"id": i, "property": p} for i, p in _split_output(self.output)]
+        self.inputs = dependency["inputs"]
+        self.state = dependency["state"]
+
+    @classmethod
+    def find(cls, dependencies, input_id, input_property):
+        for dependency in dependencies:
+            if not dependency.get("clientside_function") and any(
+                i["id"] == input_id and i["property"] == input_property for i in dependency["inputs"]
+            ):
+                return cls(dependency)
+        raise LookupError(f"no server callback on {input_id}.{input_property}")
+
+    def payload(self, values):
+        """Request body; values maps component ids to the value of their property."""
+
+        def props(deps):
+            return [dict(d, value=values.get(d["id"])) for d in deps]
+
+        return {
+            "output": self.output,
+            "outputs": self.outputs if len(self.outputs) > 1 else self.outputs[0],
+            "inputs": props(self.inputs),
+            "state": props(self.state),
+            "changedPropIds": [f"{self.inputs[0]['id']}.{self.inputs[0]['property']}"],
+        }
+
+    @staticmethod
+    def value(response, component_id, prop):
+        """The new value of component_id.prop in a response (None: not updated)."""
+        if not response:
+            return None
+        return response.get("response", {}).get(component_id, {}).get(prop.split("@")[0])
+
+
+# -------------------- LOAD --------------------
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.latencies = {"generate": [], "poll": [], "plan": []}
+        self.counts = {"plans": 0, "immediate": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def add(self, kind, seconds):
+        with self._lock:
+            self.latencies[kind].append(seconds)
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+
+def run_session(client, generate, poll, profile, poll_interval, recorder):
+    """One user: click generate, then poll until the plan is complete."""
+    started = time.perf_counter()
+    response = client.post(UPDATE_PATH, generate.payload({"generate": 1, **profile}))
+    recorder.add("generate", time.perf_counter() - started)
+    job = Callback.value(response, "plan_job", "data")
+    done = Callback.value(response, "plan_job_poll", "disabled")
+    if done:
+        recorder.count("immediate")  # cached, rescaled or assembled from the catalog
+    n_intervals = 0
+    while not done:
+        time.sleep(poll_interval)
+        n_intervals += 1
+        polled = time.perf_counter()
+        response = client.post(
+            UPDATE_PATH, poll.payload({"plan_job_poll": n_intervals, "plan_job": job})
+        )
+        recorder.add("poll", time.perf_counter() - polled)
+        done = Callback.value(response, "plan_job_poll", "disabled")
+    recorder.add("plan", time.perf_counter() - started)
+    recorder.count("plans")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def rss_mb(pid="self"):
+    """Resident memory of a process, from /proc (Linux)."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def run_load(args):
+    if args.url:
+        client_factory = lambda: HTTPClient(args.url)  # noqa: E731
+        pids = args.pids or []
+    else:
+        import app
+
+        client_factory = lambda: TestClient(app.server)  # noqa: E731
+        pids = ["self"]
+
+    dependencies = client_factory().get("/_dash-dependencies")
+    generate = Callback.find(dependencies, "generate", "n_clicks")
+    poll = Callback.find(dependencies, "plan_job_poll", "n_intervals")
+
+    rng = random.Random(args.seed)
+    profiles = [random_profile(rng, args.repeat) for _ in range(args.plans)]
+    next_profile = iter(profiles).__next__
+    profiles_lock = threading.Lock()
+    recorder = LoadRecorder()
+    rss_start = [rss_mb(pid) for pid in pids]
+    rss_peak = list(rss_start)
+
+    def user():
+        client = client_factory()
+        while True:
+            with profiles_lock:
+                try:
+                    profile = next_profile()
+                except StopIteration:
+                    return
+            try:
+                run_session(client, generate, poll, profile, args.poll, recorder)
+            except Exception as e:
+                recorder.count("errors")
+                print(f"error: {type(e).__name__}: {e}", file=sys.stderr)
+
+    started = time.perf_counter()
+    users = [threading.Thread(target=user, daemon=True) for _ in range(args.users)]
+    for thread in users:
+        thread.start()
+    while any(thread.is_alive() for thread in users):
+        time.sleep(0.2)
+        for i, pid in enumerate(pids):
+            rss = rss_mb(pid)
+            if rss is not None and (rss_peak[i] is None or rss > rss_peak[i]):
+                rss_peak[i] = rss
+    elapsed = time.perf_counter() - started
+
+    callbacks = len(recorder.latencies["generate"]) + len(recorder.latencies["poll"])
+    metrics = {
+        "plans": recorder.counts["plans"],
+        "errors": recorder.counts["errors"],
+        "immediate_share": round(recorder.counts["immediate"] / max(1, len(profiles)), 3),
+        "plans_per_s": round(recorder.counts["plans"] / elapsed, 2),
+        "callbacks_per_s": round(callbacks / elapsed, 2),
+    }
+    for kind, latencies in recorder.latencies.items():
+        for q in (0.5, 0.95, 0.99):
+            value = percentile(latencies, q)
+            if value is not None:
+                metrics[f"{kind}_p{round(q * 100)}_ms"] = round(value * 1000, 1)
+    for i, pid in enumerate(pids):
+        name = "worker" if pid == "self" else f"worker_{i}"
+        if rss_start[i] is not None:
+            metrics[f"{name}_rss_start_mb"] = round(rss_start[i], 1)
+            metrics[f"{name}_rss_peak_mb"] = round(rss_peak[i], 1)
+            metrics[f"{name}_rss_end_mb"] = round(rss_mb(pid) or 0.0, 1)
+    if not args.url:
+        # Where generation time went: mean time per model request, by kind.
+        import llm
+
+        for label, totals in llm.token_usage.snapshot().items():
+            metrics[f"model_{label}_mean_ms"] = round(1000 * totals["seconds"] / totals["requests"], 1)
+    return metrics
+
+
+# -------------------- MICRO --------------------
+
+
+def time_call(fn, min_seconds=0.2, repeat=5):
+    """Best per-call time of fn, in microseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def micro_benchmarks():
+    """{name: zero-argument callable} of the steps of a plan request."""
+    import copy
+
+    from dash._utils import to_json
+
+    import app
+    import backends
+    import helpers
+    import llm
+    from recipes import sample_recipes
+    from streaming import DayStreamParser
+
+    llm.set_backend(backends.SyntheticBackend())
+    args = (72, "Moderately active", ["Lose weight"], 80, 2200, "", "Omnivore", "Lausanne")
+    raw = backends.SyntheticBackend().answer([{"role": "system", "content": "week"}])
+    plan = app.attach_grocery_list(app.parse_plan_text(raw))
+    rendered = app.render_mealplan(plan, 2200, "", "bench")
+    day = copy.deepcopy(plan["meal_plan"]["Monday"])
+    targets = itertools.cycle((1800, 2400))
+    recipes = itertools.cycle(sample_recipes)
+    chunks = [raw[i : i + 40] for i in range(0, len(raw), 40)]
+
+    def stream_parse():
+        parser = DayStreamParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.result()
+
+    return {
+        "call_openai_mealplan": lambda: app.call_openai_mealplan(*args),
+        "parse_plan_text": lambda: app.parse_plan_text(raw),
+        "stream_parse": stream_parse,
+        "attach_grocery_list": lambda: app.attach_grocery_list(app.parse_plan_text(raw)),
+        "render_mealplan": lambda: app.render_mealplan(plan, 2200, "", "bench"),
+        "dash_serialize_mealplan": lambda: to_json(rendered),
+        "rescale_day": lambda: helpers.rescale_day(day, next(targets)),
+        "normalize_mealplan": lambda: helpers.normalize_mealplan(plan["meal_plan"]),
+        "create_recipe_widget": lambda: helpers.create_recipe_widget(next(recipes)),
+        "create_recipe_widget_uncached": lambda: helpers._build_recipe_widget(next(recipes), "bench"),
+        "recipe_widget_payload": lambda: helpers.recipe_widget_payload(next(recipes)),
+    }
+
+
+def run_micro(args):
+    metrics = {}
+    for name, fn in micro_benchmarks().items():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        metrics[f"{name}_us"] = round(time_call(fn, args.min_time), 1)
+        print(f"{name:32} {metrics[f'{name}_us']:>12.1f} us", file=sys.stderr)
+    return metrics
+
+
+# -------------------- RESULTS --------------------
+
+
+def git_commit():
+    """(short commit, whether the tree has uncommitted changes), or (None, None)."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline(results, record, commit=None):
+    """Latest earlier result of the same suite and config from another (or the given) commit."""
+    for previous in reversed(results):
+        if previous["suite"] != record["suite"] or previous["config"] != record["config"]:
+            continue
+        if commit is None and previous["commit"] != record["commit"]:
+            return previous
+        if commit is not None and (previous["commit"] or "").startswith(commit):
+            return previous
+    return None
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s") or metric in ("plans", "immediate_share")
+
+
+def compare(record, previous, threshold):
+    """Print the change of each metric; return the names of the regressed ones."""
+    print(f"\n{record['suite']}: {previous['commit']} -> {record['commit']}")
+    regressions = []
+    for metric, value in record["metrics"].items():
+        before = previous["metrics"].get(metric)
+        if not isinstance(before, (int, float)) or not before:
+            continue
+        change = (value - before) / before
+        worse = -change if higher_is_better(metric) else change
+        mark = ""
+        if worse > threshold:
+            mark = "  REGRESSION"
+            regressions.append(metric)
+        print(f"{metric:40} {before:>12g} {value:>12g} {change:>+8.1%}{mark}")
+    return regressions
+
+
+# -------------------- MAIN --------------------
+
+
+def isolate(directory):
+    """Point the app's shared state (jobs, plan store, locks) at a scratch
+    directory, and the model at the synthetic backend unless configured."""
+    os.environ.setdefault("CULINAIRE_LLM_BACKEND", "synthetic")
+    os.environ["CULINAIRE_JOB_DB"] = os.path.join(directory, "jobs.db")
+    os.environ["CULINAIRE_PLAN_STORE"] = os.path.join(directory, "plans.db")
+    os.environ["CULINAIRE_SINGLEFLIGHT_DIR"] = os.path.join(directory, "singleflight")
+    os.environ.pop("CULINAIRE_PLAN_CACHE_DIR", None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="suite", required=True)
+    load = sub.add_parser("load", help="users driving the callback endpoint")
+    load.add_argument("--users", type=int, default=10, help="concurrent users")
+    load.add_argument("--plans", type=int, default=100, help="plans requested in total")
+    load.add_argument("--repeat", type=float, default=0.3,
+                      help="share of users keeping the form's defaults")
+    load.add_argument("--poll", type=float, default=0.5,
+                      help="seconds between job polls (plan_job_poll interval)")
+    load.add_argument("--seed", type=int, default=1)
+    load.add_argument("--url", help="drive a running server instead of an in-process app")
+    load.add_argument("--pids", nargs="*", help="worker pids of --url, for their memory")
+    micro = sub.add_parser("micro", help="per-call time of the request steps")
+    micro.add_argument("--only", nargs="*", help="benchmarks whose name contains one of these")
+    micro.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    for p in (load, micro):
+        p.add_argument("--results", default=DEFAULT_RESULTS, help="JSON Lines file of the results")
+        p.add_argument("--no-save", action="store_true", help="do not append this run")
+        p.add_argument("--compare", nargs="?", const="", metavar="COMMIT",
+                       help="compare with the latest result of COMMIT (default: another commit)")
+        p.add_argument("--threshold", type=float, default=0.1,
+                       help="relative worsening reported as a regression")
+    args = parser.parse_args(argv)
+
+    if args.suite == "load":
+        config = {k: getattr(args, k) for k in ("users", "plans", "repeat", "poll", "seed")}
+        config["target"] = args.url or "in-process"
+    else:
+        config = {"only": args.only}
+    if args.suite == "micro" or not args.url:
+        config["llm_backend"] = os.environ.get("CULINAIRE_LLM_BACKEND", "synthetic")
+        config["synthetic_latency"] = os.environ.get("CULINAIRE_SYNTHETIC_LATENCY")
+
+    with tempfile.TemporaryDirectory(prefix="culinaire-bench-") as directory:
+        isolate(directory)
+        metrics = run_load(args) if args.suite == "load" else run_micro(args)
+
+    commit, dirty = git_commit()
+    record = {
+        "suite": args.suite,
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": config,
+        "metrics": metrics,
+    }
+    print(json.dumps(record, indent=2))
+
+    status = 0
+    if args.compare is not None:
+        previous = baseline(load_results(args.results), record, args.compare or None)
+        if previous is None:
+            print("\nno earlier result to compare with", file=sys.stderr)
+        elif compare(record, previous, args.threshold):
+            status = 1
+    if not args.no_save:
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""Local recipe catalog: inverted indexes and offline weekly plan assembly.
+
+Recipes are loaded once from a local JSON / JSON Lines file (or the bundled
+sample_recipes) and indexed by ingredient, diet type, meal slot and calorie
+band. plan_week then assembles a 7-day plan by a backtracking search over the
+days — each day close to the calorie target, no recipe twice in a day or on two
+days in a row, none more than max_uses times a week, diet and restrictions
+honored — so common profiles are served without a model call.
+
+File format, one recipe per object:
+    {"name": ..., "prep_time": "10 min", "calories": 320,
+     "ingredients": [{"name": ..., "amount": 200, "amount_type": "g"}, ...],
+     "steps": [...], "slots": ["breakfast"],
+     "diets": [...], "allergens": [...]}
+"slots" defaults to lunch and dinner; "diets" are inferred from the ingredient
+names when missing. "allergens" (optional) names what the ingredient list does
+not show ("sesame" in a bought bun); restrictions are matched against it like
+against the ingredient names, with the terms of restrictions.py.
+"""
+import collections
+import itertools
+import json
+import math
+
+from grocery import canonical_name
+from plan_model import MEAL_SLOTS
+from restrictions import Matcher, compile_restrictions
+from recipes import Ingredient, Recipe, meal_times, sample_recipes
+from recipes import days as WEEK_DAYS
+from rescale import rescale_mealplan
+
+CALORIE_BAND_KCAL = 50
+# Log-error (about 5 % of the day's calories) charged per earlier use of a recipe.
+REUSE_PENALTY = 0.05
+# Log-error credited for recipes that fit few of the possible days (1 / their
+# number of day combos): they are placed while partners for them are left.
+SCARCITY_BONUS = 2.0
+# Days tried by plan_week's search before it gives up on a profile.
+SEARCH_BUDGET = 2000
+
+# Share of the daily target each slot aims for.
+SLOT_SHARE = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.40}
+
+HIGH_CARB_KEYWORDS = ("rice", "pasta", "spaghetti", "noodle", "bread", "tortilla", "oat",
+                      "oatmeal", "granola", "muesli", "quinoa", "couscous", "potato", "flour", "sugar",
+                      "honey", "banana", "bulgur", "cereal")
+
+# What each diet rules out, as restriction text: ingredients are matched by the
+# same terms as a user's restrictions (restrictions.SYNONYMS).
+DIET_RESTRICTIONS = {
+    "pescatarian": "meat",
+    "vegetarian": "meat, seafood",
+    "vegan": "meat, seafood, egg, dairy, honey",
+    "gluten free": "gluten",
+}
+
+# Diets the catalog can serve; anything else is left to the model.
+DIETS = ("omnivore", "vegetarian", "vegan", "pescatarian", "keto", "gluten free")
+
+# Whole words only (plurals allowed): "oat" is not in "goat cheese".
+_HIGH_CARB_MATCHER = Matcher({word: "high carb" for word in HIGH_CARB_KEYWORDS})
+
+
+def infer_diets(names):
+    """Diets compatible with a recipe's (lowercase) ingredient and allergen names."""
+    diets = {"omnivore"}
+    for diet, restrictions in DIET_RESTRICTIONS.items():
+        matcher = compile_restrictions(restrictions)
+        if not any(matcher.matches(name) for name in names):
+            diets.add(diet)
+    if not any(next(_HIGH_CARB_MATCHER.finditer(name), None) for name in names):
+        diets.add("keto")
+    return diets
+
+
+class CatalogRecipe:
+    """A Recipe with the attributes the indexes are built from."""
+
+    __slots__ = ("recipe", "slots", "diets", "allergens", "ingredient_names")
+
+    def __init__(self, recipe, slots, diets=None, allergens=()):
+        self.recipe = recipe
+        self.slots = frozenset(slots)
+        self.ingredient_names = tuple(canonical_name(i.name) for i in recipe.ingredients)
+        self.allergens = tuple(a.lower() for a in allergens or ())
+        self.diets = (
+            frozenset(d.lower() for d in diets) if diets is not None
+            else frozenset(infer_diets(self.ingredient_names + self.allergens))
+        )
+
+    @property
+    def calories(self):
+        return self.recipe.calories
+
+    def to_meal(self):
+        """The meal dict of a plan_dict day."""
+        ingredients = {}
+        for i in self.recipe.ingredients:
+            unit = "" if i.amount_type in ("unit", "units", None) else f" {i.amount_type}"
+            ingredients[i.name] = f"{i.amount}{unit}"
+        return {
+            "meal": self.recipe.name,
+            "calories": self.recipe.calories,
+            "ingredients": ingredients,
+            "recipe": " ".join(self.recipe.steps),
+        }
+
+
+def _recipe_from_json(obj):
+    recipe = Recipe(
+        obj["name"],
+        obj.get("prep_time", ""),
+        float(obj["calories"]),
+        [
+            Ingredient(i["name"], i.get("amount", ""), i.get("amount_type", ""))
+            for i in obj.get("ingredients", [])
+        ],
+        list(obj.get("steps", [])),
+    )
+    return CatalogRecipe(
+        recipe,
+        [s.lower() for s in obj.get("slots", ("lunch", "dinner"))],
+        obj.get("diets"),
+        obj.get("allergens"),
+    )
+
+
+def load_recipes(path):
+    """Read a JSON array or JSON Lines file of recipes."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        objs = json.loads(text)
+    else:
+        objs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [_recipe_from_json(obj) for obj in objs]
+
+
+def sample_catalog_recipes():
+    # sample_recipes alternate breakfast / dinner (see meal_times).
+    return [
+        CatalogRecipe(
+            r,
+            ("breakfast",) if meal_times[i % 2] == "Breakfast" else ("lunch", "dinner"),
+        )
+        for i, r in enumerate(sample_recipes)
+    ]
+
+
+class RecipeCatalog:
+    def __init__(self, recipes):
+        self.recipes = list(recipes)
+        self.by_ingredient = {}
+        self.by_diet = {}
+        self.by_slot = {}
+        self.by_band = {}
+
+        for rid, r in enumerate(self.recipes):
+            for name in r.ingredient_names:
+                self.by_ingredient.setdefault(name, set()).add(rid)
+            for diet in r.diets:
+                self.by_diet.setdefault(diet, set()).add(rid)
+            for slot in r.slots:
+                self.by_slot.setdefault(slot, set()).add(rid)
+            self.by_band.setdefault(self._band(r.calories), []).append(rid)
+
+        self._bands = sorted(self.by_band)
+
+    @classmethod
+    def load(cls, path=None):
+        """Catalog from a local recipe file, or from the bundled sample recipes."""
+        return cls(load_recipes(path) if path else sample_catalog_recipes())
+
+    def __len__(self):
+        return len(self.recipes)
+
+    @staticmethod
+    def _band(calories):
+        return int(calories // CALORIE_BAND_KCAL)
+
+    # -------------------- FILTERING --------------------
+
+    def excluded_by(self, restrictions):
+        """Ids of the recipes violating free restriction text ("egg, peanuts")."""
+        excluded = set()
+        matcher = compile_restrictions(restrictions)
+        if matcher is not None:
+            for name, ids in self.by_ingredient.items():
+                if matcher.matches(name):
+                    excluded |= ids
+            for rid, r in enumerate(self.recipes):
+                if any(matcher.matches(text) for text in (r.recipe.name,) + r.allergens):
+                    excluded.add(rid)
+        return excluded
+
+    def allowed(self, diet_type=None, restrictions=None):
+        """Ids of the recipes compatible with a diet and restrictions, or None
+        if the diet is not one the catalog knows."""
+        diet = (diet_type or "Omnivore").strip().lower()
+        if diet not in DIETS:
+            return None
+        return self.by_diet.get(diet, set()) - self.excluded_by(restrictions)
+
+    # -------------------- PLANNING --------------------
+
+    def nearest(self, calories, ids, limit):
+        """Up to limit ids from ids, closest to calories, walking out by calorie band."""
+        found = []
+        center = self._band(calories)
+        for band in sorted(self._bands, key=lambda b: abs(b - center)):
+            found.extend(i for i in self.by_band[band] if i in ids)
+            if len(found) >= limit:
+                break
+        found.sort(key=lambda i: abs(self.recipes[i].calories - calories))
+        return found[:limit]
+
+    def day_options(self, target, available, min_scale, max_scale, candidates=8):
+        """[(log calorie error, combo)] of one recipe per slot, the day total within
+        portion-scale reach of target, best first."""
+        pools = []
+        for slot in MEAL_SLOTS:
+            ids = available & self.by_slot.get(slot, set())
+            pools.append(self.nearest(target * SLOT_SHARE[slot], ids, candidates))
+            if not pools[-1]:
+                return []
+
+        options = []
+        for combo in itertools.product(*pools):
+            if len(set(combo)) < len(combo):
+                continue
+            total = sum(self.recipes[i].calories for i in combo)
+            if total <= 0 or not min_scale <= target / total <= max_scale:
+                continue
+            options.append((abs(math.log(target / total)), combo))
+        options.sort()
+        return options
+
+    def covers(self, available, target, missing, min_scale, max_scale, max_uses):
+        """Cheap necessary check before the search: enough recipes per slot for
+        the missing days, and a day total within portion-scale reach of target."""
+        low = high = 0
+        for slot in MEAL_SLOTS:
+            ids = available & self.by_slot.get(slot, set())
+            if len(ids) * max_uses < missing:
+                return False
+            calories = [self.recipes[i].calories for i in ids]
+            low += min(calories)
+            high += max(calories)
+        return low * min_scale <= target <= high * max_scale
+
+    def plan_week(
+        self, target, diet_type=None, restrictions=None, min_scale=0.8, max_scale=1.25,
+        max_uses=1, days=None,
+    ):
+        """Assemble {day_name: {slot: meal}} scaled to target kcal, or None if the
+        catalog cannot cover the week for this profile.
+
+        Each recipe is used at most max_uses times a week, never twice in a day or
+        on consecutive days. days ({day_name: meals}, already valid) are kept as
+        they are and only the other days are assembled.
+        """
+        days = days or {}
+        missing = [d for d in WEEK_DAYS if d not in days]
+        if not missing:
+            return {d: days[d] for d in WEEK_DAYS}
+        available = self.allowed(diet_type, restrictions)
+        if not available or not self.covers(
+            available, target, len(missing), min_scale, max_scale, max_uses
+        ):
+            return None
+
+        combos = self._search_week(
+            self.day_options(target, available, min_scale, max_scale), len(missing), max_uses
+        )
+        if combos is None:
+            return None
+        assembled = rescale_mealplan(
+            {
+                day_name: {slot: self.recipes[i].to_meal() for slot, i in zip(MEAL_SLOTS, combo)}
+                for day_name, combo in zip(missing, combos)
+            },
+            target,
+        )
+        return {d: days[d] if d in days else assembled[d] for d in WEEK_DAYS}
+
+    def _search_week(self, options, count, max_uses):
+        """count day combos from options (see day_options) under the reuse rules,
+        by depth-first search; None if there is none within SEARCH_BUDGET days tried.
+
+        Each day prefers the closest calories, the least used recipes and those
+        that fit few days; a branch is cut as soon as the recipes' remaining uses
+        cannot fill the days left.
+        """
+        uses = collections.Counter()
+        fits = collections.Counter(i for _, combo in options for i in set(combo))
+        tried = 0
+        slot_ids = [{combo[k] for _, combo in options} for k in range(len(MEAL_SLOTS))]
+        # Every group of slots needs enough uses left among the recipes serving it
+        # (lunch and dinner usually share theirs).
+        groups = [
+            (len(group), set().union(*group))
+            for size in range(1, len(slot_ids) + 1)
+            for group in itertools.combinations(slot_ids, size)
+        ]
+
+        def capacity(ids, days_left, previous):
+            # No consecutive days: a recipe fits at most every other day left,
+            # starting the day after next if it was served the day before.
+            return sum(
+                min(max_uses - uses[i], (days_left + (i not in previous)) // 2) for i in ids
+            )
+
+        def can_fill(days_left, previous):
+            return all(capacity(ids, days_left, previous) >= days_left * n for n, ids in groups)
+
+        failed = set()  # (uses, previous day) already known to lead nowhere
+
+        def fill(days_left, previous):
+            nonlocal tried
+            if not days_left:
+                return []
+            state = (frozenset(+uses), frozenset(previous))
+            if state in failed or not can_fill(days_left, previous):
+                return None
+            ranked = sorted(
+                (
+                    error
+                    + REUSE_PENALTY * sum(uses[i] for i in combo)
+                    - SCARCITY_BONUS * sum(1 / fits[i] for i in combo),
+                    combo,
+                )
+                for error, combo in options
+                if not set(combo) & previous and all(uses[i] < max_uses for i in combo)
+            )
+            seen = set()
+            for _, combo in ranked:
+                if frozenset(combo) in seen:
+                    continue  # lunch and dinner swapped: the same days left to fill
+                seen.add(frozenset(combo))
+                tried += 1
+                if tried > SEARCH_BUDGET:
+                    return None
+                uses.update(combo)
+                rest = fill(days_left - 1, set(combo))
+                if rest is not None:
+                    return [combo] + rest
+                uses.subtract(combo)
+            failed.add(state)
+            return None
+
+        return fill(count, set())
@@ -0,0 +1,118 @@
+"""Compact wire format for generated plans.
+
+Completion tokens dominate generation time, and most of them used to go to
+JSON keys repeated 21 times a week and to recipe prose few users read. In
+compact mode (CULINAIRE_COMPACT_PLANS) the model writes
+
+    {"p": {"Mon": {"b": M, "l": M, "d": M}, ..., "Sun": {...}},
+     "s": {"c": "CHF 72", "f": "High protein"}}
+    M = {"n": "meal name", "i": [["ingredient", "quantity"], ...], "k": kcal}
+
+without recipes; the functions below expand it server-side into the usual
+plan_dict, and recipe steps are requested per meal when a user opens one.
+Long keys are passed through, so a reply that ignores the format still works.
+"""
+from plan_model import MEAL_SLOTS, coerce_number
+from plan_schema import response_format
+from recipes import days as WEEK_DAYS
+
+PLAN_KEY = "p"
+SUMMARY_KEY = "s"
+DAY_CODES = {day[:3]: day for day in WEEK_DAYS}
+SLOT_CODES = {slot[0]: slot for slot in MEAL_SLOTS}  # b, l, d
+
+COMPACT_MEAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "n": {"type": "string"},
+        "i": {"type": "array", "items": {"type": "array", "items": {"type": "string"}}},
+        "k": {"type": "number"},
+    },
+    "required": ["n", "i", "k"],
+    "additionalProperties": False,
+}
+
+COMPACT_DAY_SCHEMA = {
+    "type": "object",
+    "properties": {code: COMPACT_MEAL_SCHEMA for code in SLOT_CODES},
+    "required": list(SLOT_CODES),
+    "additionalProperties": False,
+}
+
+COMPACT_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        PLAN_KEY: {
+            "type": "object",
+            "properties": {code: COMPACT_DAY_SCHEMA for code in DAY_CODES},
+            "required": list(DAY_CODES),
+            "additionalProperties": False,
+        },
+        SUMMARY_KEY: {
+            "type": "object",
+            "properties": {"c": {"type": "string"}, "f": {"type": "string"}},
+            "required": ["c", "f"],
+            "additionalProperties": False,
+        },
+    },
+    "required": [PLAN_KEY, SUMMARY_KEY],
+    "additionalProperties": False,
+}
+
+COMPACT_PLAN_RESPONSE_FORMAT = response_format("meal_plan_compact", COMPACT_PLAN_SCHEMA)
+
+
+def expand_meal(meal):
+    if not isinstance(meal, dict):
+        return meal
+    ingredients = meal.get("i", meal.get("ingredients"))
+    if isinstance(ingredients, list) and all(
+        isinstance(pair, list) and len(pair) == 2 for pair in ingredients
+    ):
+        ingredients = {str(name): str(quantity) for name, quantity in ingredients}
+    return {
+        "meal": meal.get("n", meal.get("meal")),
+        "ingredients": ingredients,
+        "calories": meal.get("k", meal.get("calories")),
+        "recipe": meal.get("r", meal.get("recipe")) or "",
+    }
+
+
+def expand_meals(meals):
+    """{"b": M, "l": M, "d": M} -> {"breakfast": meal, ...}."""
+    if not isinstance(meals, dict):
+        return meals
+    return {SLOT_CODES.get(slot, slot): expand_meal(meal) for slot, meal in meals.items()}
+
+
+def expand_day(day_code, meals):
+    """("Mon", compact meals) -> ("Monday", meals), as streamed days are published."""
+    name = DAY_CODES.get(str(day_code).strip()[:3].title(), day_code)
+    return name, expand_meals(meals)
+
+
+def expand_plan(plan):
+    """Compact reply -> plan_dict (meal_plan and summary); other replies unchanged."""
+    if not isinstance(plan, dict) or PLAN_KEY not in plan:
+        return plan
+    days = plan[PLAN_KEY]
+    if isinstance(days, dict):
+        meal_plan = dict(expand_day(code, meals) for code, meals in days.items())
+    else:
+        meal_plan = days
+
+    summary = plan.get(SUMMARY_KEY)
+    summary = summary if isinstance(summary, dict) else {}
+    daily = [
+        sum(coerce_number(m.get("calories")) or 0 for m in meals.values() if isinstance(m, dict))
+        for meals in (meal_plan.values() if isinstance(meal_plan, dict) else ())
+        if isinstance(meals, dict)
+    ]
+    return {
+        "meal_plan": meal_plan,
+        "summary": {
+            "average_daily_calories": round(sum(daily) / len(daily)) if daily else "?",
+            "estimated_weekly_cost": summary.get("c", "?"),
+            "nutrition_focus": summary.get("f", "?"),
+        },
+    }
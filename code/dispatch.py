@@ -0,0 +1,155 @@
+"""Latency-aware dispatch of model requests: deadlines, hedging, fallbacks.
+
+A request gets a deadline. If it has not answered once the usual (p90)
+latency of its kind has elapsed, an identical hedge request is sent; close to
+the deadline, one more goes to the fallback model if one is configured. The
+first answer wins and the other attempts are cancelled. An attempt that fails
+starts the next one right away instead of waiting for its turn. At the
+deadline everything left is cancelled and DeadlineExceeded is raised, so the
+caller can fall back to something local (the recipe catalog).
+
+    [0] primary ... [hedge delay] hedge ... [FALLBACK_AT x deadline] fallback model ... [deadline]
+
+Only non-streamed completions (llm.acomplete) are dispatched; streamed plans
+are bounded by the generation deadline (settings.PLAN_DEADLINE) alone.
+
+Latencies are tracked per label over a sliding window. They only include
+answers that won, so the estimate is slightly optimistic once hedging kicks in.
+"""
+import asyncio
+import threading
+from collections import deque
+
+# Latencies kept per label, and how many are needed before trusting the p90.
+WINDOW = 200
+MIN_SAMPLES = 20
+HEDGE_QUANTILE = 0.9
+# Hedge no later than this share of the deadline (and before MIN_SAMPLES).
+MAX_HEDGE_AT = 0.5
+FALLBACK_AT = 0.75
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    pass
+
+
+class LatencyTracker:
+    """Sliding window of successful request latencies, per label."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds):
+        with self._lock:
+            samples = self._samples.get(label)
+            if samples is None:
+                samples = self._samples[label] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, label, q):
+        """The q-quantile of the label's latencies, or None before MIN_SAMPLES."""
+        with self._lock:
+            samples = self._samples.get(label)
+            if not samples or len(samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self):
+        with self._lock:
+            labels = {label: sorted(s) for label, s in self._samples.items()}
+        return {
+            label: {
+                "samples": len(s),
+                "p50": s[len(s) // 2],
+                "p90": s[min(len(s) - 1, int(0.9 * len(s)))],
+                "p99": s[min(len(s) - 1, int(0.99 * len(s)))],
+            }
+            for label, s in labels.items()
+            if s
+        }
+
+
+latency = LatencyTracker()
+_counters = {"requests": 0, "hedged": 0, "fallbacks": 0, "deadline_exceeded": 0, "hedge_wins": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def stats():
+    with _counters_lock:
+        counters = dict(_counters)
+    return {**counters, "latency": latency.snapshot()}
+
+
+def hedge_delay(label, deadline):
+    """Seconds after which a still unanswered request is duplicated."""
+    p90 = latency.quantile(label, HEDGE_QUANTILE)
+    latest = deadline * MAX_HEDGE_AT
+    return latest if p90 is None else min(p90, latest)
+
+
+async def dispatch(request, label, deadline, model, fallback_model=None):
+    """Return the first successful result of request(model) attempts.
+
+    request is a coroutine function taking the model name. Raises
+    DeadlineExceeded when nothing answered within deadline seconds, or the
+    error of the last attempt when every attempt failed before it.
+    """
+    _count("requests")
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    # (offset in seconds, model, kind) of the attempts not started yet.
+    schedule = [(hedge_delay(label, deadline), model, "hedge")]
+    if fallback_model:
+        schedule.append((deadline * FALLBACK_AT, fallback_model, "fallback"))
+    schedule.sort(key=lambda a: a[0])
+
+    running = {}  # task -> kind
+    last_error = None
+
+    def start(model_name, kind):
+        running[asyncio.ensure_future(request(model_name))] = kind
+        if kind != "primary":
+            _count("hedged" if kind == "hedge" else "fallbacks")
+
+    start(model, "primary")
+    try:
+        while True:
+            now = loop.time() - started
+            if now >= deadline:
+                _count("deadline_exceeded")
+                raise DeadlineExceeded(f"{label}: no answer within {deadline:g}s")
+            if not running:
+                if not schedule:
+                    raise last_error
+                # The previous attempts failed: start the next one now.
+                _, next_model, kind = schedule.pop(0)
+                start(next_model, kind)
+                continue
+
+            wake = min(deadline, schedule[0][0]) if schedule else deadline
+            done, _ = await asyncio.wait(
+                running, timeout=max(0.0, wake - now), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                kind = running.pop(task)
+                if task.exception() is None:
+                    latency.record(label, loop.time() - started)
+                    if kind != "primary":
+                        _count("hedge_wins")
+                    return task.result()
+                last_error = task.exception()
+            if not done and schedule and loop.time() - started >= schedule[0][0]:
+                _, next_model, kind = schedule.pop(0)
+                start(next_model, kind)
+    finally:
+        # Losers (and everything, on deadline or cancellation) are cancelled.
+        for task in running:
+            task.cancel()
@@ -0,0 +1,195 @@
+"""Fan-out plan engine: one concurrent completion per day instead of one for the week.
+
+Each day is requested with its own short prompt, so wall-clock latency is
+roughly that of a single day. The grocery list and summary are computed
+locally. Days that failed, and days repeating a meal of an earlier day, are
+regenerated once after the merge.
+"""
+import asyncio
+import json
+import re
+
+import llm
+from compact import expand_meals
+from grocery import build_grocery_list
+from plan_model import MEAL_SLOTS
+from recipes import days as WEEK_DAYS
+from prompts import build_day_messages
+
+DAY_THEMES = {
+    "omnivore": ["chicken", "fish", "legumes", "beef", "eggs", "pork or turkey", "seafood"],
+    "vegetarian": ["eggs", "legumes", "tofu", "cheese", "tempeh", "chickpeas", "lentils"],
+    "vegan": ["tofu", "lentils", "chickpeas", "tempeh", "beans", "seitan", "quinoa"],
+    "pescatarian": ["salmon", "eggs", "white fish", "legumes", "tuna", "shrimp", "tofu"],
+    "keto": ["eggs", "salmon", "chicken", "beef", "cheese", "pork", "avocado"],
+}
+
+GOAL_FOCUS = {
+    "Lose weight": "calorie-controlled, high fiber",
+    "Build muscle": "high protein",
+    "Maintain muscle mass": "adequate protein",
+    "Reduce meat consumption": "plant-forward",
+    "Discover new recipes": "varied cuisines",
+    "Reduce processed food consumption": "whole foods",
+}
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+class FanoutError(Exception):
+    pass
+
+
+def _parse_day(raw, compact=False):
+    match = _JSON_OBJECT_RE.search(raw)
+    day = json.loads(match.group(0) if match else raw)
+    day = day.get("meals", day) if isinstance(day, dict) else day
+    if compact:
+        day = expand_meals(day)
+    if not isinstance(day, dict) or not all(isinstance(day.get(m), dict) for m in MEAL_SLOTS):
+        raise FanoutError("day is missing breakfast, lunch or dinner")
+    return {m: day[m] for m in MEAL_SLOTS}
+
+
+def find_repeated_meals(meal_plan):
+    """Return {day_name: [meal names already used on an earlier day]}."""
+    seen = set()
+    repeats = {}
+    for day_name, meals in meal_plan.items():
+        for slot in MEAL_SLOTS:
+            name = str(meals.get(slot, {}).get("meal", "")).strip().lower()
+            if not name:
+                continue
+            if name in seen:
+                repeats.setdefault(day_name, []).append(name)
+            seen.add(name)
+    return repeats
+
+
+def build_summary(meal_plan, budget, goals):
+    totals = [
+        sum(float(meals[m].get("calories") or 0) for m in MEAL_SLOTS if m in meals)
+        for meals in meal_plan.values()
+    ]
+    focus = [GOAL_FOCUS[g] for g in goals or [] if g in GOAL_FOCUS]
+    return {
+        "average_daily_calories": round(sum(totals) / len(totals)) if totals else 0,
+        "estimated_weekly_cost": f"CHF {budget}" if budget else "?",
+        "nutrition_focus": ", ".join(focus).capitalize() if focus else "Balanced, varied whole foods",
+    }
+
+
+async def _generate_day(semaphore, messages, timeout, compact=False):
+    async with semaphore:
+        raw = await llm.acomplete(messages, temperature=0.7, timeout=timeout, label="day")
+    return _parse_day(raw, compact)
+
+
+async def generate_week(
+    profile_args, daily_calories, concurrency=7, timeout=60, on_day=None, compact=False
+):
+    """Generate all 7 days concurrently; return {day_name: meals}.
+
+    on_day(day_name, meals), if given, is called as soon as each day arrives.
+    With compact, days are requested in the compact wire format (no recipes).
+    A day that fails (error, malformed JSON) is requested once more; FanoutError
+    is raised only if it fails again.
+    """
+    diet = (profile_args["diet_type"] or "Omnivore").lower()
+    themes = DAY_THEMES.get(diet, DAY_THEMES["omnivore"])
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def messages_for(i, day_name, avoid=()):
+        return build_day_messages(
+            day_name,
+            daily_calories=daily_calories,
+            theme=themes[i % len(themes)],
+            avoid_meals=avoid,
+            compact=compact,
+            **profile_args,
+        )
+
+    async def day_task(i, day):
+        meals = await _generate_day(semaphore, messages_for(i, day), timeout, compact)
+        if on_day is not None:
+            on_day(day, meals)
+        return meals
+
+    results = await asyncio.gather(
+        *[day_task(i, day) for i, day in enumerate(WEEK_DAYS)], return_exceptions=True
+    )
+    meal_plan = {}
+    failed = {}
+    for day, result in zip(WEEK_DAYS, results):
+        if isinstance(result, Exception):
+            failed[day] = result
+        else:
+            meal_plan[day] = result
+
+    # Regenerate (once) the days that failed, and for cross-day variety any day
+    # repeating an earlier meal.
+    repeats = find_repeated_meals(meal_plan)
+    retry_days = [day for day in WEEK_DAYS if day in failed or day in repeats]
+    if retry_days:
+        planned = [
+            meals[m]["meal"]
+            for meals in meal_plan.values()
+            for m in MEAL_SLOTS
+            if "meal" in meals[m]
+        ]
+        retried = await asyncio.gather(
+            *[
+                _generate_day(
+                    semaphore,
+                    messages_for(WEEK_DAYS.index(day), day, planned),
+                    timeout,
+                    compact,
+                )
+                for day in retry_days
+            ],
+            return_exceptions=True,
+        )
+        for day, result in zip(retry_days, retried):
+            if not isinstance(result, Exception):
+                meal_plan[day] = result
+                if day in failed and on_day is not None:
+                    on_day(day, result)
+            elif day in failed:
+                # Only a day without any valid answer fails the week.
+                raise FanoutError(f"{day} failed twice: {result}") from result
+
+    return {day: meal_plan[day] for day in WEEK_DAYS}
+
+
+async def fanout_mealplan(
+    body_weight,
+    activity,
+    goals,
+    budget,
+    daily_calories,
+    restrictions,
+    diet_type,
+    location,
+    concurrency=7,
+    on_day=None,
+    compact=False,
+):
+    """Generate a plan_dict with the fan-out engine (coroutine)."""
+    profile_args = dict(
+        body_weight=body_weight,
+        activity=activity,
+        goals=goals,
+        budget=budget,
+        restrictions=restrictions,
+        diet_type=diet_type,
+        location=location,
+    )
+    meal_plan = await generate_week(
+        profile_args, daily_calories, concurrency, on_day=on_day, compact=compact
+    )
+    return {
+        "meal_plan": meal_plan,
+        "grocery_list": build_grocery_list(meal_plan),
+        "summary": build_summary(meal_plan, budget, goals),
+    }
+
@@ -0,0 +1,154 @@
+"""Local, deterministic grocery-list aggregation over the ingredients of a meal plan.
+
+Quantities are parsed into (value, unit), converted to a base unit per
+dimension (g, ml, unit) so that "500 g" and "1 kg" add up, and ingredient
+names are canonicalized ("Chopped Tomatoes" and "tomato" are the same item).
+The output has the grocery_list shape render_mealplan shows:
+[{"item": ..., "quantity": ..., "category": ...}, ...].
+"""
+import re
+
+from plan_model import iter_days
+from quantity import SPOON_UNITS, format_base, format_quantity, parse_quantity, to_base
+
+_DESCRIPTOR_RE = re.compile(
+    r"\b(fresh|chopped|diced|sliced|minced|grated|shredded|large|medium|small|"
+    r"ripe|raw|organic|boneless|skinless|finely|roughly|to taste)\b"
+)
+_NON_WORD_RE = re.compile(r"[^a-z0-9()% -]+")
+_SPACES_RE = re.compile(r"\s+")
+
+# Checked in order; the first category with a matching keyword wins.
+CATEGORY_KEYWORDS = [
+    ("Frozen", ["frozen"]),
+    ("Canned", ["canned", "tinned", "passata", "tomato sauce", "coconut milk"]),
+    ("Spices", ["salt", "black pepper", "cinnamon", "cumin", "paprika", "oregano", "curry powder",
+                "turmeric", "chili flakes", "nutmeg", "vanilla", "herbs", "thyme", "rosemary"]),
+    ("Condiments", ["oil", "vinegar", "soy sauce", "honey", "mustard", "mayonnaise", "ketchup",
+                    "curry paste", "pesto", "tahini", "maple syrup", "dressing", "lemon juice"]),
+    ("Beverages", ["coffee", "tea", "juice", "water"]),
+    ("Dairy", ["milk", "yogurt", "yoghurt", "cheese", "feta", "parmesan", "mozzarella", "butter",
+               "cream", "skyr", "quark", "ricotta"]),
+    ("Protein", ["chicken", "beef", "turkey", "pork", "lamb", "ham", "salmon", "tuna", "cod",
+                 "fish", "shrimp", "prawn", "egg", "tofu", "tempeh", "seitan", "lentil",
+                 "chickpea", "bean", "protein powder"]),
+    ("Bakery", ["bread", "tortilla", "wrap", "bagel", "bun", "pita", "croissant"]),
+    ("Grains", ["rice", "oat", "quinoa", "pasta", "spaghetti", "noodle", "couscous", "bulgur",
+                "barley", "flour", "granola", "muesli", "cereal"]),
+    ("Snacks", ["nut", "almond", "walnut", "cashew", "peanut", "hazelnut", "seed", "chocolate",
+                "cracker", "dried fruit"]),
+    ("Fruit", ["apple", "banana", "berry", "berries", "blueberry", "strawberry", "raspberry",
+               "cranberry", "mango", "pear", "orange", "lemon", "lime", "grape", "kiwi", "peach",
+               "pineapple", "melon", "watermelon", "avocado", "date"]),
+    ("Vegetables", ["spinach", "broccoli", "carrot", "pepper", "tomato", "zucchini", "courgette",
+                    "onion", "garlic", "potato", "lettuce", "cucumber", "kale", "cabbage",
+                    "mushroom", "celery", "leek", "pea", "corn", "cauliflower", "eggplant",
+                    "aubergine", "asparagus", "beet", "squash", "pumpkin", "vegetable", "salad"]),
+]
+
+_CATEGORY_RES = [
+    # Whole words, plurals allowed: "egg" is not in "eggplant".
+    (
+        category,
+        re.compile(r"\b(" + "|".join(sorted(map(re.escape, words), key=len, reverse=True)) + r")(?:s|es)?\b"),
+    )
+    for category, words in CATEGORY_KEYWORDS
+]
+
+
+def _singular(word):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def canonical_name(name):
+    """Lowercase, drop preparation descriptors and singularize the head noun."""
+    text = _NON_WORD_RE.sub(" ", str(name).lower())
+    text = _DESCRIPTOR_RE.sub(" ", text)
+    words = _SPACES_RE.split(text.strip())
+    if not words or words == [""]:
+        return str(name).strip().lower()
+    # Singularize the last word outside any parenthetical note.
+    for i in range(len(words) - 1, -1, -1):
+        if not words[i].startswith("(") and not words[i].endswith(")"):
+            words[i] = _singular(words[i])
+            break
+    return " ".join(words)
+
+
+def categorize(name):
+    key = canonical_name(name)
+    for category, pattern in _CATEGORY_RES:
+        if pattern.search(key):
+            return category
+    return "Other"
+
+
+def iter_ingredients(meal_plan):
+    """Yield (ingredient name, quantity) for every ingredient of every meal."""
+    for _, meals in iter_days(meal_plan):
+        if not isinstance(meals, dict):
+            continue
+        for meal in meals.values():
+            ingredients = meal.get("ingredients") if isinstance(meal, dict) else None
+            if isinstance(ingredients, dict):
+                yield from ingredients.items()
+            elif isinstance(ingredients, list):
+                for ing in ingredients:
+                    if isinstance(ing, dict):
+                        yield ing.get("item") or ing.get("name", "?"), ing.get("quantity", "")
+
+
+def build_grocery_list(meal_plan):
+    """Aggregate the ingredients of all meals into the grocery_list format."""
+    items = {}  # canonical name -> aggregation state
+
+    for name, qty in iter_ingredients(meal_plan):
+        key = canonical_name(name)
+        item = items.get(key)
+        if item is None:
+            item = items[key] = {
+                "name": str(name).strip(),
+                "base": {},  # dimension -> amount in base unit
+                "spoons_only": True,
+                "other": {},  # unknown unit -> amount
+                "unparsed": [],
+            }
+
+        parsed = parse_quantity(qty)
+        if parsed is None:
+            if qty and str(qty) not in item["unparsed"]:
+                item["unparsed"].append(str(qty))
+            continue
+
+        value, unit = parsed
+        base_value, dimension = to_base(value, unit)
+        if dimension is None:
+            item["other"][unit] = item["other"].get(unit, 0) + value
+            continue
+        item["base"][dimension] = item["base"].get(dimension, 0) + base_value
+        if dimension == "volume" and unit not in SPOON_UNITS:
+            item["spoons_only"] = False
+
+    grocery_list = []
+    for item in items.values():
+        parts = [
+            format_base(amount, dimension, item["spoons_only"])
+            for dimension, amount in item["base"].items()
+        ]
+        parts += [format_quantity(amount, unit) for unit, amount in item["other"].items()]
+        parts += item["unparsed"]
+        grocery_list.append(
+            {
+                "item": item["name"],
+                "quantity": " + ".join(parts) or "?",
+                "category": categorize(item["name"]),
+            }
+        )
+    grocery_list.sort(key=lambda g: (g["category"], g["item"].lower()))
+    return grocery_list
@@ -1,17 +1,20 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+
 from recipes import Recipe
+from quantity import Quantity
+from plan_model import iter_days
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-import re
 
 
 def numeric_scale(qty, scale):
-    nums = re.findall(r"[0-9]+\\.?[0-9]*", qty)
-    if not nums:
+    quantity = Quantity.parse(qty)
+    if not quantity.amounts:
         return qty
-    for num in nums:
-        new_val = round(float(num) * scale, 1)
-        qty = qty.replace(num, str(new_val), 1)
-    return qty
+    return quantity.scaled(scale).format()
 
 def rescale_day(day_dict, target):
     meals = ["breakfast","lunch","dinner"]
@@ -27,60 +30,146 @@ def rescale_day(day_dict, target):
     return day_dict
 
 def normalize_mealplan(mp):
-    if isinstance(mp, list):
-        return [(d.get("day", f"Day {i+1}"), d.get("meals", d)) for i, d in enumerate(mp)]
-    if isinstance(mp, dict):
-        return [(k.replace("_", " ").title(), v) for k,v in mp.items()]
-    return []
+    return list(iter_days(mp))
 
 
-def create_recipe_widget(recipe: Recipe):
+# -------------------- RECIPE WIDGETS --------------------
+
+# Shared style objects: built once instead of once per ingredient / star.
+INGREDIENT_STYLE = {
+    "backgroundColor": "white",
+    "borderRadius": "6px",
+    "border": "1px solid grey",
+    "textAlign": "left",
+    "padding": "10px",
+    "margin": "5px",
+    "width": "260px",
+    "display": "inline-block",
+    "verticalAlign": "top",
+    "fontSize": "14px",
+}
+INGREDIENT_NAME_STYLE = {"fontWeight": "bold"}
+ORDER_BUTTON_STYLE = {"marginBottom": "5px", "float": "right"}
+HEADER_STYLE = {"display": "flex", "marginBottom": "10px"}
+TITLE_STYLE = {"width": "60%", "fontWeight": "bold", "fontSize": "18px"}
+HEADER_CELL_STYLE = {"width": "20%", "textAlign": "center"}
+INGREDIENTS_STYLE = {"display": "flex", "flexWrap": "wrap", "marginBottom": "10px"}
+TOGGLE_BUTTON_STYLE = {"marginBottom": "5px"}
+RATE_LABEL_STYLE = {"marginRight": "10px"}
+STAR_STYLE = {"cursor": "pointer", "fontSize": "20px", "color": "#ccc"}
+RATING_STYLE = {"marginTop": "10px"}
+CARD_STYLE = {"borderRadius": "15px", "border": "1px solid grey", "marginBottom": "20px", "padding": "10px"}
+
+WIDGET_CACHE_SIZE = 1024
+
+_widgets = OrderedDict()  # recipe fingerprint -> [component, serialized payload or None]
+_widgets_lock = threading.Lock()
+
+
+def recipe_fingerprint(recipe: Recipe):
+    """Content hash of a recipe: equal recipes share one cached widget."""
+    data = [
+        recipe.name,
+        recipe.prep_time,
+        recipe.calories,
+        [[i.name, i.amount, i.amount_type] for i in recipe.ingredients],
+        list(recipe.steps),
+    ]
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def to_payload(value):
+    """Serialize a component tree to the plain JSON-able structure Dash sends."""
+    if hasattr(value, "to_plotly_json"):
+        value = value.to_plotly_json()
+    if isinstance(value, dict):
+        return {k: to_payload(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_payload(v) for v in value]
+    return value
+
+
+# Pattern-matching ids: one callback per interaction serves every card.
+ORDER_TYPE = "recipe-order"
+STEPS_TOGGLE_TYPE = "recipe-steps-toggle"
+STEPS_TYPE = "recipe-steps"
+STAR_TYPE = "recipe-star"
+
+
+def _build_recipe_widget(recipe: Recipe, recipe_key):
     ingredient_squares = []
     for ing in recipe.ingredients:
         ingredient_squares.append(
             html.Div([
-                html.Div(ing.name, style={"fontWeight": "bold"}),
+                html.Div(ing.name, style=INGREDIENT_NAME_STYLE),
                 html.Div(f"{ing.amount} {ing.amount_type}"),
-                dbc.Button("Order", id=f"order_{ing.name}", color="secondary", size="sm", n_clicks=0, style={"marginBottom": "5px", "float": "right"}),
-
-            ], style={
-                "backgroundColor": "white",
-                "borderRadius": "6px",
-                "border": "1px solid grey",
-                "textAlign": "left",
-                "padding": "10px",
-                "margin": "5px",
-                "width": "260px",
-                "display": "inline-block",
-                "verticalAlign": "top",
-                "fontSize": "14px",
-                
-            })
+                dbc.Button(
+                    "Order",
+                    id={"type": ORDER_TYPE, "recipe": recipe_key, "ingredient": ing.name},
+                    color="secondary", size="sm", n_clicks=0, style=ORDER_BUTTON_STYLE,
+                ),
+            ], style=INGREDIENT_STYLE)
         )
-    # Create expandable steps section with a collapsible toggle
-    steps_id = f"steps-{recipe.name.replace(' ', '-')}"
-    rate_id = f"rate-{recipe.name.replace(' ', '-')}"
 
     return dbc.Card([
         dbc.CardBody([
             html.Div([
-                html.Div(recipe.name, style={"width": "60%", "fontWeight": "bold", "fontSize": "18px"}),
-                html.Div(recipe.prep_time, style={"width": "20%", "textAlign": "center"}),
-                html.Div(f"{recipe.calories} kcal", style={"width": "20%", "textAlign": "center"}),
-            ], style={"display": "flex", "marginBottom": "10px"}),
-            html.Div(ingredient_squares, style={"display": "flex", "flexWrap": "wrap", "marginBottom": "10px"}),
-            # Collapsible steps
-            dbc.Button("Show/Hide Steps", id=f"toggle-{steps_id}", color="secondary", size="sm", n_clicks=0, style={"marginBottom": "5px"}),
+                html.Div(recipe.name, style=TITLE_STYLE),
+                html.Div(recipe.prep_time, style=HEADER_CELL_STYLE),
+                html.Div(f"{recipe.calories} kcal", style=HEADER_CELL_STYLE),
+            ], style=HEADER_STYLE),
+            html.Div(ingredient_squares, style=INGREDIENTS_STYLE),
+            # Collapsible steps (toggled client-side)
+            dbc.Button(
+                "Show/Hide Steps",
+                id={"type": STEPS_TOGGLE_TYPE, "recipe": recipe_key},
+                color="secondary", size="sm", n_clicks=0, style=TOGGLE_BUTTON_STYLE,
+            ),
             dbc.Collapse(
                 html.Ol([html.Li(step) for step in recipe.steps]),
-                id=steps_id,
+                id={"type": STEPS_TYPE, "recipe": recipe_key},
                 is_open=False
             ),
             # Rate this recipe stars
             html.Div([
-                html.Span("Rate this recipe: ", style={"marginRight": "10px"}),
-                *[html.Span("☆", id=f"{rate_id}-star-{i}", style={"cursor": "pointer", "fontSize": "20px", "color": "#ccc"}) for i in range(1,6)]
-            ], style={"marginTop": "10px"}),
+                html.Span("Rate this recipe: ", style=RATE_LABEL_STYLE),
+                *[
+                    html.Span("☆", id={"type": STAR_TYPE, "recipe": recipe_key, "star": i}, n_clicks=0, style=STAR_STYLE)
+                    for i in range(1, 6)
+                ]
+            ], style=RATING_STYLE),
         ]),
-    ], style={"borderRadius": "15px", "border": "1px solid grey", "marginBottom": "20px", "padding": "10px"})
+    ], style=CARD_STYLE)
+
+
+def _cached_widget(recipe: Recipe):
+    key = recipe_fingerprint(recipe)
+    with _widgets_lock:
+        entry = _widgets.get(key)
+        if entry is not None:
+            _widgets.move_to_end(key)
+            return entry
+    entry = [_build_recipe_widget(recipe, key[:16]), None]
+    with _widgets_lock:
+        entry = _widgets.setdefault(key, entry)
+        if len(_widgets) > WIDGET_CACHE_SIZE:
+            _widgets.popitem(last=False)
+    return entry
+
+
+def create_recipe_widget(recipe: Recipe):
+    """Recipe card component, built once per distinct recipe content.
+
+    The returned tree is shared between calls and must not be mutated.
+    """
+    return _cached_widget(recipe)[0]
+
 
+def recipe_widget_payload(recipe: Recipe):
+    """Serialized recipe card, ready to return from a callback without
+    re-walking the component tree."""
+    entry = _cached_widget(recipe)
+    if entry[1] is None:
+        entry[1] = to_payload(entry[0])
+    return entry[1]
@@ -0,0 +1,201 @@
+"""SQLite-backed queue of meal-plan generation jobs.
+
+A click submits a job and gets its id back immediately; the page then polls
+the job. Job state (status, days streamed so far, result) lives in a SQLite
+database on local disk, so any gunicorn worker of the node can answer a poll,
+and identical in-flight profiles share one job through their dedupe key.
+The job itself runs as a coroutine on the LLM event loop of the worker that
+created it. Its writes (status, days, result) go through one writer thread,
+in order, so a busy database never blocks the loop and the completions
+running on it.
+"""
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    target NUMERIC,
+    days TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    error_type TEXT,
+    error TEXT,
+    raw TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status);
+"""
+
+IN_FLIGHT = ("queued", "running")
+
+logger = logging.getLogger("culinaire.jobs")
+
+
+class JobProgress:
+    """Handle given to a job runner to publish partial results."""
+
+    def __init__(self, queue, job_id):
+        self._queue = queue
+        self.job_id = job_id
+        self.raw = ""
+
+    def add_day(self, day_name, meals):
+        # Called on the event loop: queued for the writer thread, not awaited.
+        self._queue._write(self._queue._append_day, self.job_id, day_name, meals)
+
+
+class JobQueue:
+    def __init__(self, path, stale_after=300, ttl=3600):
+        self.path = path
+        self.stale_after = stale_after
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+        self._writes = queue.SimpleQueue()
+        threading.Thread(target=self._writer, name="job-writer", daemon=True).start()
+
+    # -------------------- PUBLIC API --------------------
+
+    def submit(self, dedupe_key, target, runner, schedule):
+        """Return the id of the in-flight job for dedupe_key, creating it if needed.
+
+        runner is a coroutine function taking a JobProgress and returning the
+        job's JSON-serializable result (the plan and its id); schedule runs a coroutine in the background (llm.submit).
+        """
+        now = time.time()
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?) AND updated > ? "
+                "ORDER BY created DESC LIMIT 1",
+                (dedupe_key, *IN_FLIGHT, now - self.stale_after),
+            ).fetchone()
+            if row is not None:
+                db.execute("COMMIT")
+                return row[0]
+
+            job_id = uuid.uuid4().hex
+            db.execute(
+                "INSERT INTO jobs (id, dedupe_key, status, target, created, updated) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, dedupe_key, target, now, now),
+            )
+            db.execute("DELETE FROM jobs WHERE created < ?", (now - self.ttl,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+        schedule(self._execute(job_id, runner))
+        return job_id
+
+    def get(self, job_id):
+        """Return the job as a dict, or None for an unknown id."""
+        row = self._connect().execute(
+            "SELECT status, target, days, result, error_type, error, raw, updated "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        status, target, days, result, error_type, error, raw, updated = row
+        if status in IN_FLIGHT and updated < time.time() - self.stale_after:
+            # The worker running it died or hung.
+            status, error_type, error = "failed", "TimeoutError", "generation timed out"
+        return {
+            "id": job_id,
+            "status": status,
+            "target": target,
+            "days": json.loads(days),
+            "result": json.loads(result) if result else None,
+            "error_type": error_type,
+            "error": error,
+            "raw": raw or "",
+        }
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return dict(rows.fetchall())
+
+    # -------------------- EXECUTION --------------------
+
+    async def _execute(self, job_id, runner):
+        progress = JobProgress(self, job_id)
+        self._write(self._update, job_id, status="running")
+        try:
+            result = await runner(progress)
+        except Exception as e:
+            update = self._write(
+                self._update,
+                job_id,
+                status="failed",
+                error_type=type(e).__name__,
+                error=str(e),
+                raw=progress.raw,
+            )
+        else:
+            update = self._write(
+                self._update, job_id, status="done", result=json.dumps(result), raw=progress.raw
+            )
+        await asyncio.wrap_future(update)
+
+    def _write(self, fn, *args, **kwargs):
+        """Run fn on the writer thread after the writes queued before it; return a Future."""
+        future = Future()
+        self._writes.put((fn, args, kwargs, future))
+        return future
+
+    def _writer(self):
+        while True:
+            fn, args, kwargs, future = self._writes.get()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                logger.exception("job write %s failed", fn.__name__)
+                future.set_exception(e)
+
+    def _append_day(self, job_id, day_name, meals):
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            (days,) = db.execute("SELECT days FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            days = json.loads(days)
+            days.append([day_name, meals])
+            db.execute(
+                "UPDATE jobs SET days = ?, updated = ? WHERE id = ?",
+                (json.dumps(days), time.time(), job_id),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(
+            f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+        )
+
+    def _connect(self):
+        # One connection per thread; autocommit, explicit transactions where needed.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
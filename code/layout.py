@@ -19,7 +19,7 @@ layout = html.Div([
           value=69,
           marks={i: str(i) for i in range(0, 201, 20)},
           tooltip={"placement": "bottom"},
-          updatemode='drag',
+          updatemode='mouseup',
         ),
 
         html.Label("Weekly food budget (CHF)"),
@@ -30,7 +30,7 @@ layout = html.Div([
               value=80,
               marks={i: str(i) for i in range(0, 201, 20)},
               tooltip={"placement": "bottom"},
-              updatemode='drag',
+              updatemode='mouseup',
           ),
           id="budget_slider_container"
         ),
@@ -49,7 +49,7 @@ layout = html.Div([
               value=2400,
               marks={i: str(i) for i in range(0, 5001, 500)},
               tooltip={"placement": "bottom"},
-              updatemode='drag',
+              updatemode='mouseup',
           ),
           id="calories_slider_container"
         ),
@@ -57,8 +57,9 @@ layout = html.Div([
             options=[{"label": "Compute for me", "value": "ignore"}],
             value=[],
             id="calories_ignore",
-            style={"marginBottom": "20px"}
+            style={"marginBottom": "5px"}
         ),
+        html.Div(id="calories_estimate", style={"color": "gray", "marginBottom": "20px"}),
         
         html.Label("Activity level"),
         dcc.Dropdown(
@@ -129,10 +130,21 @@ layout = html.Div([
         style={"maxWidth": "600px", "margin": "40px auto"}
     ),
 
+    # Recipe card state: ingredients to order, and ratings kept in the browser
+    dcc.Store(id="order_cart", storage_type="session"),
+    dcc.Store(id="recipe_ratings", storage_type="local"),
+    html.Div(id="order_cart_summary", style={"maxWidth": "600px", "margin": "auto"}),
+
+    # Background generation job: its id + poller for its progress
+    dcc.Location(id="url"),
+    dcc.Store(id="plan_job"),
+    dcc.Interval(id="plan_job_poll", interval=500, disabled=True),
+
     # 🔥 Wrap the plan output in a Loading spinner
     dcc.Loading(
         id="plan_loading",
         type="default",
+        delay_show=400,
         children=html.Div(
             id="plan_output",
             style={"marginTop": "40px", "maxWidth": "600px", "margin": "auto"}
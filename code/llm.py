@@ -0,0 +1,220 @@
+"""Shared, non-blocking access to the language model.
+
+All completions of the process run on one asyncio event loop (in a daemon
+thread) through one backend (backends.py: the OpenAI API by default, or
+recorded answers, or a synthetic generator for load tests; see
+settings.LLM_BACKEND). In-flight requests are bounded by a semaphore, every
+request has a timeout and transient failures are retried with exponential
+backoff.
+Callbacks either submit coroutines and return immediately (streams, jobs) or
+wait on the result without holding a connection of their own.
+
+The prompt and completion tokens of every request are logged (logger
+"culinaire.llm") and added up per label in token_usage.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import openai
+
+import backends
+import dispatch
+import settings
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    backends.BackendError,
+)
+
+_loop = None
+_backend = None
+_semaphore = None
+_lock = threading.Lock()
+
+logger = logging.getLogger("culinaire.llm")
+
+
+# -------------------- EVENT LOOP --------------------
+
+
+def get_loop():
+    """Return the background event loop, starting it on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+
+def submit(coro):
+    """Schedule a coroutine on the LLM loop; return a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro, timeout=None):
+    """Run a coroutine on the LLM loop and wait for its result."""
+    return submit(coro).result(timeout)
+
+
+# -------------------- BACKEND --------------------
+
+
+def get_backend():
+    """Return the process-wide backend, created from settings on first use."""
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = backends.from_settings(settings)
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the backend (benchmarks, scripts); return the previous one."""
+    global _backend
+    with _lock:
+        previous, _backend = _backend, backend
+    return previous
+
+
+def _get_semaphore():
+    """The concurrency bound of the loop (must be called on the LLM loop)."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def _with_retries(make_request):
+    attempt = 0
+    while True:
+        try:
+            return await make_request()
+        except RETRYABLE_ERRORS:
+            attempt += 1
+            if attempt > settings.LLM_MAX_RETRIES:
+                raise
+            delay = settings.LLM_BACKOFF * (2 ** (attempt - 1))
+            await asyncio.sleep(delay * (0.5 + random.random()))
+
+
+# -------------------- TOKEN ACCOUNTING --------------------
+
+
+class TokenUsage:
+    """Requests and tokens per label ("plan", "day", "recipe"...), process-wide."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, label, usage, seconds):
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+        with self._lock:
+            totals = self._totals.setdefault(
+                label, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+            )
+            totals["requests"] += 1
+            totals["prompt_tokens"] += prompt
+            totals["completion_tokens"] += completion
+            totals["seconds"] += seconds
+        logger.info(
+            "%s: %d prompt + %d completion tokens in %.2fs", label, prompt, completion, seconds
+        )
+
+    def snapshot(self):
+        with self._lock:
+            return {label: dict(totals) for label, totals in self._totals.items()}
+
+
+token_usage = TokenUsage()
+
+
+# -------------------- COMPLETIONS --------------------
+
+
+async def acomplete(
+    messages, model=None, temperature=0.5, timeout=None, label="completion", deadline=None, **kwargs
+):
+    """Return the text of a chat completion.
+
+    With a deadline (seconds; default settings.LLM_DEADLINE, 0 for none) the
+    request is hedged, falls back to settings.LLM_FALLBACK_MODEL and raises
+    dispatch.DeadlineExceeded when it runs out (see dispatch.py).
+    """
+    backend = get_backend()
+    semaphore = _get_semaphore()
+    deadline = settings.LLM_DEADLINE if deadline is None else deadline
+
+    def request(model_name):
+        async def create():
+            async with semaphore:
+                return await backend.complete(
+                    messages, model_name, temperature, timeout or settings.LLM_TIMEOUT, **kwargs
+                )
+
+        return _with_retries(create)
+
+    started = time.monotonic()
+    if deadline:
+        text, usage = await dispatch.dispatch(
+            request, label, deadline, model or settings.LLM_MODEL, settings.LLM_FALLBACK_MODEL
+        )
+    else:
+        text, usage = await request(model or settings.LLM_MODEL)
+    token_usage.record(label, usage, time.monotonic() - started)
+    return text
+
+
+async def astream(messages, model=None, temperature=0.5, timeout=None, label="stream", **kwargs):
+    """Yield the text deltas of a streamed chat completion.
+
+    Opening the stream is retried; a failure mid-stream is raised to the caller.
+    Streams are not dispatched (no deadline, hedge or fallback): a hedge would
+    duplicate a whole streamed plan, so the caller bounds the stream instead
+    (settings.PLAN_DEADLINE for plans).
+    """
+    backend = get_backend()
+    started = time.monotonic()
+    usage = None
+    async with _get_semaphore():
+        deltas = await _with_retries(
+            lambda: backend.stream(
+                messages,
+                model or settings.LLM_MODEL,
+                temperature,
+                timeout or settings.LLM_TIMEOUT,
+                **kwargs,
+            )
+        )
+        async for delta in deltas:
+            # Backends end the stream with the usage of the request, if known.
+            if isinstance(delta, str):
+                yield delta
+            else:
+                usage = delta
+    token_usage.record(label, usage, time.monotonic() - started)
+
+
+def complete(messages, model=None, temperature=0.5, timeout=None, label="completion", **kwargs):
+    """Blocking wrapper around acomplete for synchronous callers."""
+    return run(acomplete(messages, model, temperature, timeout, label, **kwargs))
+
+
+def stream(messages, model=None, temperature=0.5, timeout=None, label="stream", **kwargs):
+    """Blocking iterator over the text deltas of astream, for synchronous callers."""
+    deltas = astream(messages, model, temperature, timeout, label, **kwargs)
+    while True:
+        try:
+            yield run(deltas.__anext__())
+        except StopAsyncIteration:
+            return
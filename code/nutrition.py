@@ -0,0 +1,128 @@
+"""Energy and macro targets from a profile ("Compute for me").
+
+Resting energy is estimated from body weight alone (the form has no height,
+age or sex), multiplied by the activity factor and adjusted for the goals.
+Everything is computed on NumPy arrays, so the same code serves one form
+submission, the cache-key canonicalizer and bulk precomputation over grids of
+profiles; goals are encoded as a bitmask and looked up in precomputed tables.
+The constants mirror assets/form.js, which shows the same estimate live.
+"""
+import numpy as np
+
+DEFAULT_CALORIES = 2000
+MIN_CALORIES = 1200
+ROUND_KCAL = 50
+REST_KCAL_PER_KG = 24.0
+
+ACTIVITY_LEVELS = ("Sedentary", "Lightly active", "Moderately active", "Very active", "Extra active")
+ACTIVITY_FACTORS = np.array([1.2, 1.375, 1.55, 1.725, 1.9])
+DEFAULT_ACTIVITY = ACTIVITY_LEVELS.index("Moderately active")
+
+GOALS = (
+    "Lose weight",
+    "Build muscle",
+    "Maintain muscle mass",
+    "Reduce meat consumption",
+    "Discover new recipes",
+    "Reduce processed food consumption",
+)
+GOAL_KCAL = (-500, 300, 0, 0, 0, 0)
+# Protein (g per kg of body weight) asked for by each goal; the highest wins.
+GOAL_PROTEIN_G_PER_KG = (1.8, 2.0, 1.6, 0.0, 0.0, 0.0)
+BASE_PROTEIN_G_PER_KG = 1.2
+MAX_PROTEIN_SHARE = 0.35
+
+FAT_SHARE = 0.30
+KETO_FAT_SHARE = 0.70
+
+KCAL_PER_G = {"protein": 4.0, "fat": 9.0, "carbs": 4.0}
+
+
+def _mask_tables():
+    masks = np.arange(1 << len(GOALS))
+    bits = (masks[:, None] >> np.arange(len(GOALS))) & 1
+    kcal = bits @ np.array(GOAL_KCAL, dtype=np.float64)
+    protein = np.maximum(
+        BASE_PROTEIN_G_PER_KG, (bits * np.array(GOAL_PROTEIN_G_PER_KG)).max(axis=1)
+    )
+    return kcal, protein
+
+
+# Goal adjustment and protein need for each of the 2**len(GOALS) goal masks.
+KCAL_BY_GOAL_MASK, PROTEIN_BY_GOAL_MASK = _mask_tables()
+
+# -------------------- ENCODING --------------------
+
+
+def encode_activity(levels):
+    """Activity labels -> indexes into ACTIVITY_LEVELS (unknown -> moderately active)."""
+    index = {a.lower(): i for i, a in enumerate(ACTIVITY_LEVELS)}
+    return np.array(
+        [index.get((a or "").strip().lower(), DEFAULT_ACTIVITY) for a in levels], dtype=np.intp
+    )
+
+
+def encode_goals(goal_lists):
+    """Lists of goal labels -> bitmasks over GOALS (unknown goals are ignored)."""
+    index = {g.lower(): i for i, g in enumerate(GOALS)}
+    masks = np.zeros(len(goal_lists), dtype=np.intp)
+    for row, goals in enumerate(goal_lists):
+        for goal in goals or ():
+            i = index.get(str(goal).strip().lower())
+            if i is not None:
+                masks[row] |= 1 << i
+    return masks
+
+
+# -------------------- BATCH API --------------------
+
+
+def batch_calories(weights, activity_codes, goal_masks):
+    """Daily kcal targets for arrays of profiles (NaN weights get DEFAULT_CALORIES)."""
+    weights = np.asarray(weights, dtype=np.float64)
+    kcal = weights * REST_KCAL_PER_KG * ACTIVITY_FACTORS[activity_codes]
+    kcal += KCAL_BY_GOAL_MASK[goal_masks]
+    kcal = np.maximum(MIN_CALORIES, np.rint(kcal / ROUND_KCAL) * ROUND_KCAL)
+    return np.where(np.isnan(weights) | (weights <= 0), DEFAULT_CALORIES, kcal)
+
+
+def batch_macros(weights, calories, goal_masks, keto=False):
+    """(protein_g, fat_g, carbs_g) arrays for daily kcal targets."""
+    weights = np.asarray(weights, dtype=np.float64)
+    calories = np.asarray(calories, dtype=np.float64)
+    protein_kcal = np.minimum(
+        np.nan_to_num(weights) * PROTEIN_BY_GOAL_MASK[goal_masks] * KCAL_PER_G["protein"],
+        calories * MAX_PROTEIN_SHARE,
+    )
+    fat_kcal = calories * np.where(keto, KETO_FAT_SHARE, FAT_SHARE)
+    carbs_kcal = np.maximum(0.0, calories - protein_kcal - fat_kcal)
+    return (
+        np.rint(protein_kcal / KCAL_PER_G["protein"]),
+        np.rint(fat_kcal / KCAL_PER_G["fat"]),
+        np.rint(carbs_kcal / KCAL_PER_G["carbs"]),
+    )
+
+
+# -------------------- SINGLE PROFILE --------------------
+
+
+def _weight(body_weight):
+    return float(body_weight) if body_weight else np.nan
+
+
+def estimate_calories(body_weight, activity, goals):
+    """Daily kcal target of one profile, as an int."""
+    return int(
+        batch_calories(
+            [_weight(body_weight)], encode_activity([activity]), encode_goals([goals])
+        )[0]
+    )
+
+
+def macro_targets(body_weight, daily_calories, goals, diet_type=None):
+    """{"protein_g", "fat_g", "carbs_g"} for one profile."""
+    keto = (diet_type or "").strip().lower() == "keto"
+    protein, fat, carbs = batch_macros(
+        [_weight(body_weight)], [daily_calories], encode_goals([goals]), keto
+    )
+    return {"protein_g": int(protein[0]), "fat_g": int(fat[0]), "carbs_g": int(carbs[0])}
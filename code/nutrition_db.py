@@ -0,0 +1,291 @@
+"""Local ingredient nutrition table, memory-mapped for zero-copy lookups.
+
+The table (data/nutrition.csv: kcal, protein, carbs and fat per 100 g, grams
+per unit, density) is compiled into a single binary file of columns, an
+open-addressing hash index on the canonical ingredient name and a names blob:
+
+    header   4 x uint64: magic, rows, index slots, names blob bytes
+    values   6 x rows float32, one column after the other (COLUMNS)
+    keys     slots x uint64   hash of the name in each index slot
+    rows     slots x int32    row of each index slot, -1 when empty
+    offsets  (rows + 1) x uint32 into the names blob
+    names    UTF-8 bytes
+
+Every gunicorn worker maps the same file read-only, so the table lives once
+in the page cache. Names missing from the index fall back to their head noun,
+the last word ("smoked salmon" -> "salmon"), and then to a fuzzy match; those
+approximate matches are good enough for grocery totals but never override the
+calories a plan states.
+
+Usage: python nutrition_db.py data/nutrition.csv nutrition.bin
+"""
+import csv
+import difflib
+import hashlib
+import math
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from grocery import canonical_name
+from quantity import parse_quantity, to_base
+
+MAGIC = int.from_bytes(b"CNUTRDB1", "little")
+COLUMNS = ("kcal", "protein", "carbs", "fat", "unit_g", "density")
+HEADER = np.dtype("<u8")
+
+# Grams for units the quantity parser keeps as-is.
+UNIT_GRAMS = {"slice": 30.0, "slices": 30.0, "clove": 5.0, "cloves": 5.0, "pinch": 0.5,
+              "handful": 30.0, "can": 400.0, "cans": 400.0, "scoop": 30.0, "scoops": 30.0}
+
+FUZZY_CUTOFF = 0.85
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nutrition.csv")
+
+
+def name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# -------------------- BUILD --------------------
+
+
+def build_db(source, path):
+    """Compile a nutrition CSV into the binary table at path (written atomically)."""
+    rows = {}
+    with open(source, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            values = [float(record[c]) if record.get(c) else math.nan for c in COLUMNS]
+            rows[canonical_name(record["name"])] = values
+    names = list(rows)
+    n = len(names)
+
+    values = np.array([rows[name] for name in names], dtype="<f4").T.copy()
+    slots = 1 << max(3, (2 * n - 1).bit_length())
+    keys = np.zeros(slots, dtype="<u8")
+    index = np.full(slots, -1, dtype="<i4")
+    for row, name in enumerate(names):
+        h = name_hash(name)
+        slot = h & (slots - 1)
+        while index[slot] != -1:
+            slot = (slot + 1) & (slots - 1)
+        keys[slot] = h
+        index[slot] = row
+
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(n + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = b"".join(encoded)
+    header = np.array([MAGIC, n, slots, len(blob)], dtype=HEADER)
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for array in (header, values, keys, index, offsets):
+                f.write(array.tobytes())
+            f.write(blob)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+# -------------------- LOOKUP --------------------
+
+
+class NutritionDB:
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, n, slots, blob_len = np.frombuffer(self._map, dtype=HEADER, count=4)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a nutrition table")
+        self.rows = int(n)
+        self._slots = int(slots)
+
+        offset = 4 * HEADER.itemsize
+        self.values = np.frombuffer(self._map, dtype="<f4", count=6 * self.rows, offset=offset)
+        self.values = self.values.reshape(len(COLUMNS), self.rows)
+        offset += self.values.nbytes
+        self._keys = np.frombuffer(self._map, dtype="<u8", count=self._slots, offset=offset)
+        offset += self._keys.nbytes
+        self._index = np.frombuffer(self._map, dtype="<i4", count=self._slots, offset=offset)
+        offset += self._index.nbytes
+        self._offsets = np.frombuffer(self._map, dtype="<u4", count=self.rows + 1, offset=offset)
+        offset += self._offsets.nbytes
+        self._names = np.frombuffer(self._map, dtype=np.uint8, count=int(blob_len), offset=offset)
+
+        self._fuzzy = {}  # name -> row or None, per process
+        self._all_names = None
+
+    def __len__(self):
+        return self.rows
+
+    def name(self, row):
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return self._names[start:end].tobytes().decode("utf-8")
+
+    def exact(self, name):
+        """Row of a canonical name, or None."""
+        h = name_hash(name)
+        slot = h & (self._slots - 1)
+        while True:
+            row = int(self._index[slot])
+            if row == -1:
+                return None
+            if int(self._keys[slot]) == h and self.name(row) == name:
+                return row
+            slot = (slot + 1) & (self._slots - 1)
+
+    def match(self, ingredient):
+        """(row, exact) for a free ingredient name, or (None, False).
+
+        exact is False when the row comes from the head-noun or fuzzy fallback.
+        """
+        key = canonical_name(ingredient)
+        row = self.exact(key)
+        if row is not None:
+            return row, True
+        if key in self._fuzzy:
+            return self._fuzzy[key], False
+
+        # Only the head noun: "chicken stock" is stock, "butter beans" beans.
+        words = key.split()
+        row = self.exact(words[-1]) if len(words) > 1 else None
+        if row is None:
+            if self._all_names is None:
+                self._all_names = {self.name(r): r for r in range(self.rows)}
+            close = difflib.get_close_matches(key, self._all_names, n=1, cutoff=FUZZY_CUTOFF)
+            row = self._all_names[close[0]] if close else None
+        self._fuzzy[key] = row
+        return row, False
+
+    def find(self, ingredient):
+        """Row for a free ingredient name, exact or approximate; or None."""
+        return self.match(ingredient)[0]
+
+    def grams(self, row, quantity):
+        """Weight in grams of a quantity string for a row, or None if it cannot be told."""
+        parsed = parse_quantity(quantity)
+        if parsed is None:
+            return None
+        value, unit = parsed
+        base, dimension = to_base(value, unit)
+        unit_g, density = self.values[4, row], self.values[5, row]
+        if dimension == "mass":
+            return base
+        if dimension == "volume":
+            return base * (1.0 if math.isnan(density) else float(density))
+        if dimension == "count":
+            return None if math.isnan(unit_g) else base * float(unit_g)
+        grams = UNIT_GRAMS.get(unit)
+        return value * grams if grams else None
+
+    def nutrients(self, ingredient, quantity, exact_only=False):
+        """(kcal, protein, carbs, fat) of an ingredient quantity, or None if unknown."""
+        row, exact = self.match(ingredient)
+        if row is None or (exact_only and not exact):
+            return None
+        grams = self.grams(row, quantity)
+        if grams is None:
+            return None
+        return tuple(float(v) * grams / 100.0 for v in self.values[:4, row])
+
+    def meal_nutrients(self, ingredients, exact_only=False):
+        """Totals over an {ingredient: quantity} dict, and the share of ingredients resolved
+        (by exact name only, with exact_only)."""
+        totals = [0.0, 0.0, 0.0, 0.0]
+        resolved = 0
+        for name, quantity in ingredients.items():
+            values = self.nutrients(name, quantity, exact_only)
+            if values is None:
+                continue
+            resolved += 1
+            for i, v in enumerate(values):
+                totals[i] += v
+        coverage = resolved / len(ingredients) if ingredients else 0.0
+        return dict(zip(("kcal", "protein", "carbs", "fat"), totals)), coverage
+
+
+# -------------------- PLAN VERIFICATION --------------------
+
+
+def verify_calories(meal_plan, db, tolerance=0.25, min_coverage=0.8):
+    """Replace the calories of meals whose ingredients say otherwise.
+
+    A meal is recomputed only if every ingredient found in the table matched
+    by its exact name, at least min_coverage of them did, and its stated
+    calories are off by more than tolerance.
+    Returns (dict-form copy of meal_plan, names of the days corrected).
+    """
+    corrected = []
+    checked = {}
+    for day_name, meals in meal_plan.items():
+        day = {}
+        for slot, meal in meals.items():
+            ingredients = meal.get("ingredients") if isinstance(meal, dict) else None
+            # A head-noun or fuzzy match can be far off ("egg noodles" as
+            # egg): the stated calories are trusted over it.
+            approximate = isinstance(ingredients, dict) and any(
+                row is not None and not exact for row, exact in map(db.match, ingredients)
+            )
+            if isinstance(ingredients, dict) and ingredients and not approximate:
+                totals, coverage = db.meal_nutrients(ingredients, exact_only=True)
+                stated = meal.get("calories") or 0
+                computed = round(totals["kcal"])
+                if coverage >= min_coverage and computed > 0 and (
+                    not stated or abs(stated - computed) / computed > tolerance
+                ):
+                    meal = {**meal, "calories": computed}
+                    if day_name not in corrected:
+                        corrected.append(day_name)
+            day[slot] = meal
+        checked[day_name] = day
+    return checked, corrected
+
+
+def annotate_grocery_list(grocery_list, db):
+    """Add the kcal of each grocery item to it when its quantity can be weighed."""
+    for item in grocery_list:
+        total = 0.0
+        for part in str(item.get("quantity", "")).split(" + "):
+            values = db.nutrients(item.get("item", ""), part)
+            if values is None:
+                total = None
+                break
+            total += values[0]
+        if total:
+            item["calories"] = round(total)
+    return grocery_list
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def open_default(path=None, source=DEFAULT_SOURCE):
+    """The shared table: path if given, else compiled once from source into the temp dir."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            if path is not None:
+                _default = NutritionDB(path)
+                return _default
+            stamp = int(os.stat(source).st_mtime)
+            path = os.path.join(tempfile.gettempdir(), f"culinaire-nutrition-{stamp}.bin")
+            try:
+                _default = NutritionDB(path)
+            except (OSError, ValueError):  # missing, or left by an older format
+                _default = NutritionDB(build_db(source, path))
+        return _default
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.rsplit("Usage: ", 1)[1])
+    db = NutritionDB(build_db(sys.argv[1], sys.argv[2]))
+    print(f"{len(db)} ingredients written to {sys.argv[2]}")
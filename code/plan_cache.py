@@ -0,0 +1,180 @@
+"""Two-tier cache for generated meal plans.
+
+The memory tier is a per-process LRU with a TTL. The optional disk tier is a
+directory of JSON files (one per key) that every gunicorn worker on the node
+can read, so a plan generated by one worker is a hit for all the others.
+Values must be JSON-serializable and are shared with callers: copy before
+mutating them.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class PlanCache:
+    def __init__(self, max_entries=512, ttl=24 * 3600, disk_dir=None, disk_max_entries=5000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # -------------------- PUBLIC API --------------------
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._entries[key]
+                self._counters["expired"] += 1
+
+        if self.disk_dir:
+            entry = self._disk_read(key, now)
+            if entry is not None:
+                expires_at, value = entry
+                with self._lock:
+                    self._memory_put(key, expires_at, value)
+                    self._counters["disk_hits"] += 1
+                return value
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._memory_put(key, expires_at, value)
+            self._counters["sets"] += 1
+        if self.disk_dir:
+            self._disk_write(key, expires_at, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        )
+        return stats
+
+    # -------------------- MEMORY TIER --------------------
+
+    def _memory_put(self, key, expires_at, value):
+        # Caller holds self._lock.
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # -------------------- DISK TIER --------------------
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_read(self, key, now):
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        expires_at = entry.get("expires_at", 0)
+        if expires_at <= now:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self._counters["expired"] += 1
+            return None
+
+        # mtime doubles as the LRU clock for disk eviction.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return expires_at, entry.get("value")
+
+    def _disk_write(self, key, expires_at, value):
+        # Write to a temp file and rename so concurrent readers in other
+        # workers never see a partially written entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f, separators=(",", ":"))
+            os.replace(tmp_path, self._disk_path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._disk_prune()
+
+    def _disk_prune(self):
+        try:
+            names = [n for n in os.listdir(self.disk_dir) if n.endswith(".json")]
+        except FileNotFoundError:
+            return
+        overflow = len(names) - self.disk_max_entries
+        if overflow <= 0:
+            return
+
+        def mtime(name):
+            try:
+                return os.path.getmtime(os.path.join(self.disk_dir, name))
+            except FileNotFoundError:
+                return 0
+
+        for name in sorted(names, key=mtime)[:overflow]:
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self._counters["evictions"] += 1
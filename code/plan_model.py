@@ -0,0 +1,206 @@
+"""Typed, validated representation of a generated meal plan.
+
+The model's JSON is walked once by PlanModel.from_dict: both meal_plan shapes
+(dict keyed by day, or list of {"day", "meals"}) are normalized, ingredients
+become IngredientLine objects whether they came as a dict or a list, and
+calories are coerced to numbers. Renderers (Dash and Streamlit) then read
+plain attributes instead of re-normalizing and .get()-ing the raw dicts.
+"""
+
+MEAL_SLOTS = ("breakfast", "lunch", "dinner")
+
+
+class PlanValidationError(ValueError):
+    pass
+
+
+def coerce_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip().split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def iter_days(meal_plan):
+    """Yield (day_name, meals) for either meal_plan shape, unwrapping "meals"."""
+    if isinstance(meal_plan, list):
+        for i, day_obj in enumerate(meal_plan):
+            if isinstance(day_obj, dict):
+                yield day_obj.get("day", f"Day {i+1}"), day_obj.get("meals", day_obj)
+    elif isinstance(meal_plan, dict):
+        for day_name, day_obj in meal_plan.items():
+            if isinstance(day_obj, dict):
+                day_obj = day_obj.get("meals", day_obj)
+            yield str(day_name).replace("_", " ").title(), day_obj
+
+
+class IngredientLine:
+    __slots__ = ("name", "quantity")
+
+    def __init__(self, name, quantity):
+        self.name = name
+        self.quantity = quantity
+
+
+class Meal:
+    __slots__ = ("slot", "name", "calories", "recipe", "ingredients")
+
+    def __init__(self, slot, name, calories, recipe, ingredients):
+        self.slot = slot
+        self.name = name
+        self.calories = calories
+        self.recipe = recipe
+        self.ingredients = ingredients  # tuple of IngredientLine, or None if missing/invalid
+
+    @classmethod
+    def from_json(cls, slot, meal):
+        raw_ingredients = meal.get("ingredients")
+        if isinstance(raw_ingredients, dict):
+            ingredients = tuple(IngredientLine(str(k), str(v)) for k, v in raw_ingredients.items())
+        elif isinstance(raw_ingredients, list):
+            ingredients = tuple(
+                IngredientLine(
+                    str(i.get("item") or i.get("name") or "?"), str(i.get("quantity", "?"))
+                )
+                for i in raw_ingredients
+                if isinstance(i, dict)
+            )
+        else:
+            ingredients = None
+
+        return cls(
+            slot,
+            str(meal.get("meal") or meal.get("name") or slot.capitalize()),
+            coerce_number(meal.get("calories")),
+            str(meal.get("recipe") or ""),
+            ingredients,
+        )
+
+    def to_dict(self):
+        meal = {"meal": self.name, "calories": self.calories, "recipe": self.recipe}
+        if self.ingredients is not None:
+            meal["ingredients"] = {i.name: i.quantity for i in self.ingredients}
+        return meal
+
+
+class Day:
+    __slots__ = ("name", "meals", "valid")
+
+    def __init__(self, name, meals, valid=True):
+        self.name = name
+        self.meals = meals  # tuple of Meal in MEAL_SLOTS order
+        self.valid = valid
+
+    @classmethod
+    def from_json(cls, name, meals):
+        if not isinstance(meals, dict):
+            return cls(str(name), (), valid=False)
+        return cls(
+            str(name),
+            tuple(
+                Meal.from_json(slot, meals[slot])
+                for slot in MEAL_SLOTS
+                if isinstance(meals.get(slot), dict)
+            ),
+        )
+
+    @property
+    def total_calories(self):
+        return sum(m.calories or 0 for m in self.meals)
+
+    def to_dict(self):
+        return {m.slot: m.to_dict() for m in self.meals}
+
+
+class GroceryItem:
+    __slots__ = ("item", "quantity", "category", "calories")
+
+    def __init__(self, item, quantity, category, calories=None):
+        self.item = item
+        self.quantity = quantity
+        self.category = category
+        self.calories = calories  # from the nutrition table, when known
+
+    def to_dict(self):
+        item = {"item": self.item, "quantity": self.quantity, "category": self.category}
+        if self.calories is not None:
+            item["calories"] = self.calories
+        return item
+
+
+class Summary:
+    __slots__ = ("average_daily_calories", "estimated_weekly_cost", "nutrition_focus")
+
+    def __init__(self, average_daily_calories, estimated_weekly_cost, nutrition_focus):
+        self.average_daily_calories = average_daily_calories
+        self.estimated_weekly_cost = estimated_weekly_cost
+        self.nutrition_focus = nutrition_focus
+
+    @classmethod
+    def from_json(cls, summary):
+        summary = summary if isinstance(summary, dict) else {}
+        return cls(
+            summary.get("average_daily_calories", "?"),
+            summary.get("estimated_weekly_cost", "?"),
+            summary.get("nutrition_focus", "?"),
+        )
+
+    def to_dict(self):
+        return {
+            "average_daily_calories": self.average_daily_calories,
+            "estimated_weekly_cost": self.estimated_weekly_cost,
+            "nutrition_focus": self.nutrition_focus,
+        }
+
+
+class PlanModel:
+    __slots__ = ("days", "grocery", "summary")
+
+    def __init__(self, days, grocery, summary):
+        self.days = days  # tuple of Day
+        self.grocery = grocery  # tuple of GroceryItem, or None if malformed
+        self.summary = summary
+
+    @classmethod
+    def from_dict(cls, plan_dict):
+        """Validate and normalize a parsed plan (raises PlanValidationError)."""
+        if isinstance(plan_dict, PlanModel):
+            return plan_dict
+        if not isinstance(plan_dict, dict):
+            raise PlanValidationError("Model response is not a JSON object.")
+
+        meal_plan = plan_dict.get("meal_plan")
+        if meal_plan is None:
+            raise PlanValidationError("Model response does not contain 'meal_plan'.")
+        if not isinstance(meal_plan, (dict, list)):
+            raise PlanValidationError("Unexpected 'meal_plan' structure.")
+
+        grocery_list = plan_dict.get("grocery_list") or []
+        if isinstance(grocery_list, list):
+            grocery = tuple(
+                GroceryItem(
+                    g.get("item"), g.get("quantity"), g.get("category"), coerce_number(g.get("calories"))
+                )
+                for g in grocery_list
+                if isinstance(g, dict)
+            )
+        else:
+            grocery = None
+
+        return cls(
+            tuple(Day.from_json(name, meals) for name, meals in iter_days(meal_plan)),
+            grocery,
+            Summary.from_json(plan_dict.get("summary")),
+        )
+
+    def to_dict(self):
+        """Normalized plan_dict (dict-form meal_plan) for caches and serializers."""
+        return {
+            "meal_plan": {d.name: d.to_dict() for d in self.days if d.valid},
+            "grocery_list": [g.to_dict() for g in self.grocery or ()],
+            "summary": self.summary.to_dict(),
+        }
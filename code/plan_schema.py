@@ -0,0 +1,201 @@
+"""Schema-constrained plan output, fast validation and per-day repair.
+
+With CULINAIRE_STRUCTURED_OUTPUT the model is asked for a strict JSON schema
+(list-form meal_plan, ingredient lists) so the reply is always well-formed;
+repaired days follow the same setting.
+Whatever the mode, validate_plan checks the meal_plan contract of
+SYSTEM_PROMPT day by day, and repair_days re-requests only the days that are
+missing or invalid instead of regenerating the whole week.
+"""
+import asyncio
+import re
+
+import orjson
+
+import llm
+import settings
+from plan_model import MEAL_SLOTS, coerce_number, iter_days
+from prompts import build_day_messages
+from recipes import days as WEEK_DAYS
+
+loads = orjson.loads  # raises orjson.JSONDecodeError, a json.JSONDecodeError
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+MEAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "meal": {"type": "string"},
+        "ingredients": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "quantity": {"type": "string"},
+                },
+                "required": ["name", "quantity"],
+                "additionalProperties": False,
+            },
+        },
+        "calories": {"type": "number"},
+        "recipe": {"type": "string"},
+    },
+    "required": ["meal", "ingredients", "calories", "recipe"],
+    "additionalProperties": False,
+}
+
+DAY_MEALS_SCHEMA = {
+    "type": "object",
+    "properties": {slot: MEAL_SCHEMA for slot in MEAL_SLOTS},
+    "required": list(MEAL_SLOTS),
+    "additionalProperties": False,
+}
+
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "meal_plan": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "day": {"type": "string", "enum": WEEK_DAYS},
+                    "meals": DAY_MEALS_SCHEMA,
+                },
+                "required": ["day", "meals"],
+                "additionalProperties": False,
+            },
+        },
+        "summary": {
+            "type": "object",
+            "properties": {
+                "average_daily_calories": {"type": "number"},
+                "estimated_weekly_cost": {"type": "string"},
+                "nutrition_focus": {"type": "string"},
+            },
+            "required": ["average_daily_calories", "estimated_weekly_cost", "nutrition_focus"],
+            "additionalProperties": False,
+        },
+    },
+    "required": ["meal_plan", "summary"],
+    "additionalProperties": False,
+}
+
+
+def response_format(name, schema):
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+PLAN_RESPONSE_FORMAT = response_format("meal_plan", PLAN_SCHEMA)
+DAY_RESPONSE_FORMAT = response_format("day_meals", DAY_MEALS_SCHEMA)
+
+
+# -------------------- VALIDATION --------------------
+
+
+def _validate_meal(meal):
+    """Return the meal with dict ingredients, or None if it breaks the contract."""
+    if not isinstance(meal, dict):
+        return None
+    name = meal.get("meal")
+    calories = coerce_number(meal.get("calories"))
+    ingredients = meal.get("ingredients")
+    if not isinstance(name, str) or not name.strip():
+        return None
+    if calories is None or calories <= 0:
+        return None
+    if isinstance(ingredients, list):
+        try:
+            ingredients = {i["name"]: i["quantity"] for i in ingredients}
+        except (KeyError, TypeError):
+            return None
+    if not isinstance(ingredients, dict) or not ingredients:
+        return None
+    return {
+        **meal,
+        "calories": calories,
+        "ingredients": ingredients,
+        "recipe": str(meal.get("recipe") or ""),
+    }
+
+
+def validate_day(meals):
+    """Return the validated {slot: meal} dict of a day, or None if invalid."""
+    if not isinstance(meals, dict):
+        return None
+    day = {}
+    for slot in MEAL_SLOTS:
+        meal = _validate_meal(meals.get(slot))
+        if meal is None:
+            return None
+        day[slot] = meal
+    return day
+
+
+def validate_plan(plan):
+    """Check a parsed plan day by day.
+
+    Returns (plan with a dict-form meal_plan holding the valid days,
+    names of the weekdays that are missing or invalid).
+    """
+    meal_plan = plan.get("meal_plan") if isinstance(plan, dict) else None
+    valid = {}
+    for i, (day_name, meals) in enumerate(iter_days(meal_plan)):
+        day_name = str(day_name).strip().title()
+        if day_name not in WEEK_DAYS:
+            # "Day 1", "day_1"...: positional names.
+            if i >= len(WEEK_DAYS):
+                continue
+            day_name = WEEK_DAYS[i]
+        day = validate_day(meals)
+        if day is not None:
+            valid[day_name] = day
+
+    invalid = [d for d in WEEK_DAYS if d not in valid]
+    summary = plan.get("summary") if isinstance(plan, dict) else None
+    return (
+        {
+            "meal_plan": {d: valid[d] for d in WEEK_DAYS if d in valid},
+            "summary": summary if isinstance(summary, dict) else {},
+        },
+        invalid,
+    )
+
+
+# -------------------- REPAIR --------------------
+
+
+async def _request_day(day_name, engine_args, planned):
+    body_weight, activity, goals, budget, target, restrictions, diet_type, location = engine_args
+    messages = build_day_messages(
+        day_name,
+        body_weight,
+        activity,
+        goals,
+        budget,
+        target,
+        restrictions,
+        diet_type,
+        location,
+        avoid_meals=planned,
+    )
+    extra = {"response_format": DAY_RESPONSE_FORMAT} if settings.STRUCTURED_OUTPUT else {}
+    raw = await llm.acomplete(messages, temperature=0.5, label="repair", **extra)
+    # Without a schema the day may come with text around it.
+    match = _JSON_OBJECT_RE.search(raw)
+    day = validate_day(loads(match.group(0) if match else raw))
+    if day is None:
+        raise ValueError(f"repaired {day_name} is still invalid")
+    return day
+
+
+async def repair_days(plan, day_names, engine_args):
+    """Regenerate only the given days of a validated plan, concurrently."""
+    planned = [m["meal"] for meals in plan["meal_plan"].values() for m in meals.values()]
+    repaired = await asyncio.gather(
+        *[_request_day(day_name, engine_args, planned) for day_name in day_names]
+    )
+    meal_plan = dict(plan["meal_plan"])
+    meal_plan.update(zip(day_names, repaired))
+    return {**plan, "meal_plan": {d: meal_plan[d] for d in WEEK_DAYS if d in meal_plan}}
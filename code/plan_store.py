@@ -0,0 +1,304 @@
+"""Persistent store of generated plans, for permalinks and reloads.
+
+Plans live in a SQLite database next to the job queue, keyed by a content id
+(so saving the same plan twice is free) and indexed by every profile key they
+were served for. They are
+serialized with a small msgpack-style binary codec in which dict keys and
+short strings (ingredient names, quantities, categories, field names) are
+interned in a shared strings table: a plan row holds mostly small integers,
+and its long texts (recipes) are zlib-compressed with the rest.
+
+Texts generated on demand for a plan (recipe steps) are kept by key in the
+same database, so every worker of the node finds the ones another generated.
+"""
+import base64
+import hashlib
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id TEXT PRIMARY KEY,
+    profile_key TEXT,
+    target NUMERIC,
+    created REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_profile ON plans (profile_key, created);
+CREATE TABLE IF NOT EXISTS plan_profiles (
+    profile_key TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    target NUMERIC,
+    created REAL NOT NULL,
+    PRIMARY KEY (profile_key, plan_id)
+);
+CREATE INDEX IF NOT EXISTS plan_profiles_latest ON plan_profiles (profile_key, created);
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS texts (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+# Strings up to this length are interned; longer ones are stored inline.
+INTERN_MAX_LEN = 48
+COMPRESS_MIN_BYTES = 256
+
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _REF, _LIST, _DICT = range(9)
+_RAW, _ZLIB = b"\x00", b"\x01"
+_DOUBLE = struct.Struct("<d")
+
+
+# -------------------- CODEC --------------------
+
+
+def _zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _write_uint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_uint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def encode(value, intern):
+    """Serialize JSON-like data; intern(str) -> int assigns ids to short strings."""
+    out = bytearray()
+
+    def write(v, is_key=False):
+        if v is None:
+            out.append(_NONE)
+        elif v is True or v is False:
+            out.append(_TRUE if v else _FALSE)
+        elif isinstance(v, int):
+            out.append(_INT)
+            _write_uint(out, _zigzag(v))
+        elif isinstance(v, float):
+            if v.is_integer() and abs(v) < (1 << 53):
+                out.append(_FLOAT)
+                out.append(1)
+                _write_uint(out, _zigzag(int(v)))
+            else:
+                out.append(_FLOAT)
+                out.append(0)
+                out.extend(_DOUBLE.pack(v))
+        elif isinstance(v, str):
+            if is_key or len(v) <= INTERN_MAX_LEN:
+                out.append(_REF)
+                _write_uint(out, intern(v))
+            else:
+                raw = v.encode("utf-8")
+                out.append(_STR)
+                _write_uint(out, len(raw))
+                out.extend(raw)
+        elif isinstance(v, (list, tuple)):
+            out.append(_LIST)
+            _write_uint(out, len(v))
+            for item in v:
+                write(item)
+        elif isinstance(v, dict):
+            out.append(_DICT)
+            _write_uint(out, len(v))
+            for k, item in v.items():
+                write(str(k), is_key=True)
+                write(item)
+        else:
+            raise TypeError(f"cannot encode {type(v).__name__}")
+
+    write(value)
+    if len(out) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(bytes(out), 6)
+    return _RAW + bytes(out)
+
+
+def decode(blob, lookup):
+    """Inverse of encode; lookup(int) -> str resolves interned strings."""
+    data = zlib.decompress(blob[1:]) if blob[:1] == _ZLIB else memoryview(blob)[1:]
+
+    def read(pos):
+        tag = data[pos]
+        pos += 1
+        if tag == _NONE:
+            return None, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _INT:
+            n, pos = _read_uint(data, pos)
+            return (n >> 1) ^ -(n & 1), pos
+        if tag == _FLOAT:
+            integral = data[pos]
+            if integral:
+                n, pos = _read_uint(data, pos + 1)
+                return float((n >> 1) ^ -(n & 1)), pos
+            return _DOUBLE.unpack_from(data, pos + 1)[0], pos + 9
+        if tag == _REF:
+            n, pos = _read_uint(data, pos)
+            return lookup(n), pos
+        if tag == _STR:
+            n, pos = _read_uint(data, pos)
+            return bytes(data[pos : pos + n]).decode("utf-8"), pos + n
+        if tag == _LIST:
+            n, pos = _read_uint(data, pos)
+            items = []
+            for _ in range(n):
+                item, pos = read(pos)
+                items.append(item)
+            return items, pos
+        if tag == _DICT:
+            n, pos = _read_uint(data, pos)
+            items = {}
+            for _ in range(n):
+                k, pos = read(pos)
+                items[k], pos = read(pos)
+            return items, pos
+        raise ValueError(f"corrupt plan blob (tag {tag})")
+
+    return read(0)[0]
+
+
+# -------------------- STORE --------------------
+
+
+class PlanStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._ids = {}  # str -> id, shared by the threads of the process
+        self._strings = {}  # id -> str
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            # Stores created before the profile index: index their plans once.
+            db.execute(
+                "INSERT OR IGNORE INTO plan_profiles (profile_key, plan_id, target, created) "
+                "SELECT profile_key, id, target, created FROM plans WHERE profile_key IS NOT NULL"
+            )
+
+    # -------------------- PUBLIC API --------------------
+
+    def save(self, plan, profile_key=None, target=None):
+        """Store a plan and return its id (the same plan always gets the same id)."""
+        blob = encode(plan, self._intern)
+        plan_id = base64.urlsafe_b64encode(hashlib.sha256(blob).digest()[:9]).decode("ascii")
+        now = time.time()
+        db = self._connect()
+        db.execute(
+            "INSERT OR IGNORE INTO plans (id, profile_key, target, created, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (plan_id, profile_key, target, now, blob),
+        )
+        if profile_key is not None:
+            # A plan already stored (for another profile) is indexed under this one too.
+            db.execute(
+                "INSERT INTO plan_profiles (profile_key, plan_id, target, created) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (profile_key, plan_id) "
+                "DO UPDATE SET target = excluded.target, created = excluded.created",
+                (profile_key, plan_id, target, now),
+            )
+        return plan_id
+
+    def get(self, plan_id):
+        """Return {"id", "plan", "target", "profile_key", "created"}, or None."""
+        row = self._connect().execute(
+            "SELECT id, profile_key, target, created, data FROM plans WHERE id = ?", (plan_id,)
+        ).fetchone()
+        return self._entry(row)
+
+    def latest(self, profile_key, max_age=None):
+        """Most recent plan stored for a profile key (optionally not older than max_age s)."""
+        since = time.time() - max_age if max_age else 0
+        row = self._connect().execute(
+            "SELECT p.id, i.profile_key, i.target, i.created, p.data "
+            "FROM plan_profiles i JOIN plans p ON p.id = i.plan_id "
+            "WHERE i.profile_key = ? AND i.created >= ? ORDER BY i.created DESC LIMIT 1",
+            (profile_key, since),
+        ).fetchone()
+        return self._entry(row)
+
+    def put_text(self, key, text):
+        """Keep a generated text (e.g. recipe steps) under key."""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO texts (key, created, data) VALUES (?, ?, ?)",
+            (key, time.time(), zlib.compress(text.encode("utf-8"))),
+        )
+
+    def get_text(self, key):
+        """The text kept under key, or None."""
+        row = self._connect().execute("SELECT data FROM texts WHERE key = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def stats(self):
+        db = self._connect()
+        plans, size = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM plans").fetchone()
+        (strings,) = db.execute("SELECT COUNT(*) FROM strings").fetchone()
+        return {"plans": plans, "plan_bytes": size, "interned_strings": strings}
+
+    # -------------------- INTERNALS --------------------
+
+    def _entry(self, row):
+        if row is None:
+            return None
+        plan_id, profile_key, target, created, blob = row
+        return {
+            "id": plan_id,
+            "plan": decode(blob, self._lookup),
+            "target": target,
+            "profile_key": profile_key,
+            "created": created,
+        }
+
+    def _intern(self, value):
+        string_id = self._ids.get(value)
+        if string_id is not None:
+            return string_id
+        db = self._connect()
+        db.execute("INSERT OR IGNORE INTO strings (value) VALUES (?)", (value,))
+        (string_id,) = db.execute("SELECT id FROM strings WHERE value = ?", (value,)).fetchone()
+        with self._lock:
+            self._ids[value] = string_id
+            self._strings[string_id] = value
+        return string_id
+
+    def _lookup(self, string_id):
+        value = self._strings.get(string_id)
+        if value is None:
+            # Interned by another worker since we last looked.
+            rows = self._connect().execute("SELECT id, value FROM strings WHERE id >= ?", (string_id,))
+            with self._lock:
+                for i, v in rows:
+                    self._strings[i] = v
+                    self._ids[v] = i
+            value = self._strings[string_id]
+        return value
+
+    def _connect(self):
+        # One connection per thread; autocommit.
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
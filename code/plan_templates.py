@@ -0,0 +1,50 @@
+"""Reuse of cached plans as templates for other calorie targets.
+
+Moving only the calorie slider should not cost a new generation: plans are
+also cached under a template key that ignores the calorie target and keeps
+the budget only as a coarse band. A template hit is rescaled locally when
+the scale factor stays within a safe range; outside it, portions would be
+unrealistic and the caller falls back to the LLM.
+"""
+from grocery import build_grocery_list
+from profiles import profile_key
+from rescale import rescale_mealplan
+
+BUDGET_BAND_CHF = 30
+TEMPLATE_PREFIX = "tpl:"
+
+
+def template_key(profile):
+    """Cache key of a canonical profile, modulo calorie target and budget band."""
+    banded = dict(profile)
+    budget = banded.pop("budget", None)
+    banded["budget_band"] = None if budget is None else int(budget // BUDGET_BAND_CHF)
+    return TEMPLATE_PREFIX + profile_key(banded, exclude=("daily_calories",))
+
+
+def rescale_plan(plan, to_target):
+    """Return a copy of plan with portions and calories scaled to to_target kcal/day."""
+    meal_plan = rescale_mealplan(plan["meal_plan"], to_target)
+    summary = dict(plan.get("summary") or {})
+    summary["average_daily_calories"] = round(to_target)
+    return {
+        **plan,
+        "meal_plan": meal_plan,
+        "grocery_list": build_grocery_list(meal_plan),
+        "summary": summary,
+    }
+
+
+def store_template(cache, profile, plan, target, ttl=None):
+    cache.set(template_key(profile), {"plan": plan, "target": target}, ttl)
+
+
+def lookup_template(cache, profile, target, min_scale=0.8, max_scale=1.25):
+    """Return a plan rescaled from a cached template, or None."""
+    template = cache.get(template_key(profile))
+    if template is None or not template.get("target"):
+        return None
+    scale = target / template["target"]
+    if not min_scale <= scale <= max_scale:
+        return None
+    return rescale_plan(template["plan"], target)
@@ -0,0 +1,178 @@
+"""Warm the plan cache for popular profiles before traffic arrives.
+
+Plans are generated for every profile of a grid (diet type x activity x
+calorie target x common restrictions, at the form's default weight, budget
+and goals) with the same pipeline as the server, and written to the shared
+on-disk plan cache under the keys the server looks up. Run it nightly, e.g.
+
+    CULINAIRE_PLAN_CACHE_DIR=/var/cache/culinaire python precompute.py --workers 8 --rate 60
+
+--engine catalog assembles plans from the local recipe catalog only (no model
+calls); --engine auto tries the catalog first and falls back to the model.
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DIETS = ("Omnivore", "Vegetarian", "Keto", "Vegan", "Pescatarian", "Gluten free")
+ACTIVITIES = ("Sedentary", "Lightly active", "Moderately active", "Very active", "Extra active")
+RESTRICTIONS = ("", "peanut", "egg", "dairy", "gluten")
+
+# Defaults of the form in layout.py.
+DEFAULT_WEIGHT = 69
+DEFAULT_BUDGET = 80
+
+
+class RateLimiter:
+    """Token bucket: at most rate acquisitions per second, bursts of up to burst."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class NullProgress:
+    """Stand-in for jobs.JobProgress: nobody polls a precomputation."""
+
+    raw = ""
+
+    def add_day(self, day_name, meals):
+        pass
+
+
+def calorie_range(text):
+    """"1600:3200:200" -> [1600, 1800, ..., 3200]."""
+    start, stop, step = (int(x) for x in text.split(":"))
+    return list(range(start, stop + 1, step))
+
+
+def profile_grid(diets, activities, calories, restrictions, weight, budget, goals=(), location=None):
+    """engine_args tuples in the order run_generation takes them."""
+    for diet, activity, target, restriction in itertools.product(
+        diets, activities, calories, restrictions
+    ):
+        yield (weight, activity, list(goals), budget, target, restriction, diet, location)
+
+
+def precompute_one(app, engine_args, engine, ttl, force, limiter):
+    """Generate and cache one profile; return "cached", "skipped" or "generated"."""
+    from plan_model import PlanModel
+    from plan_templates import store_template
+    from profiles import canonical_profile, profile_key
+    from prompts import build_mealplan_messages
+    import llm
+    import settings
+
+    profile = canonical_profile(*engine_args)
+    key = profile_key(profile)
+    if not force and app.plan_cache.get(key) is not None:
+        return "cached"
+
+    target = engine_args[4]
+
+    def generate():
+        plan = app.catalog_mealplan(*engine_args) if engine in ("catalog", "auto") else None
+        if plan is None:
+            if engine == "catalog":
+                return "skipped"
+            limiter.acquire()
+            messages, _ = build_mealplan_messages(*engine_args, compact=settings.COMPACT_PLANS)
+            plan = llm.run(app.run_generation(NullProgress(), messages, engine_args))
+
+        plan = PlanModel.from_dict(plan).to_dict()
+        app.plan_cache.set(key, {"plan": plan, "target": target}, ttl)
+        store_template(app.plan_cache, profile, plan, target, ttl)
+        return "generated"
+
+    # Grid points with the same canonical profile (and other precompute runs,
+    # through the shared lock files) generate it once.
+    return app.inflight.do(
+        key, generate, lambda: "cached" if app.plan_cache.get(key) is not None else None
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--diets", nargs="+", default=DIETS)
+    parser.add_argument("--activities", nargs="+", default=ACTIVITIES)
+    parser.add_argument("--calories", type=calorie_range, default="1600:3000:200",
+                        help="start:stop:step in kcal/day (default 1600:3000:200)")
+    parser.add_argument("--restrictions", nargs="+", default=RESTRICTIONS,
+                        help='restriction texts; "" for none')
+    parser.add_argument("--weight", type=float, default=DEFAULT_WEIGHT)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET)
+    parser.add_argument("--engine", choices=("llm", "catalog", "auto"), default="auto")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=30,
+                        help="model generations started per minute")
+    parser.add_argument("--cache-dir", help="plan cache directory (default CULINAIRE_PLAN_CACHE_DIR)")
+    parser.add_argument("--ttl", type=int, help="seconds the plans stay cached")
+    parser.add_argument("--force", action="store_true", help="regenerate plans already cached")
+    parser.add_argument("--dry-run", action="store_true", help="only print the grid size")
+    args = parser.parse_args(argv)
+
+    if args.cache_dir:
+        os.environ["CULINAIRE_PLAN_CACHE_DIR"] = args.cache_dir
+    if not os.environ.get("CULINAIRE_PLAN_CACHE_DIR"):
+        parser.error("set CULINAIRE_PLAN_CACHE_DIR or --cache-dir: the server only sees the disk cache")
+
+    grid = list(
+        profile_grid(args.diets, args.activities, args.calories, args.restrictions, args.weight, args.budget)
+    )
+    print(f"{len(grid)} profiles", file=sys.stderr)
+    if args.dry_run:
+        return 0
+
+    import app  # after CULINAIRE_PLAN_CACHE_DIR is set
+    import settings
+
+    if 2 * len(grid) > settings.PLAN_CACHE_DISK_SIZE:
+        print(
+            f"warning: {2 * len(grid)} entries (plans and templates) exceed "
+            f"CULINAIRE_PLAN_CACHE_DISK_SIZE={settings.PLAN_CACHE_DISK_SIZE}",
+            file=sys.stderr,
+        )
+
+    limiter = RateLimiter(args.rate / 60.0, burst=args.workers)
+    counts = {"generated": 0, "cached": 0, "skipped": 0, "failed": 0}
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(precompute_one, app, engine_args, args.engine, args.ttl, args.force, limiter): engine_args
+            for engine_args in grid
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = "failed"
+                print(f"failed {futures[future]}: {type(e).__name__}: {e}", file=sys.stderr)
+            counts[outcome] += 1
+            if done % 50 == 0 or done == len(grid):
+                print(f"{done}/{len(grid)} {counts}", file=sys.stderr)
+
+    print(f"done in {time.monotonic() - started:.1f}s: {counts}", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
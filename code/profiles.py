@@ -0,0 +1,81 @@
+"""Canonical user profiles, used to key caches and deduplicate generations.
+
+Two form submissions that would produce an equivalent plan should map to the
+same canonical profile: goals are sorted, restriction text is reduced to a
+sorted set of tokens and the sliders are bucketed.
+"""
+import hashlib
+import json
+import re
+
+from nutrition import estimate_calories
+
+WEIGHT_BUCKET_KG = 5
+CALORIE_BUCKET_KCAL = 100
+BUDGET_BUCKET_CHF = 10
+
+_RESTRICTION_SPLIT_RE = re.compile(r"[,;/\n]+|\s+and\s+|\s*&\s*")
+_RESTRICTION_FILLER_RE = re.compile(
+    r"\b(no|none|avoid|allergy|allergies|allergic|to|intolerance|intolerant|free)\b"
+)
+_SPACES_RE = re.compile(r"\s+")
+
+
+def _singular(word):
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_restrictions(text):
+    """Turn free restriction text ("Peanuts, egg allergy") into sorted tokens."""
+    if not text:
+        return ()
+    tokens = set()
+    for part in _RESTRICTION_SPLIT_RE.split(text.lower()):
+        part = _RESTRICTION_FILLER_RE.sub(" ", part)
+        words = [_singular(w) for w in _SPACES_RE.split(part.strip()) if w]
+        if words:
+            tokens.add(" ".join(words))
+    return tuple(sorted(tokens))
+
+
+def bucket(value, size):
+    if value is None:
+        return None
+    return int(round(float(value) / size) * size)
+
+
+def canonical_profile(
+    body_weight,
+    activity,
+    goals,
+    budget,
+    daily_calories,
+    restrictions,
+    diet_type,
+    location,
+):
+    """Return the canonical (hashable, JSON-friendly) form of a form submission."""
+    if not daily_calories or daily_calories <= 0:
+        daily_calories = estimate_calories(body_weight, activity, goals)
+
+    return {
+        "body_weight": bucket(body_weight, WEIGHT_BUCKET_KG),
+        "activity": (activity or "").strip().lower() or None,
+        "goals": sorted({g.strip().lower() for g in goals or [] if g}),
+        "budget": bucket(budget, BUDGET_BUCKET_CHF),
+        "daily_calories": bucket(daily_calories, CALORIE_BUCKET_KCAL),
+        "restrictions": list(normalize_restrictions(restrictions)),
+        "diet_type": (diet_type or "Omnivore").strip().lower(),
+        "location": _SPACES_RE.sub(" ", (location or "").strip().lower()) or None,
+    }
+
+
+def profile_key(profile, exclude=()):
+    """Content address of a canonical profile, optionally ignoring some fields."""
+    data = {k: v for k, v in profile.items() if k not in exclude}
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
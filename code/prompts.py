@@ -0,0 +1,260 @@
+"""Prompts sent to the meal-planning model."""
+from nutrition import estimate_calories, macro_targets
+
+SYSTEM_PROMPT = """
+You are CULINAIRE, an AI meal-planning engine.  
+Your ONLY task is to generate structured meal-plan JSON.  
+Your output MUST be **valid JSON**, with **no Markdown**, **no comments**, **no explanations**, **no trailing commas**, **no text outside the JSON object**.
+
+If you cannot follow the format, output an empty JSON object: {}.
+
+-------------------------
+### OUTPUT FORMAT (STRICT)
+-------------------------
+
+Your response MUST be a single JSON object with EXACTLY these top-level keys:
+
+1. "meal_plan"
+2. "summary"
+
+Nothing else. Do NOT output a grocery list: it is computed from the ingredients by the server.
+
+=========================
+1) "meal_plan" RULES
+=========================
+
+"meal_plan" MUST be **one of the following structures**:
+
+### OPTION A — Dict form
+{
+  "Monday": { "breakfast": {...}, "lunch": {...}, "dinner": {...} },
+  "Tuesday": { ... },
+  ...
+}
+
+### OPTION B — List form
+[
+  {
+    "day": "Monday",
+    "meals": { "breakfast": {...}, "lunch": {...}, "dinner": {...} }
+  },
+  ...
+]
+
+You may choose either structure, but it must be valid and consistent.
+
+Each meal object MUST contain the following keys:
+
+- "meal": short meal name (string)
+- "ingredients": dict (ingredient → quantity)
+    Example:
+    {
+      "Rolled oats": "50 g",
+      "Banana": "1 unit",
+      "Milk": "200 ml"
+    }
+- "calories": integer or float  
+- "recipe": 2–4 concise sentences describing steps
+
+Rules:
+- EXACTLY 7 days.
+- Each day MUST have breakfast, lunch, and dinner.
+- Total calories per day MUST be within ±5% of the target the user gives.
+- Names must be human-friendly and non-repetitive across days.
+- Ingredient quantities MUST be numeric + unit (g, kg, ml, L, tsp, tbsp, units).
+
+===========================
+2) "summary" RULES
+===========================
+
+"summary" MUST contain:
+
+{
+  "average_daily_calories": number,
+  "estimated_weekly_cost": string,  // e.g., "CHF 72"
+  "nutrition_focus": string         // e.g., "High protein, high fiber"
+}
+
+Rules:
+- average_daily_calories MUST match computed plan average.
+- estimated_weekly_cost MUST be realistic for Switzerland.
+- nutrition_focus MUST be concise (5–12 words max).
+
+-------------------------
+### GLOBAL RULES
+-------------------------
+
+- Output ONLY the JSON object.
+- No markdown formatting.
+- No backticks.
+- No natural language outside JSON.
+- No trailing commas.
+- No placeholders. Use real values.
+- Be deterministic, consistent, and concise.
+
+"""
+
+DAY_SYSTEM_PROMPT = """
+You are CULINAIRE, an AI meal-planning engine.
+Your ONLY task is to generate the meals of ONE day as JSON.
+Output a single JSON object, with no Markdown, no comments and no text outside it:
+
+{
+  "breakfast": {...},
+  "lunch": {...},
+  "dinner": {...}
+}
+
+Each meal object MUST contain:
+- "meal": short meal name (string)
+- "ingredients": dict (ingredient → quantity with unit, e.g. "50 g", "1 unit", "200 ml")
+- "calories": integer or float
+- "recipe": 2–4 concise sentences describing steps
+
+Rules:
+- Total calories of the day MUST be within ±5% of the target the user gives.
+- Never reuse a meal the user lists as already planned.
+- Use real values, no placeholders.
+"""
+
+# Compact wire format (compact.py): terse keys, no recipes. About half the
+# completion tokens of SYSTEM_PROMPT's format.
+COMPACT_SYSTEM_PROMPT = """
+You are CULINAIRE, a meal-planning engine. Reply with ONE minified JSON object and nothing else:
+{"p":{"Mon":{"b":M,"l":M,"d":M},"Tue":{...},...,"Sun":{...}},"s":{"c":"CHF 72","f":"High protein, high fiber"}}
+M = {"n":"meal name","i":[["ingredient","quantity"],...],"k":kcal}
+- 7 days Mon..Sun; b = breakfast, l = lunch, d = dinner.
+- Daily kcal within ±5% of the user's target.
+- Quantities numeric + unit (g, kg, ml, L, tsp, tbsp, units).
+- Varied, non-repeating meal names. "c": realistic weekly cost in Switzerland. "f": 5-12 words.
+- No recipes, no grocery list, no markdown.
+"""
+
+COMPACT_DAY_SYSTEM_PROMPT = """
+You are CULINAIRE, a meal-planning engine. Generate the meals of ONE day.
+Reply with ONE minified JSON object and nothing else: {"b":M,"l":M,"d":M}
+M = {"n":"meal name","i":[["ingredient","quantity"],...],"k":kcal}
+- b = breakfast, l = lunch, d = dinner; day kcal within ±5% of the user's target.
+- Quantities numeric + unit. Never reuse a meal the user lists as already planned.
+- No recipes, no markdown.
+"""
+
+# Recipe steps of one meal, requested when a user opens a compact-mode meal.
+RECIPE_SYSTEM_PROMPT = """
+You are CULINAIRE. Write the preparation steps of the meal the user gives,
+using its ingredients, in 2–4 concise sentences. Plain text, no list, no markdown.
+"""
+
+
+def build_user_prompt(
+    body_weight,
+    activity,
+    goals,
+    budget,
+    daily_calories,
+    restrictions,
+    diet_type,
+    location,
+):
+    goals_str = ", ".join(goals or []) if isinstance(goals, list) else ""
+    macros = macro_targets(body_weight, daily_calories, goals, diet_type)
+
+    return f"""
+Create a 7-day meal plan with breakfast, lunch, and dinner for each day.
+
+User profile:
+- Body weight: {body_weight or "unknown"} kg
+- Activity level: {activity or "unknown"}
+- Goals: {goals_str or "general health"}
+- Diet type: {diet_type or "Omnivore"}
+- Restrictions / allergies: {restrictions or "None"}
+- Target calories per day: {daily_calories} kcal
+- Daily macros: ~{macros["protein_g"]} g protein, {macros["fat_g"]} g fat, {macros["carbs_g"]} g carbs
+- Weekly budget: {budget} CHF
+- Location: {location or "not specified"}
+
+Make meals realistic, structured, and consistent across days. Vary proteins and vegetables.
+"""
+
+
+def build_mealplan_messages(
+    body_weight,
+    activity,
+    goals,
+    budget,
+    daily_calories,
+    restrictions,
+    diet_type,
+    location,
+    compact=False,
+):
+    """Return (messages, target_calories) for a full 7-day generation."""
+    if not daily_calories or daily_calories <= 0:
+        daily_calories = estimate_calories(body_weight, activity, goals)
+
+    user_prompt = build_user_prompt(
+        body_weight,
+        activity,
+        goals,
+        budget,
+        daily_calories,
+        restrictions,
+        diet_type,
+        location,
+    )
+    messages = [
+        {"role": "system", "content": COMPACT_SYSTEM_PROMPT if compact else SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+    return messages, daily_calories
+
+
+def build_day_messages(
+    day_name,
+    body_weight,
+    activity,
+    goals,
+    budget,
+    daily_calories,
+    restrictions,
+    diet_type,
+    location,
+    theme=None,
+    avoid_meals=(),
+    compact=False,
+):
+    """Return the messages generating a single day of the weekly plan."""
+    goals_str = ", ".join(goals or []) if isinstance(goals, list) else ""
+    avoid_str = "; ".join(avoid_meals) if avoid_meals else "none"
+    macros = macro_targets(body_weight, daily_calories, goals, diet_type)
+
+    user_prompt = f"""
+Create the breakfast, lunch, and dinner for {day_name} of a 7-day meal plan.
+
+User profile:
+- Body weight: {body_weight or "unknown"} kg
+- Activity level: {activity or "unknown"}
+- Goals: {goals_str or "general health"}
+- Diet type: {diet_type or "Omnivore"}
+- Restrictions / allergies: {restrictions or "None"}
+- Target calories for the day: {daily_calories} kcal
+- Macros for the day: ~{macros["protein_g"]} g protein, {macros["fat_g"]} g fat, {macros["carbs_g"]} g carbs
+- Weekly budget: {budget} CHF
+- Location: {location or "not specified"}
+
+Main ingredient focus for this day: {theme or "free choice"}
+Meals already planned on other days (do not repeat): {avoid_str}
+"""
+    return [
+        {"role": "system", "content": COMPACT_DAY_SYSTEM_PROMPT if compact else DAY_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def build_recipe_messages(meal_name, ingredients):
+    """Return the messages asking for the steps of one meal ({ingredient: quantity})."""
+    ingredients_str = "; ".join(f"{name}: {quantity}" for name, quantity in ingredients.items())
+    return [
+        {"role": "system", "content": RECIPE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Meal: {meal_name}\nIngredients: {ingredients_str}"},
+    ]
@@ -0,0 +1,183 @@
+"""Parsing and unit conversion of ingredient quantity strings ("50 g", "1.2 L", "2 tbsp")."""
+import functools
+import re
+
+# alias -> (canonical unit, dimension, factor to the dimension's base unit)
+UNITS = {
+    "mg": ("mg", "mass", 0.001),
+    "g": ("g", "mass", 1.0),
+    "gr": ("g", "mass", 1.0),
+    "gram": ("g", "mass", 1.0),
+    "grams": ("g", "mass", 1.0),
+    "kg": ("kg", "mass", 1000.0),
+    "oz": ("oz", "mass", 28.35),
+    "lb": ("lb", "mass", 453.6),
+    "lbs": ("lb", "mass", 453.6),
+    "ml": ("ml", "volume", 1.0),
+    "cl": ("cl", "volume", 10.0),
+    "dl": ("dl", "volume", 100.0),
+    "l": ("L", "volume", 1000.0),
+    "liter": ("L", "volume", 1000.0),
+    "liters": ("L", "volume", 1000.0),
+    "litre": ("L", "volume", 1000.0),
+    "litres": ("L", "volume", 1000.0),
+    "tsp": ("tsp", "volume", 5.0),
+    "teaspoon": ("tsp", "volume", 5.0),
+    "teaspoons": ("tsp", "volume", 5.0),
+    "tbsp": ("tbsp", "volume", 15.0),
+    "tablespoon": ("tbsp", "volume", 15.0),
+    "tablespoons": ("tbsp", "volume", 15.0),
+    "cup": ("cup", "volume", 240.0),
+    "cups": ("cup", "volume", 240.0),
+    "": ("unit", "count", 1.0),
+    "x": ("unit", "count", 1.0),
+    "unit": ("unit", "count", 1.0),
+    "units": ("unit", "count", 1.0),
+    "piece": ("unit", "count", 1.0),
+    "pieces": ("unit", "count", 1.0),
+    "pc": ("unit", "count", 1.0),
+    "pcs": ("unit", "count", 1.0),
+    "whole": ("unit", "count", 1.0),
+}
+
+BASE_UNITS = {"mass": "g", "volume": "ml", "count": "unit"}
+SPOON_UNITS = ("tsp", "tbsp")
+
+_QUANTITY_RE = re.compile(
+    r"^\s*(?:(?P<whole>\d+)\s+)?(?P<num>\d+(?:[.,]\d+)?)(?:\s*/\s*(?P<den>\d+))?\s*(?P<unit>[^\d\s(][^(]*?)?\s*(?:\(.*\))?\s*$"
+)
+
+
+def parse_quantity(text):
+    """Return (value, unit) for strings like "50 g", "1/2 cup", "1 1/2 tbsp"; None otherwise.
+
+    Known units are canonicalized ("grams" -> "g", "" -> "unit"); unknown ones
+    ("slices", "cloves") are kept lowercased.
+    """
+    if isinstance(text, (int, float)):
+        return float(text), "unit"
+    match = _QUANTITY_RE.match(str(text))
+    if not match:
+        return None
+
+    value = float(match.group("num").replace(",", "."))
+    if match.group("den"):
+        value /= float(match.group("den"))
+    if match.group("whole"):
+        value += float(match.group("whole"))
+
+    unit = (match.group("unit") or "").strip().lower().rstrip(".")
+    known = UNITS.get(unit)
+    return value, known[0] if known else unit
+
+
+def to_base(value, unit):
+    """Return (value in base unit, dimension); dimension is None for unknown units."""
+    known = UNITS.get(unit.lower())
+    if known is None:
+        return value, None
+    _, dimension, factor = known
+    return value * factor, dimension
+
+
+def format_amount(value):
+    value = round(value, 1)
+    return str(int(value)) if value == int(value) else str(value)
+
+
+# Fractions kept as such when a scaled fraction lands on one ("1/2 cup" x 3 -> "1 1/2 cup").
+_FRACTIONS = ((1 / 4, "1/4"), (1 / 3, "1/3"), (1 / 2, "1/2"), (2 / 3, "2/3"), (3 / 4, "3/4"))
+
+
+def format_fraction(value):
+    whole = int(value)
+    rest = value - whole
+    if rest < 0.01 or rest > 0.99:
+        return str(round(value))
+    for fraction, text in _FRACTIONS:
+        if abs(rest - fraction) < 0.01:
+            return f"{whole} {text}" if whole else text
+    return format_amount(value)
+
+
+def format_quantity(value, unit):
+    return f"{format_amount(value)} {unit}".strip()
+
+
+def format_base(value, dimension, spoons_only=False):
+    """Format an aggregated base-unit amount in the most readable unit."""
+    if dimension == "mass":
+        return format_quantity(value / 1000, "kg") if value >= 1000 else format_quantity(value, "g")
+    if dimension == "volume":
+        if spoons_only:
+            return format_quantity(value / 15, "tbsp") if value >= 15 else format_quantity(value / 5, "tsp")
+        return format_quantity(value / 1000, "L") if value >= 1000 else format_quantity(value, "ml")
+    if dimension == "count":
+        return format_quantity(value, "unit" if value == 1 else "units")
+    return format_quantity(value, "")
+
+
+# -------------------- STRUCTURED QUANTITIES --------------------
+
+# Mixed numbers and fractions are one amount, like in _QUANTITY_RE.
+_NUMBER_RE = re.compile(
+    r"(?:(?P<whole>\d+)\s+(?=\d+\s*/\s*[1-9]))?(?P<num>\d+(?:[.,]\d+)?)(?:\s*/\s*(?P<den>[1-9]\d*))?"
+)
+
+
+class Quantity:
+    """A quantity string split once into its numbers and the text around them.
+
+    "2 slices (60 g)" -> amounts (2.0, 60.0), parts ("", " slices (", " g)").
+    "1 1/2 tbsp" -> amounts (1.5,), parts ("", " tbsp"), written back as a fraction.
+    Scaling only touches the amounts; the string is rebuilt by format().
+    """
+
+    __slots__ = ("parts", "amounts", "fractions")
+
+    def __init__(self, parts, amounts, fractions=None):
+        self.parts = parts
+        self.amounts = amounts
+        self.fractions = fractions or (False,) * len(amounts)
+
+    @classmethod
+    def parse(cls, text):
+        return _parse_cached(str(text))
+
+    def scaled(self, scale):
+        return Quantity(self.parts, tuple(a * scale for a in self.amounts), self.fractions)
+
+    def format(self, amounts=None):
+        amounts = self.amounts if amounts is None else amounts
+        out = [self.parts[0]]
+        for amount, fraction, part in zip(amounts, self.fractions, self.parts[1:]):
+            out.append(format_fraction(amount) if fraction else format_amount(amount))
+            out.append(part)
+        return "".join(out)
+
+    def __str__(self):
+        return self.format()
+
+    def __repr__(self):
+        return f"Quantity({self.format()!r})"
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_cached(text):
+    parts = []
+    amounts = []
+    fractions = []
+    last = 0
+    for match in _NUMBER_RE.finditer(text):
+        parts.append(text[last : match.start()])
+        value = float(match.group("num").replace(",", "."))
+        fraction = match.group("den") is not None
+        if fraction:
+            value /= float(match.group("den"))
+            if match.group("whole"):
+                value += float(match.group("whole"))
+        amounts.append(value)
+        fractions.append(fraction)
+        last = match.end()
+    parts.append(text[last:])
+    return Quantity(tuple(parts), tuple(amounts), tuple(fractions))
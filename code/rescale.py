@@ -0,0 +1,156 @@
+"""Vectorized portion rescaling of whole meal plans.
+
+A plan is compiled once into flat NumPy arrays (one entry per meal for the
+calories, one per number found in an ingredient quantity). Rescaling a week
+to a new calorie target, or many weeks to many targets, is then a handful of
+array operations; strings are only rebuilt when the scaled plan is rendered.
+"""
+import numpy as np
+
+from plan_model import MEAL_SLOTS, iter_days
+from quantity import Quantity
+
+
+class CompiledWeek:
+    """A meal_plan with its calories and ingredient amounts parsed into arrays."""
+
+    __slots__ = (
+        "days",
+        "meals",
+        "meal_day",
+        "calories",
+        "quantities",
+        "amounts",
+        "amount_meal",
+    )
+
+    def __init__(self, meal_plan):
+        self.days = []  # (day_name, original meals dict)
+        self.meals = []  # (day index, slot, meal dict)
+        self.quantities = []  # (meal index, ingredient name, Quantity)
+        meal_day = []
+        calories = []
+        amounts = []
+        amount_meal = []
+
+        for day_name, meals in iter_days(meal_plan):
+            if not isinstance(meals, dict):
+                continue
+            day_index = len(self.days)
+            self.days.append((day_name, meals))
+            for slot in MEAL_SLOTS:
+                meal = meals.get(slot)
+                if not isinstance(meal, dict):
+                    continue
+                meal_index = len(self.meals)
+                self.meals.append((day_index, slot, meal))
+                meal_day.append(day_index)
+                calories.append(_as_float(meal.get("calories")))
+                ingredients = meal.get("ingredients")
+                if not isinstance(ingredients, dict):
+                    continue
+                for name, qty in ingredients.items():
+                    quantity = Quantity.parse(qty)
+                    self.quantities.append((meal_index, name, quantity))
+                    amounts.extend(quantity.amounts)
+                    amount_meal.extend([meal_index] * len(quantity.amounts))
+
+        self.meal_day = np.asarray(meal_day, dtype=np.intp)
+        self.calories = np.asarray(calories, dtype=np.float64)
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        self.amount_meal = np.asarray(amount_meal, dtype=np.intp)
+
+    def day_totals(self):
+        return np.bincount(self.meal_day, weights=self.calories, minlength=len(self.days))
+
+
+class ScaledWeek:
+    """Scaled calories/amounts of a CompiledWeek; formatted lazily."""
+
+    __slots__ = ("week", "calories", "amounts")
+
+    def __init__(self, week, calories, amounts):
+        self.week = week
+        self.calories = calories
+        self.amounts = amounts
+
+    def to_meal_plan(self):
+        """Rebuild a {day_name: {slot: meal}} dict with scaled values."""
+        week = self.week
+        calories = np.rint(self.calories).astype(int).tolist()
+        amounts = self.amounts.tolist()
+
+        meals_out = []
+        for meal_index, (_, _, meal) in enumerate(week.meals):
+            scaled = dict(meal)
+            scaled["calories"] = calories[meal_index]
+            if isinstance(meal.get("ingredients"), dict):
+                scaled["ingredients"] = {}
+            meals_out.append(scaled)
+
+        offset = 0
+        for meal_index, name, quantity in week.quantities:
+            n = len(quantity.amounts)
+            meals_out[meal_index]["ingredients"][name] = quantity.format(amounts[offset : offset + n])
+            offset += n
+
+        meal_plan = {}
+        for day_name, meals in week.days:
+            meal_plan[day_name] = {k: v for k, v in meals.items() if k not in MEAL_SLOTS}
+        for meal_index, (day_index, slot, _) in enumerate(week.meals):
+            meal_plan[week.days[day_index][0]][slot] = meals_out[meal_index]
+        return meal_plan
+
+
+def rescale_weeks(weeks, targets):
+    """Scale every day of every CompiledWeek to its target kcal in one vectorized pass.
+
+    targets holds one daily calorie target per week. Days without calories
+    are left unscaled.
+    """
+    if not weeks:
+        return []
+
+    day_offsets = np.cumsum([0] + [len(w.days) for w in weeks])
+    meal_offsets = np.cumsum([0] + [len(w.meals) for w in weeks])
+    amount_offsets = np.cumsum([0] + [len(w.amounts) for w in weeks])
+
+    meal_day = np.concatenate(
+        [w.meal_day + day_offsets[i] for i, w in enumerate(weeks)]
+    )
+    calories = np.concatenate([w.calories for w in weeks])
+    amounts = np.concatenate([w.amounts for w in weeks])
+    amount_meal = np.concatenate(
+        [w.amount_meal + meal_offsets[i] for i, w in enumerate(weeks)]
+    )
+    day_target = np.repeat(
+        np.asarray(targets, dtype=np.float64), [len(w.days) for w in weeks]
+    )
+
+    totals = np.bincount(meal_day, weights=calories, minlength=int(day_offsets[-1]))
+    day_scale = np.divide(day_target, totals, out=np.ones_like(totals), where=totals > 0)
+    meal_scale = day_scale[meal_day]
+    scaled_calories = calories * meal_scale
+    scaled_amounts = amounts * meal_scale[amount_meal]
+
+    return [
+        ScaledWeek(
+            week,
+            scaled_calories[meal_offsets[i] : meal_offsets[i + 1]],
+            scaled_amounts[amount_offsets[i] : amount_offsets[i + 1]],
+        )
+        for i, week in enumerate(weeks)
+    ]
+
+
+def rescale_mealplan(meal_plan, target):
+    """Return a copy of meal_plan with every day scaled to target kcal."""
+    week = meal_plan if isinstance(meal_plan, CompiledWeek) else CompiledWeek(meal_plan)
+    return rescale_weeks([week], [target])[0].to_meal_plan()
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,272 @@
+"""Dietary restriction matching over plan ingredients.
+
+Free restriction text ("egg, peanuts") is tokenized once, each token is
+expanded through SYNONYMS to the ingredients derived from it (egg → egg
+white, mayonnaise…), and every term is compiled into a single Aho-Corasick
+automaton. A whole plan is then scanned in one pass over its ingredient
+names, which is cheap enough to run on every generated or cached plan.
+"""
+import bisect
+from collections import deque
+from functools import lru_cache
+
+from plan_model import iter_days
+from profiles import normalize_restrictions
+
+_EGG = ("egg", "egg white", "egg yolk", "mayonnaise", "mayo", "aioli", "meringue", "custard",
+        "hollandaise", "omelette", "frittata", "quiche", "brioche")
+_PEANUT = ("peanut", "groundnut", "satay", "arachis")
+_TREE_NUT = ("almond", "walnut", "cashew", "hazelnut", "pecan", "pistachio", "macadamia",
+             "brazil nut", "pine nut", "praline", "marzipan", "nutella", "nut")
+_MILK = ("milk", "cheese", "butter", "buttermilk", "cream", "yogurt", "yoghurt", "whey", "casein",
+         "ghee", "feta", "parmesan", "mozzarella", "ricotta", "cheddar", "mascarpone", "paneer",
+         "skyr", "quark", "kefir", "custard")
+_GLUTEN = ("wheat", "flour", "bread", "breadcrumb", "pasta", "spaghetti", "noodle", "couscous",
+           "bulgur", "barley", "rye", "spelt", "semolina", "seitan", "tortilla", "pita", "bagel",
+           "croissant", "cracker", "granola", "muesli", "soy sauce", "beer")
+_SOY = ("soy", "soya", "soy sauce", "tofu", "tempeh", "edamame", "miso", "tamari")
+_FISH = ("fish", "salmon", "tuna", "cod", "anchovy", "anchovies", "sardine", "trout", "mackerel",
+         "haddock", "halibut", "tilapia", "fish sauce", "worcestershire")
+_SHELLFISH = ("shellfish", "shrimp", "prawn", "crab", "lobster", "mussel", "clam", "oyster",
+              "scallop", "squid", "calamari")
+_SESAME = ("sesame", "tahini", "hummus", "halva")
+_PORK = ("pork", "bacon", "ham", "prosciutto", "pancetta", "chorizo", "salami", "lard",
+         "sausage", "gelatin")
+_BEEF = ("beef", "steak", "veal", "bresaola")
+_MEAT = _PORK + _BEEF + ("meat", "chicken", "turkey", "lamb", "duck", "venison")
+
+# Restriction token → ingredient terms it rules out.
+SYNONYMS = {
+    "egg": _EGG,
+    "peanut": _PEANUT,
+    "tree nut": _TREE_NUT,
+    "nut": _TREE_NUT + _PEANUT,
+    "milk": _MILK,
+    "dairy": _MILK,
+    "lactose": _MILK,
+    "cheese": ("cheese", "feta", "parmesan", "mozzarella", "ricotta", "cheddar", "mascarpone",
+               "paneer"),
+    "gluten": _GLUTEN,
+    "wheat": _GLUTEN,
+    "soy": _SOY,
+    "soya": _SOY,
+    "fish": _FISH,
+    "shellfish": _SHELLFISH,
+    "seafood": _FISH + _SHELLFISH,
+    "sesame": _SESAME,
+    "pork": _PORK,
+    "beef": _BEEF,
+    "meat": _MEAT,
+}
+
+# Names that contain a restricted term but are not derived from it, with the
+# terms they cancel: "peanut butter" has no butter, but it is still peanut.
+SAFE_TERMS = {
+    "peanut butter": ("butter",),
+    "almond butter": ("butter",),
+    "nut butter": ("butter",),
+    "cashew butter": ("butter",),
+    "cocoa butter": ("butter",),
+    "shea butter": ("butter",),
+    "coconut milk": ("milk",),
+    "almond milk": ("milk",),
+    "oat milk": ("milk",),
+    "soy milk": ("milk",),
+    "rice milk": ("milk",),
+    "coconut cream": ("cream",),
+    "coconut yogurt": ("yogurt",),
+    "rice noodle": ("noodle",),
+    "rice flour": ("flour",),
+    "almond flour": ("flour",),
+    "coconut flour": ("flour",),
+    "corn tortilla": ("tortilla",),
+    "gluten free": ("gluten",),
+    "gluten-free": ("gluten",),
+    "vegan cheese": ("cheese",),
+    "egg-free": ("egg",),
+    "egg free": ("egg",),
+    "dairy-free": ("dairy",),
+    "dairy free": ("dairy",),
+}
+
+_PLURAL_SUFFIXES = ("s", "es")
+
+
+class Matcher:
+    """Aho-Corasick automaton over lowercase terms, matching whole words (plurals allowed)."""
+
+    def __init__(self, terms):
+        # terms: {term: label}; a None label marks a safe term.
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for term, label in terms.items():
+            self._insert(term, label)
+        self._link()
+
+    def _insert(self, term, label):
+        state = 0
+        for ch in term:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + ((term, label),)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def finditer(self, text):
+        """Yield (start, end, term, label) for every whole-word match in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for term, label in out[state]:
+                start = i + 1 - len(term)
+                end = _word_end(text, i + 1)
+                if end is not None and (start == 0 or not text[start - 1].isalpha()):
+                    yield start, end, term, label
+
+
+def _word_end(text, end):
+    if end == len(text) or not text[end].isalpha():
+        return end
+    for suffix in _PLURAL_SUFFIXES:
+        stop = end + len(suffix)
+        if text.startswith(suffix, end) and (stop == len(text) or not text[stop].isalpha()):
+            return stop
+    return None
+
+
+class Violation:
+    __slots__ = ("day", "slot", "ingredient", "term", "restriction")
+
+    def __init__(self, day, slot, ingredient, term, restriction):
+        self.day = day
+        self.slot = slot
+        self.ingredient = ingredient
+        self.term = term
+        self.restriction = restriction
+
+    def __str__(self):
+        return f"{self.ingredient} ({self.restriction})"
+
+
+class RestrictionMatcher:
+    def __init__(self, tokens):
+        self.tokens = tuple(tokens)
+        terms = {term: None for term in SAFE_TERMS}
+        for token in self.tokens:
+            for term in SYNONYMS.get(token, (token,)):
+                terms[term] = token
+        self._matcher = Matcher(terms)
+
+    def _hits(self, text):
+        """Restricted matches in lowercase text, minus those a safe term around them cancels."""
+        hits = list(self._matcher.finditer(text))
+        safe = [(start, end, SAFE_TERMS[term]) for start, end, term, label in hits if label is None]
+        return [
+            (start, term, label)
+            for start, end, term, label in hits
+            if label is not None
+            and not any(s <= start and end <= e and term in cancels for s, e, cancels in safe)
+        ]
+
+    def matches(self, text):
+        """Return [(term, restriction)] found in text."""
+        return [(term, label) for _, term, label in self._hits(text.lower())]
+
+    def scan(self, segments):
+        """Scan (day, slot, text) segments in one pass; return a list of Violation,
+        at most one per segment and restriction."""
+        texts, keys, offsets = [], [], []
+        offset = 0
+        for key in segments:
+            text = key[2].lower()
+            offsets.append(offset)
+            keys.append(key)
+            texts.append(text)
+            offset += len(text) + 1
+        if not texts:
+            return []
+
+        violations = []
+        seen = set()
+        for start, term, label in self._hits("\n".join(texts)):
+            index = bisect.bisect_right(offsets, start) - 1
+            if (index, label) in seen:
+                continue
+            seen.add((index, label))
+            day, slot, text = keys[index]
+            violations.append(Violation(day, slot, text, term, label))
+        return violations
+
+
+@lru_cache(maxsize=256)
+def compile_restrictions(text):
+    """RestrictionMatcher for free restriction text, or None if there is nothing to match."""
+    tokens = normalize_restrictions(text)
+    return RestrictionMatcher(tokens) if tokens else None
+
+
+def _plan_segments(meal_plan):
+    for day_name, meals in iter_days(meal_plan):
+        if not isinstance(meals, dict):
+            continue
+        for slot, meal in meals.items():
+            if not isinstance(meal, dict):
+                continue
+            ingredients = meal.get("ingredients")
+            if isinstance(ingredients, dict):
+                names = ingredients.keys()
+            elif isinstance(ingredients, list):
+                names = [i.get("name") or i.get("item") or "" for i in ingredients if isinstance(i, dict)]
+            else:
+                names = ()
+            yield day_name, slot, str(meal.get("meal") or "")
+            for name in names:
+                yield day_name, slot, str(name)
+
+
+def _model_segments(days):
+    for day in days:
+        for meal in day.meals:
+            yield day.name, meal.slot, meal.name
+            for i in meal.ingredients or ():
+                yield day.name, meal.slot, i.name
+
+
+def scan_plan(meal_plan, restrictions):
+    """Violations of restriction text in a meal_plan (either shape)."""
+    matcher = compile_restrictions(restrictions)
+    return matcher.scan(_plan_segments(meal_plan)) if matcher else []
+
+
+def scan_days(days, restrictions):
+    """Violations of restriction text in plan_model.Day objects."""
+    matcher = compile_restrictions(restrictions)
+    return matcher.scan(_model_segments(days)) if matcher else []
+
+
+def violations_by_meal(violations):
+    """Group violations as {(day, slot): [Violation]}."""
+    grouped = {}
+    for v in violations:
+        grouped.setdefault((v.day, v.slot), []).append(v)
+    return grouped
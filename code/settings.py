@@ -0,0 +1,118 @@
+"""Runtime settings, read once from the environment at import time."""
+import os
+import tempfile
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# -------------------- PLAN CACHE --------------------
+
+PLAN_CACHE_SIZE = _env_int("CULINAIRE_PLAN_CACHE_SIZE", 512)
+PLAN_CACHE_TTL = _env_int("CULINAIRE_PLAN_CACHE_TTL", 24 * 3600)
+# Directory shared by all gunicorn workers; leave unset for memory-only caching.
+PLAN_CACHE_DIR = os.environ.get("CULINAIRE_PLAN_CACHE_DIR") or None
+PLAN_CACHE_DISK_SIZE = _env_int("CULINAIRE_PLAN_CACHE_DISK_SIZE", 5000)
+
+# Reuse a cached plan for another calorie target when the portion scale
+# factor stays within this range; otherwise generate a new plan.
+TEMPLATE_MIN_SCALE = _env_float("CULINAIRE_TEMPLATE_MIN_SCALE", 0.8)
+TEMPLATE_MAX_SCALE = _env_float("CULINAIRE_TEMPLATE_MAX_SCALE", 1.25)
+
+# Serve the plan of a similar profile (see similarity_cache.py) when it is
+# within this distance, can be rescaled and breaks none of the restrictions.
+SIMILAR_PLANS = _env_bool("CULINAIRE_SIMILAR_PLANS", True)
+SIMILAR_PLAN_MAX_DISTANCE = _env_float("CULINAIRE_SIMILAR_PLAN_MAX_DISTANCE", 0.5)
+SIMILAR_PLAN_INDEX_SIZE = _env_int("CULINAIRE_SIMILAR_PLAN_INDEX_SIZE", 4096)
+
+# -------------------- LLM CLIENT --------------------
+
+# Where completions come from: "openai", "replay" (answers recorded with
+# LLM_RECORD_PATH, replayed at LLM_REPLAY_SPEED x their latency, 0 for none) or
+# "synthetic" (sample recipes after a SYNTHETIC_LATENCY, see backends.py).
+LLM_BACKEND = os.environ.get("CULINAIRE_LLM_BACKEND", "openai")
+LLM_RECORD_PATH = os.environ.get("CULINAIRE_LLM_RECORD") or None
+LLM_REPLAY_PATH = os.environ.get("CULINAIRE_LLM_REPLAY") or None
+LLM_REPLAY_SPEED = _env_float("CULINAIRE_LLM_REPLAY_SPEED", 0.0)
+SYNTHETIC_LATENCY = os.environ.get("CULINAIRE_SYNTHETIC_LATENCY", "median=1.5,sigma=0.5")
+LLM_MODEL = os.environ.get("CULINAIRE_LLM_MODEL", "gpt-4o-mini")
+# Completions in flight per process, and pooled keep-alive connections.
+LLM_MAX_CONCURRENCY = _env_int("CULINAIRE_LLM_MAX_CONCURRENCY", 256)
+LLM_POOL_SIZE = _env_int("CULINAIRE_LLM_POOL_SIZE", 100)
+LLM_TIMEOUT = _env_float("CULINAIRE_LLM_TIMEOUT", 90.0)
+LLM_MAX_RETRIES = _env_int("CULINAIRE_LLM_MAX_RETRIES", 3)
+LLM_BACKOFF = _env_float("CULINAIRE_LLM_BACKOFF", 0.5)
+# Deadline (seconds, 0 for none) of each non-streamed completion: hedged after
+# the p90 latency of its kind, retried on LLM_FALLBACK_MODEL (if set) near the
+# deadline, then abandoned (see dispatch.py). Streamed plans (STREAM_PLANS) are
+# not dispatched; only PLAN_DEADLINE bounds them.
+LLM_DEADLINE = _env_float("CULINAIRE_LLM_DEADLINE", 45.0)
+LLM_FALLBACK_MODEL = os.environ.get("CULINAIRE_LLM_FALLBACK_MODEL") or None
+
+# -------------------- GENERATION --------------------
+
+# SQLite job database shared by the workers of a node.
+JOB_DB_PATH = os.environ.get(
+    "CULINAIRE_JOB_DB", os.path.join(tempfile.gettempdir(), "culinaire-jobs.sqlite3")
+)
+# Jobs without progress for this long are considered dead.
+JOB_STALE_AFTER = _env_int("CULINAIRE_JOB_STALE_AFTER", 600)
+# Lock files through which the workers of a node share in-flight model calls
+# (see singleflight.py); in the temp directory when unset.
+SINGLEFLIGHT_DIR = os.environ.get("CULINAIRE_SINGLEFLIGHT_DIR") or None
+
+# Stream completions and render each day as soon as it arrives.
+STREAM_PLANS = _env_bool("CULINAIRE_STREAMING", True)
+
+# "single": one completion for the whole week (streamed if STREAM_PLANS).
+# "fanout": one concurrent completion per day, grocery list and summary computed locally.
+PLAN_ENGINE = os.environ.get("CULINAIRE_PLAN_ENGINE", "single")
+FANOUT_CONCURRENCY = _env_int("CULINAIRE_FANOUT_CONCURRENCY", 7)
+# Deadline (seconds, 0 for none) of a whole generation; past it, the days not
+# received yet are taken from the recipe catalog when it covers the profile.
+PLAN_DEADLINE = _env_float("CULINAIRE_PLAN_DEADLINE", 120.0)
+# Compact wire format (compact.py): short keys and no recipes in the completion,
+# each meal's recipe requested when a user opens it. About half the completion tokens.
+COMPACT_PLANS = _env_bool("CULINAIRE_COMPACT_PLANS", False)
+
+# Recipe catalog used to assemble plans offline (JSON or JSON Lines, see
+# catalog.py); the bundled sample recipes when unset.
+CATALOG_PATH = os.environ.get("CULINAIRE_CATALOG") or None
+# Serve plans from the catalog when it can cover the profile, before any model call.
+CATALOG_PLANS = _env_bool("CULINAIRE_CATALOG_PLANS", True)
+# Times one catalog recipe may appear in an assembled week (never on consecutive days).
+CATALOG_MAX_USES = _env_int("CULINAIRE_CATALOG_MAX_USES", 2)
+
+# Compiled nutrition table (see nutrition_db.py); built from data/nutrition.csv
+# into the temp directory when unset.
+NUTRITION_DB = os.environ.get("CULINAIRE_NUTRITION_DB") or None
+# Recompute a meal's calories from its ingredients when the model's figure is
+# off by more than this fraction.
+VERIFY_CALORIES = _env_bool("CULINAIRE_VERIFY_CALORIES", True)
+CALORIE_TOLERANCE = _env_float("CULINAIRE_CALORIE_TOLERANCE", 0.25)
+
+# SQLite store of every plan served, behind the /plan/<id> permalinks.
+PLAN_STORE_PATH = os.environ.get(
+    "CULINAIRE_PLAN_STORE", os.path.join(tempfile.gettempdir(), "culinaire-plans.sqlite3")
+)
+# A stored plan this recent is served again for the same profile after it left the cache.
+PLAN_STORE_REUSE_AGE = _env_int("CULINAIRE_PLAN_STORE_REUSE_AGE", PLAN_CACHE_TTL)
+
+# Ask for a strict JSON-schema response instead of free-form JSON.
+STRUCTURED_OUTPUT = _env_bool("CULINAIRE_STRUCTURED_OUTPUT", False)
+# Invalid or missing days re-requested individually before failing the whole plan.
+REPAIR_MAX_DAYS = _env_int("CULINAIRE_REPAIR_MAX_DAYS", 3)
@@ -0,0 +1,130 @@
+"""Nearest-neighbour lookup of plans generated for similar profiles.
+
+Exact cache keys miss profiles that differ trivially: one more goal of the
+same kind, a few kilos, "peanut butter" vs "peanut". Each canonical profile is
+turned into a small feature vector (scaled sliders, activity level, goals as
+multi-hot, hashed character trigrams of the restriction and location text) and
+kept in a preallocated NumPy matrix; a lookup is one vectorized distance
+computation over the profiles of the same diet type. Hits are only
+candidates: the caller rescales them to its calorie target and checks them
+against its own restrictions before serving one.
+
+The index is per process and bounded: once full, the oldest profiles are
+overwritten.
+"""
+import threading
+import zlib
+
+import numpy as np
+
+from nutrition import ACTIVITY_LEVELS, GOALS
+
+RESTRICTION_DIMS = 128
+LOCATION_DIMS = 32
+_ACTIVITY = {a.lower(): i for i, a in enumerate(ACTIVITY_LEVELS)}
+_GOALS = {g.lower(): i for i, g in enumerate(GOALS)}
+
+# Feature scales, in distance units (the default max_distance is 0.5).
+WEIGHT_SCALE = 0.25 / 5  # per kg
+BUDGET_SCALE = 0.25 / 10  # per CHF
+ACTIVITY_SCALE = 0.35  # per activity level
+GOAL_SCALE = 0.35  # per goal added or removed
+RESTRICTION_SCALE = 0.6  # unit vector of the restriction text
+LOCATION_SCALE = 0.3  # unit vector of the location text
+
+_NUMERIC = 3  # weight, budget, activity
+_GOAL_START = _NUMERIC
+_RESTRICTION_START = _GOAL_START + len(GOALS)
+_LOCATION_START = _RESTRICTION_START + RESTRICTION_DIMS
+DIMS = _LOCATION_START + LOCATION_DIMS
+
+
+def _hashed_trigrams(texts, out, scale):
+    """Add the L2-normalized hashed character trigrams of texts into out."""
+    for text in texts:
+        padded = f" {text} "
+        for i in range(len(padded) - 2):
+            out[zlib.crc32(padded[i : i + 3].encode("utf-8")) % len(out)] += 1.0
+    norm = np.linalg.norm(out)
+    if norm:
+        out *= scale / norm
+
+
+def profile_vector(profile):
+    """Feature vector (float32, DIMS) of a canonical profile (profiles.canonical_profile)."""
+    v = np.zeros(DIMS, dtype=np.float32)
+    v[0] = (profile.get("body_weight") or 0) * WEIGHT_SCALE
+    v[1] = (profile.get("budget") or 0) * BUDGET_SCALE
+    v[2] = _ACTIVITY.get(profile.get("activity") or "", len(ACTIVITY_LEVELS) // 2) * ACTIVITY_SCALE
+    for goal in profile.get("goals") or ():
+        if goal in _GOALS:
+            v[_GOAL_START + _GOALS[goal]] = GOAL_SCALE
+    _hashed_trigrams(
+        profile.get("restrictions") or (),
+        v[_RESTRICTION_START:_LOCATION_START],
+        RESTRICTION_SCALE,
+    )
+    _hashed_trigrams(
+        [profile["location"]] if profile.get("location") else (),
+        v[_LOCATION_START:],
+        LOCATION_SCALE,
+    )
+    return v
+
+
+class SimilarityCache:
+    def __init__(self, capacity=4096, max_distance=0.5):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self._vectors = np.zeros((capacity, DIMS), dtype=np.float32)
+        self._norms = np.zeros(capacity, dtype=np.float32)  # squared, per row
+        self._diets = np.full(capacity, -1, dtype=np.int32)  # -1: empty slot
+        self._values = [None] * capacity
+        self._diet_codes = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "rejected": 0, "adds": 0}
+
+    # -------------------- PUBLIC API --------------------
+
+    def add(self, profile, value):
+        """Index value (e.g. {"id", "target"}) under a canonical profile."""
+        vector = profile_vector(profile)
+        with self._lock:
+            diet = self._diet_codes.setdefault(profile.get("diet_type"), len(self._diet_codes))
+            slot = self._next % self.capacity
+            self._vectors[slot] = vector
+            self._norms[slot] = vector @ vector
+            self._diets[slot] = diet
+            self._values[slot] = value
+            self._next += 1
+            self._counters["adds"] += 1
+
+    def candidates(self, profile, k=4):
+        """[(distance, value)] of up to k indexed profiles within max_distance, nearest first."""
+        vector = profile_vector(profile)
+        with self._lock:
+            diet = self._diet_codes.get(profile.get("diet_type"))
+            if diet is None:
+                return []
+            # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b: one matrix-vector product.
+            squared = self._norms + vector @ vector - 2.0 * (self._vectors @ vector)
+            squared[self._diets != diet] = np.inf
+            k = min(k, self.capacity)
+            nearest = np.argpartition(squared, k - 1)[:k]
+            nearest = nearest[np.argsort(squared[nearest])]
+            limit = self.max_distance**2
+            return [
+                (float(np.sqrt(max(squared[i], 0.0))), self._values[i])
+                for i in nearest
+                if squared[i] <= limit + 1e-6
+            ]
+
+    def record(self, outcome):
+        """Count a lookup outcome: "hits", "misses" or "rejected" (found, failed checks)."""
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "entries": min(self._next, self.capacity)}
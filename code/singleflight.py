@@ -0,0 +1,116 @@
+"""Single-flight execution: concurrent identical requests share one computation.
+
+Within a process, callers of do() with a key already being computed wait for
+that computation and get its result (or exception). Across the gunicorn
+workers of a node, the computation holds an flock on a lock file named after
+the key; a worker that finds it locked waits for the lock and then asks
+lookup() for the result the other worker published before computing it
+itself; lookup must read a store all workers share (the plan store, the disk
+plan cache), not the memory of its own process.
+
+Plan generations are deduplicated by the job queue (jobs.py); this covers the
+synchronous model calls made from callbacks and scripts.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: single-flight within the process only
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), "culinaire-singleflight")
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._calls = {}  # key -> _Call in flight in this process
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "shared": 0, "waited": 0}
+
+    def do(self, key, fn, lookup=None):
+        """Return fn(), computed once for all concurrent callers with this key.
+
+        lookup(), if given, is tried after waiting on another worker's
+        computation; a result other than None is returned instead of calling fn.
+        """
+        with self._lock:
+            self._counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._counters["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._run_exclusive(key, fn, lookup)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._calls))
+
+    # -------------------- INTERNALS --------------------
+
+    def _run_exclusive(self, key, fn, lookup):
+        if fcntl is None:
+            return fn()
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        path = os.path.join(self.lock_dir, f"{name}.lock")
+        f, waited = self._acquire(path)
+        try:
+            if waited:
+                with self._lock:
+                    self._counters["waited"] += 1
+                if lookup is not None:
+                    value = lookup()
+                    if value is not None:
+                        return value
+            return fn()
+        finally:
+            # Unlinked while still locked: late openers see another inode and retry.
+            os.unlink(path)
+            f.close()
+
+    @staticmethod
+    def _acquire(path):
+        """Open and flock path; return (file, whether another process held it)."""
+        waited = False
+        while True:
+            f = open(path, "ab")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                waited = True
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                    return f, waited
+            except FileNotFoundError:
+                pass
+            f.close()
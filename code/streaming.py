@@ -0,0 +1,146 @@
+"""Incremental consumption of streamed meal-plan completions.
+
+DayStreamParser is fed the completion text chunk by chunk and hands back each
+day of "meal_plan" as soon as that day's JSON object is closed, so the UI can
+render Monday while the model is still writing Tuesday. It understands both
+meal_plan shapes allowed by SYSTEM_PROMPT (dict keyed by day name, or list of
+{"day": ..., "meals": ...} objects) and ignores any text around the root
+object (e.g. markdown fences). plan_key names the days' container in the
+root object ("p" in the compact wire format).
+"""
+import json
+
+
+class DayStreamParser:
+    def __init__(self, plan_key="meal_plan"):
+        self.plan_key = plan_key
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._keys = {}  # depth -> most recent object key at that depth
+        self._root_start = None
+        self._root_end = None
+        self._plan_depth = None
+        self._plan_closed = False
+        self._day_start = None
+        self._day_key = None
+        self._day_count = 0
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def complete(self):
+        return self._root_end is not None
+
+    def feed(self, chunk):
+        """Consume a chunk of text; return the list of (day_name, meals) it completed."""
+        self._text += chunk
+        text = self._text
+        days = []
+
+        for pos in range(self._pos, len(text)):
+            ch = text[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1 : pos]
+                continue
+
+            if self._root_end is not None:
+                break
+
+            if not self._stack:
+                if ch == "{":
+                    self._root_start = pos
+                    self._stack.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch == ":":
+                self._keys[len(self._stack)] = self._last_string
+            elif ch in "{[":
+                self._open(ch, pos)
+            elif ch in "}]":
+                day = self._close(pos)
+                if day is not None:
+                    days.append(day)
+            elif ch == ",":
+                self._keys.pop(len(self._stack), None)
+
+        self._pos = len(text)
+        return days
+
+    def result(self):
+        """Parse the completed root object (raises json.JSONDecodeError if invalid)."""
+        if self._root_start is None:
+            return json.loads(self._text)
+        end = self._root_end if self._root_end is not None else len(self._text) - 1
+        return json.loads(self._text[self._root_start : end + 1])
+
+    # -------------------- INTERNALS --------------------
+
+    def _open(self, ch, pos):
+        depth = len(self._stack)
+        self._stack.append(ch)
+
+        if (
+            self._plan_depth is None
+            and depth == 1
+            and self._stack[0] == "{"
+            and self._keys.get(1) == self.plan_key
+        ):
+            self._plan_depth = 2
+        elif (
+            self._plan_depth is not None
+            and not self._plan_closed
+            and depth == self._plan_depth
+            and ch == "{"
+        ):
+            self._day_start = pos
+            container = self._stack[self._plan_depth - 1]
+            self._day_key = self._keys.get(self._plan_depth) if container == "{" else None
+
+    def _close(self, pos):
+        depth = len(self._stack)
+        self._stack.pop()
+        self._keys.pop(depth, None)
+
+        if not self._stack:
+            self._root_end = pos
+            return None
+
+        if self._plan_depth is not None and depth == self._plan_depth:
+            self._plan_closed = True
+        if self._plan_depth is None or self._day_start is None:
+            return None
+        if depth != self._plan_depth + 1:
+            return None
+
+        raw_day = self._text[self._day_start : pos + 1]
+        day_key = self._day_key
+        self._day_start = None
+        self._day_key = None
+        self._day_count += 1
+        try:
+            day_obj = json.loads(raw_day)
+        except ValueError:
+            return None
+        if not isinstance(day_obj, dict):
+            return None
+
+        day_name = day_key or day_obj.get("day", f"Day {self._day_count}")
+        return day_name, day_obj.get("meals", day_obj)
+
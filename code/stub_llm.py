@@ -0,0 +1,139 @@
+"""Local stand-in for the OpenAI chat completions API, with injected latency.
+
+Answers POST /v1/chat/completions (plain or streamed) with plans assembled
+from the sample catalog recipes, in whichever format the system prompt asks
+for (week, single day, compact, recipe steps). Each request first waits for a
+latency drawn from a log-normal distribution, with occasional hiccups (a much
+longer wait) and server errors, so deadlines, hedging and fallbacks can be
+exercised without a provider:
+
+    python stub_llm.py --port 8001 --median 2 --sigma 0.6 --hiccup-rate 0.05 --hiccup 40
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python app.py
+
+Latencies can be set per model (--model-median gpt-4o-mini=6), e.g. to make
+the fallback model faster than the primary one. The same answers and latency
+model are available in process, without HTTP, as CULINAIRE_LLM_BACKEND=synthetic
+(backends.SyntheticBackend).
+"""
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backends import STREAM_CHUNK_CHARS, LatencyModel, SyntheticBackend
+
+# Answers only; latency is injected by the handler, per model.
+answer = SyntheticBackend().answer
+
+
+# -------------------- SERVER --------------------
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = {}  # model -> LatencyModel, "*" for the others
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "stub")
+        delay, fail = self.latency.get(model, self.latency["*"]).draw()
+        time.sleep(delay)
+        if fail:
+            self._json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+            return
+
+        text = answer(body.get("messages") or [])
+        usage = {
+            "prompt_tokens": sum(len(m.get("content", "")) for m in body.get("messages") or []) // 4,
+            "completion_tokens": len(text) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if body.get("stream"):
+            self._stream(model, text, usage)
+        else:
+            self._json(
+                200,
+                {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                },
+            )
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model, text, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def send(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        for i in range(0, len(text), STREAM_CHUNK_CHARS):
+            delta = {"content": text[i : i + STREAM_CHUNK_CHARS]}
+            send(json.dumps({"id": chunk_id, "object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}))
+        send(json.dumps({"id": chunk_id, "object": "chat.completion.chunk", "model": model,
+                         "choices": [], "usage": usage}))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _model_values(pairs):
+    return {model: float(value) for model, value in (pair.split("=", 1) for pair in pairs or ())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--median", type=float, default=1.0, help="median latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-normal shape")
+    parser.add_argument("--hiccup-rate", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--hiccup", type=float, default=30.0, help="seconds a hiccup lasts")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP 500 answers")
+    parser.add_argument("--model-median", nargs="*", metavar="MODEL=SECONDS",
+                        help="median latency of specific models")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    def model(median):
+        return LatencyModel(median, args.sigma, args.hiccup_rate, args.hiccup, args.error_rate, args.seed)
+
+    Handler.latency = {"*": model(args.median)}
+    for name, median in _model_values(args.model_median).items():
+        Handler.latency[name] = model(median)
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"stub LLM on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 
 import streamlit as st
-import openai
-import json
-import os
-import re
+import sys
+from pathlib import Path
+
+# Share the plan-processing modules of the Dash app.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "code"))
+from streaming import DayStreamParser
+from grocery import build_grocery_list
+from quantity import Quantity
+from plan_model import Day, PlanModel
+import llm
 
 # ---------------------------- PAGE ----------------------------
 st.set_page_config(page_title="TRAILMIX", page_icon="🥗", layout="centered")
@@ -41,7 +47,8 @@ Include:
 - A 7-day meal plan with Breakfast, Lunch, and Dinner.
 - Each meal includes: name, ingredients (as dict), calories, and a short recipe (2–3 sentences).
 - Total calories per day should match the user's target within ±5%.
-- A grocery_list section that combines all ingredients by item name, summed quantities, and category.
+- Ingredient quantities as a number and a unit (g, kg, ml, L, tsp, tbsp, units).
+- Do NOT include a grocery list: it is computed from the ingredients.
 - A summary with total weekly calories and estimated cost.
 
 Example structure:
@@ -54,10 +61,6 @@ Example structure:
     },
     ...
   },
-  "grocery_list": [
-    {"item": "chicken breast", "quantity": "1.2 kg", "category": "protein"},
-    ...
-  ],
   "summary": {
     "average_daily_calories": 2400,
     "estimated_weekly_cost": "80 CHF",
@@ -66,17 +69,12 @@ Example structure:
 }
 """
 
-openai.api_key = 
-
 # ---------------------------- HELPERS ----------------------------
 def numeric_scale(qty: str, scale: float) -> str:
-    nums = re.findall(r"[0-9]+\.?[0-9]*", qty)
-    if not nums:
+    quantity = Quantity.parse(qty)
+    if not quantity.amounts:
         return qty
-    for num in nums:
-        new_val = round(float(num) * scale, 1)
-        qty = qty.replace(num, str(new_val), 1)
-    return qty
+    return quantity.scaled(scale).format()
 
 def rescale_day(day_dict, target):
     meals = ["breakfast","lunch","dinner"]
@@ -95,12 +93,24 @@ def rescale_day(day_dict, target):
                 ings[k] = numeric_scale(v, scale)
     return day_dict
 
-def normalize_mealplan(mp):
-    if isinstance(mp, list):
-        return [(d.get("day", f"Day {i+1}"), d.get("meals", d)) for i, d in enumerate(mp)]
-    if isinstance(mp, dict):
-        return [(k.replace("_", " ").title(), v) for k, v in mp.items()]
-    return []
+def render_day(day_name, day_dict, target):
+    if isinstance(day_dict, dict):
+        day_dict = rescale_day(day_dict, target)
+    day = Day.from_json(day_name, day_dict)
+    st.subheader(day.name)
+    if not day.valid:
+        st.warning("Invalid meals structure for this day.")
+        return
+    st.caption(f"Total: {round(day.total_calories)} kcal (Target: {target})")
+
+    for meal in day.meals:
+        st.markdown(f"**{meal.slot.capitalize()} – {meal.name}**")
+        for ing in meal.ingredients or ():
+            st.write(f"- {ing.name}: {ing.quantity}")
+        st.caption(f"~{'?' if meal.calories is None else meal.calories} kcal")
+        if meal.recipe:
+            st.markdown(f"🧑‍🍳 *Recipe:* {meal.recipe}")
+    st.markdown("---")
 
 # ---------------------------- MAIN ----------------------------
 if st.button("Generate My Weekly Plan 🧑‍🍳"):
@@ -118,67 +128,48 @@ if st.button("Generate My Weekly Plan 🧑‍🍳"):
         """
 
         try:
-            response = openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
+            # Model and backend (OpenAI, replay, synthetic) come from the
+            # CULINAIRE_* settings shared with the Dash app.
+            response = llm.stream(
+                [
                     {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=0.6,
+                label="plan",
             )
 
-            raw = response.choices[0].message.content.strip()
-            raw = re.sub(r"^```(?:json)?|```$", "", raw.strip(), flags=re.MULTILINE).strip()
-            plan = json.loads(raw)
-
             target = user_data["daily_calories"]
-            days = normalize_mealplan(plan.get("meal_plan"))
 
-            # ✅ Weekly plan
-            st.success("✅ Your personalized plan is ready!")
+            # ✅ Weekly plan, rendered day by day as the completion streams in
             st.header("Your Weekly Meal Plan 🍲")
-
-            for day_name, day_dict in days:
-                day_dict = rescale_day(day_dict, target)
-                total = sum(day_dict[m].get("calories", 0) for m in ["breakfast","lunch","dinner"] if m in day_dict)
-                st.subheader(day_name)
-                st.caption(f"Total: {round(total)} kcal (Target: {target})")
-
-                for m in ["breakfast","lunch","dinner"]:
-                    if m not in day_dict:
-                        continue
-                    meal = day_dict[m]
-                    name = meal.get("meal") or meal.get("name") or m
-                    st.markdown(f"**{m.capitalize()} – {name}**")
-
-                    ings = meal.get("ingredients", {})
-                    if isinstance(ings, dict):
-                        for ing_name, qty in ings.items():
-                            st.write(f"- {ing_name}: {qty}")
-                    elif isinstance(ings, list):
-                        for ing in ings:
-                            st.write(f"- {ing.get('item','?')}: {ing.get('quantity','?')}")
-                    st.caption(f"~{meal.get('calories','?')} kcal")
-                    if "recipe" in meal:
-                        st.markdown(f"🧑‍🍳 *Recipe:* {meal['recipe']}")
-                st.markdown("---")
+            progress = st.empty()
+            parser = DayStreamParser()
+            days_ready = 0
+            for chunk in response:
+                for day_name, day_dict in parser.feed(chunk):
+                    render_day(day_name, day_dict, target)
+                    days_ready += 1
+                    progress.caption(f"⏳ {days_ready}/7 days ready…")
+            progress.empty()
+
+            plan = parser.result()
+            plan["grocery_list"] = build_grocery_list(plan.get("meal_plan"))
+            model = PlanModel.from_dict(plan)
+            st.success("✅ Your personalized plan is ready!")
 
             # ✅ Grocery List
-            grocery = plan.get("grocery_list", [])
-            if grocery:
+            if model.grocery:
                 st.header("🛒 Grocery List")
-                for g in grocery:
-                    item = g.get("item", "?")
-                    qty = g.get("quantity", "?")
-                    cat = g.get("category", "?")
-                    st.write(f"- **{item}** ({cat}) — {qty}")
+                for g in model.grocery:
+                    st.write(f"- **{g.item}** ({g.category}) — {g.quantity}")
 
             # ✅ Summary
             st.header("📋 Summary")
-            summary = plan.get("summary", {})
-            st.write(f"**Average daily calories:** {summary.get('average_daily_calories', '?')} kcal")
-            st.write(f"**Estimated weekly cost:** {summary.get('estimated_weekly_cost', '?')}")
-            st.write(f"**Nutrition focus:** {summary.get('nutrition_focus', '?')}")
+            summary = model.summary
+            st.write(f"**Average daily calories:** {summary.average_daily_calories} kcal")
+            st.write(f"**Estimated weekly cost:** {summary.estimated_weekly_cost}")
+            st.write(f"**Nutrition focus:** {summary.nutrition_focus}")
 
         except Exception as e:
             st.error(f"⚠️ Error: {type(e).__name__} – {e}")
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from catalog import RecipeCatalog, _recipe_from_json, infer_diets
+from grocery import canonical_name
+from recipes import days as WEEK_DAYS
+
+
+def names(*ingredients):
+    return [canonical_name(i) for i in ingredients]
+
+
+def recipe(name, *ingredients, **extra):
+    return _recipe_from_json(
+        {"name": name, "calories": 500, "ingredients": [{"name": i} for i in ingredients], **extra}
+    )
+
+
+@pytest.fixture(scope="module")
+def small_catalog():
+    return RecipeCatalog(
+        [
+            recipe("Almond porridge", "Almonds", "Oats"),
+            recipe("Spiced rice", "Rice", "Nutmeg"),
+            recipe("Coconut curry", "Coconut milk", "Chickpeas"),
+            recipe("Cheese toast", "Cheddar", "Bread"),
+            recipe("Anchovy pasta", "Anchovies", "Spaghetti"),
+            recipe("Burger", "Bun", "Beef patty", allergens=["sesame"]),
+            recipe("Satay bowl", "Peanut butter", "Tofu"),
+        ]
+    )
+
+
+def excluded_names(catalog, restrictions):
+    return {catalog.recipes[i].recipe.name for i in catalog.excluded_by(restrictions)}
+
+
+@pytest.mark.parametrize(
+    "restrictions, excluded",
+    [
+        ("nut", {"Almond porridge", "Satay bowl"}),  # not nutmeg, not coconut
+        ("dairy", {"Cheese toast"}),  # coconut milk and peanut butter are no dairy
+        ("gluten", {"Cheese toast", "Anchovy pasta"}),
+        ("seafood", {"Anchovy pasta"}),
+        ("sesame", {"Burger"}),  # declared allergen
+        ("egg", set()),  # "eggplant" would not count either
+    ],
+)
+def test_restrictions_exclude_with_the_terms_of_restrictions_py(small_catalog, restrictions, excluded):
+    assert excluded_names(small_catalog, restrictions) == excluded
+
+
+def test_diets_are_whole_words():
+    # "ham" in "graham", "oat" in "goat", "cod" in "coconut"
+    diets = infer_diets(names("Graham crackers", "Coconut flakes"))
+    assert {"vegan", "vegetarian", "pescatarian"} <= diets
+    assert "keto" in infer_diets(names("Goat cheese", "Spinach"))
+    assert "vegetarian" not in infer_diets(names("Cod fillet"))
+    assert "vegan" in infer_diets(names("Peanut butter", "Coconut milk"))
+    assert "gluten free" not in infer_diets(names("Soy sauce"))
+
+
+def assert_full_week(week, target, max_uses=2):
+    assert week is not None and list(week) == WEEK_DAYS
+    meals = [[m["meal"] for m in week[d].values()] for d in WEEK_DAYS]
+    counts = {}
+    for day in meals:
+        assert len(set(day)) == len(day)
+        for meal in day:
+            counts[meal] = counts.get(meal, 0) + 1
+    assert max(counts.values()) <= max_uses
+    for today, tomorrow in zip(meals, meals[1:]):
+        assert not set(today) & set(tomorrow)
+    for day in week.values():
+        assert sum(m["calories"] for m in day.values()) == pytest.approx(target, rel=0.02)
+
+
+@pytest.fixture(scope="module")
+def larger_portions(tmp_path_factory):
+    """7 breakfasts and 7 mains, like the sample catalog, at everyday portion sizes."""
+    breakfasts = (470, 520, 560, 600, 640, 500, 580)
+    mains = (700, 760, 820, 880, 650, 900, 740)
+    recipes = [
+        {"name": f"Breakfast {i}", "calories": kcal, "slots": ["breakfast"],
+         "ingredients": [{"name": "Oats", "amount": 80, "amount_type": "g"}]}
+        for i, kcal in enumerate(breakfasts)
+    ] + [
+        {"name": f"Main {i}", "calories": kcal,
+         "ingredients": [{"name": "Lentils", "amount": 150, "amount_type": "g"}]}
+        for i, kcal in enumerate(mains)
+    ]
+    path = tmp_path_factory.mktemp("catalog") / "recipes.json"
+    path.write_text(json.dumps(recipes))
+    return RecipeCatalog.load(str(path))
+
+
+def test_sample_catalog_needs_reuse_for_a_week():
+    assert RecipeCatalog.load().plan_week(1200, "Omnivore", max_uses=1) is None
+
+
+@pytest.mark.parametrize("target", [1200, 1400, 1500, 1600])
+def test_sample_catalog_covers_a_week_with_bounded_reuse(target):
+    # Sunday needs the pairings a day-by-day greedy choice has used up by then.
+    assert_full_week(RecipeCatalog.load().plan_week(target, "Omnivore", max_uses=2), target)
+
+
+@pytest.mark.parametrize("target", [1800, 2000, 2200, 2400])
+def test_realistic_targets_get_a_full_week(larger_portions, target):
+    assert_full_week(larger_portions.plan_week(target, "Omnivore", max_uses=2), target)
+
+
+def test_catalog_out_of_reach_is_skipped():
+    catalog = RecipeCatalog.load()
+    assert catalog.plan_week(3500, "Omnivore", max_uses=7) is None
+
+
+def test_received_days_are_kept():
+    catalog = RecipeCatalog.load()
+    monday = {slot: {"meal": f"Model {slot}", "calories": 400, "ingredients": {}} for slot in
+              ("breakfast", "lunch", "dinner")}
+    week = catalog.plan_week(1200, "Omnivore", max_uses=2, days={"Monday": monday})
+    assert week["Monday"] is monday
+    assert all(week[d] for d in WEEK_DAYS)
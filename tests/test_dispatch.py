@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import dispatch
+from backends import SyntheticBackend
+
+MESSAGES = [{"role": "system", "content": "Write the preparation steps."}]
+HANG = 60.0
+
+
+class ScriptedLatency:
+    """LatencyModel stand-in: the n-th request waits the n-th scripted time
+    (a failing one is given as (seconds, True))."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+
+    def draw(self):
+        step = self.script.pop(0)
+        return step if isinstance(step, tuple) else (step, False)
+
+
+class Attempts:
+    """request(model) for dispatch, against a SyntheticBackend per model."""
+
+    def __init__(self, **backends):
+        self.backends = backends
+        self.started = []  # (model, seconds after the first attempt)
+        self.cancelled = []
+        self.loop_started = None
+
+    async def request(self, model):
+        loop = asyncio.get_running_loop()
+        if self.loop_started is None:
+            self.loop_started = loop.time()
+        self.started.append((model, loop.time() - self.loop_started))
+        try:
+            text, _ = await self.backends[model].complete(MESSAGES, model, 0.5, 30)
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+        return model, text
+
+
+@pytest.fixture(autouse=True)
+def fresh_latency(monkeypatch):
+    monkeypatch.setattr(dispatch, "latency", dispatch.LatencyTracker())
+
+
+def run(attempts, deadline, fallback_model=None, label="test"):
+    async def main():
+        try:
+            return await dispatch.dispatch(attempts.request, label, deadline, "main", fallback_model)
+        finally:
+            # Let the cancelled losers run their handlers.
+            await asyncio.sleep(0)
+
+    return asyncio.run(main())
+
+
+def test_hedge_fires_after_p90_and_cancels_the_primary():
+    for _ in range(dispatch.MIN_SAMPLES):
+        dispatch.latency.record("test", 0.05)
+    attempts = Attempts(main=SyntheticBackend(ScriptedLatency(HANG, 0.0)))
+
+    model, text = run(attempts, deadline=5.0)
+
+    assert model == "main" and text
+    _, hedge_at = attempts.started[1]
+    assert 0.05 <= hedge_at < 0.5  # the p90, well before MAX_HEDGE_AT x deadline
+    assert attempts.cancelled == ["main"]
+
+
+def test_hedge_waits_for_max_hedge_at_without_samples():
+    attempts = Attempts(main=SyntheticBackend(ScriptedLatency(HANG, 0.0)))
+
+    run(attempts, deadline=0.4)
+
+    assert attempts.started[1][1] >= 0.4 * dispatch.MAX_HEDGE_AT
+
+
+def test_fallback_model_near_the_deadline():
+    attempts = Attempts(
+        main=SyntheticBackend(ScriptedLatency(HANG, HANG)),
+        small=SyntheticBackend(ScriptedLatency(0.0)),
+    )
+
+    model, _ = run(attempts, deadline=0.4, fallback_model="small")
+
+    assert model == "small"
+    assert [m for m, _ in attempts.started] == ["main", "main", "small"]
+    assert attempts.started[2][1] >= 0.4 * dispatch.FALLBACK_AT
+    assert sorted(attempts.cancelled) == ["main", "main"]
+    assert dispatch.stats()["latency"]["test"]["samples"] == 1
+
+
+def test_deadline_exceeded_cancels_every_attempt():
+    attempts = Attempts(
+        main=SyntheticBackend(ScriptedLatency(HANG, HANG)),
+        small=SyntheticBackend(ScriptedLatency(HANG)),
+    )
+
+    with pytest.raises(dispatch.DeadlineExceeded):
+        run(attempts, deadline=0.3, fallback_model="small")
+
+    assert sorted(attempts.cancelled) == ["main", "main", "small"]
+
+
+def test_failed_attempt_starts_the_next_one_at_once():
+    attempts = Attempts(main=SyntheticBackend(ScriptedLatency((0.0, True), 0.0)))
+
+    model, text = run(attempts, deadline=5.0)
+
+    assert model == "main" and text
+    assert attempts.started[1][1] < 0.5  # not MAX_HEDGE_AT x deadline (2.5 s)
+
+
+def test_last_error_is_raised_when_every_attempt_failed():
+    attempts = Attempts(main=SyntheticBackend(ScriptedLatency((0.0, True), (0.0, True))))
+
+    with pytest.raises(Exception, match="injected failure"):
+        run(attempts, deadline=5.0)
@@ -0,0 +1,65 @@
+import pytest
+
+import llm
+from backends import SyntheticBackend
+from fanout import FanoutError, generate_week
+from recipes import days as WEEK_DAYS
+
+PROFILE = dict(
+    body_weight=70,
+    activity="Moderately active",
+    goals=[],
+    budget=100,
+    restrictions="",
+    diet_type="Omnivore",
+    location="Zurich",
+)
+
+
+class MalformedDays(SyntheticBackend):
+    """Synthetic days, except that the first `failures` requests for `day` get
+    a truncated JSON answer."""
+
+    def __init__(self, day, failures):
+        super().__init__()
+        self.day = day
+        self.failures = failures
+
+    async def complete(self, messages, model, temperature, timeout, **kwargs):
+        text, usage = await super().complete(messages, model, temperature, timeout, **kwargs)
+        if f" {self.day} " in messages[-1]["content"] and self.failures:
+            self.failures -= 1
+            return text[: len(text) // 2], usage
+        return text, usage
+
+
+@pytest.fixture
+def backend_for():
+    previous = []
+
+    def install(backend):
+        previous.append(llm.set_backend(backend))
+        return backend
+
+    yield install
+    for backend in previous:
+        llm.set_backend(backend)
+
+
+def test_a_malformed_day_is_requested_again(backend_for):
+    backend_for(MalformedDays("Tuesday", failures=1))
+    arrived = []
+
+    week = llm.run(
+        generate_week(PROFILE, 2000, on_day=lambda day, meals: arrived.append(day))
+    )
+
+    assert list(week) == WEEK_DAYS
+    assert sorted(arrived) == sorted(WEEK_DAYS)
+
+
+def test_a_day_failing_twice_fails_the_week(backend_for):
+    backend_for(MalformedDays("Tuesday", failures=2))
+
+    with pytest.raises(FanoutError, match="Tuesday"):
+        llm.run(generate_week(PROFILE, 2000))
@@ -0,0 +1,30 @@
+import pytest
+
+from grocery import build_grocery_list, categorize
+
+
+@pytest.mark.parametrize(
+    "name, category",
+    [
+        ("Eggplant", "Vegetables"),
+        ("Watermelon", "Fruit"),
+        ("Eggs", "Protein"),
+        ("Blueberries", "Fruit"),
+        ("Rolled oats", "Grains"),
+        ("Black beans", "Protein"),
+        ("Peas", "Vegetables"),
+        ("Green tea", "Beverages"),
+        ("Teriyaki sauce", "Other"),
+    ],
+)
+def test_categorize_whole_words(name, category):
+    assert categorize(name) == category
+
+
+def test_build_grocery_list_sums_units():
+    plan = {
+        "Monday": {"lunch": {"meal": "A", "ingredients": {"Rice": "500 g"}, "calories": 500}},
+        "Tuesday": {"lunch": {"meal": "B", "ingredients": {"rice": "1 kg"}, "calories": 500}},
+    }
+    [item] = build_grocery_list(plan)
+    assert item["quantity"] == "1.5 kg" and item["category"] == "Grains"
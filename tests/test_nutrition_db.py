@@ -0,0 +1,50 @@
+import pytest
+
+from nutrition_db import open_default, verify_calories
+
+
+@pytest.fixture(scope="module")
+def db():
+    return open_default()
+
+
+@pytest.mark.parametrize("name", ["Chicken stock", "Butter beans", "Egg noodles"])
+def test_no_match_on_a_modifier_word(db, name):
+    row, exact = db.match(name)
+    assert not exact
+    assert row is None or db.name(row) not in ("chicken", "butter", "egg")
+
+
+def test_head_noun_fallback(db):
+    row, exact = db.match("smoked salmon")
+    assert db.name(row) == "salmon" and not exact
+
+
+def test_approximate_match_keeps_stated_calories(db):
+    plan = {
+        "Monday": {
+            "dinner": {
+                "meal": "Noodle soup",
+                "ingredients": {"Chicken stock": "500 ml", "Egg noodles": "100 g"},
+                "calories": 450,
+            }
+        }
+    }
+    checked, corrected = verify_calories(plan, db)
+    assert corrected == []
+    assert checked["Monday"]["dinner"]["calories"] == 450
+
+
+def test_exact_matches_correct_stated_calories(db):
+    plan = {
+        "Monday": {
+            "breakfast": {
+                "meal": "Oats",
+                "ingredients": {"Rolled oats": "100 g"},
+                "calories": 50,
+            }
+        }
+    }
+    checked, corrected = verify_calories(plan, db)
+    assert corrected == ["Monday"]
+    assert checked["Monday"]["breakfast"]["calories"] > 300
@@ -0,0 +1,59 @@
+import pytest
+
+import llm
+import plan_schema
+from backends import SyntheticBackend
+from recipes import days as WEEK_DAYS
+
+ENGINE_ARGS = (70, "Moderately active", [], 100, 2000, "", "Omnivore", "Zurich")
+
+
+class RecordingBackend(SyntheticBackend):
+    """Synthetic answers, keeping the extra arguments of every request."""
+
+    def __init__(self, prefix=""):
+        super().__init__()
+        self.prefix = prefix
+        self.requests = []
+
+    async def complete(self, messages, model, temperature, timeout, **kwargs):
+        self.requests.append(kwargs)
+        text, usage = await super().complete(messages, model, temperature, timeout, **kwargs)
+        return self.prefix + text, usage
+
+
+@pytest.fixture
+def backend(request):
+    recording = RecordingBackend(getattr(request, "param", ""))
+    previous = llm.set_backend(recording)
+    yield recording
+    llm.set_backend(previous)
+
+
+def week():
+    return SyntheticBackend().answer([{"role": "system", "content": ""}])
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_repair_follows_structured_output(backend, monkeypatch, structured):
+    monkeypatch.setattr(plan_schema.settings, "STRUCTURED_OUTPUT", structured)
+    plan, _ = plan_schema.validate_plan(plan_schema.loads(week()))
+
+    repaired = llm.run(plan_schema.repair_days(plan, ["Tuesday"], ENGINE_ARGS))
+
+    assert list(repaired["meal_plan"]) == WEEK_DAYS
+    (kwargs,) = backend.requests
+    if structured:
+        assert kwargs["response_format"] is plan_schema.DAY_RESPONSE_FORMAT
+    else:
+        assert "response_format" not in kwargs
+
+
+@pytest.mark.parametrize("backend", ["Here is Tuesday:\n"], indirect=True)
+def test_unstructured_repair_tolerates_text_around_the_day(backend, monkeypatch):
+    monkeypatch.setattr(plan_schema.settings, "STRUCTURED_OUTPUT", False)
+    plan, _ = plan_schema.validate_plan(plan_schema.loads(week()))
+
+    repaired = llm.run(plan_schema.repair_days(plan, ["Tuesday"], ENGINE_ARGS))
+
+    assert repaired["meal_plan"]["Tuesday"]
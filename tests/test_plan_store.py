@@ -0,0 +1,29 @@
+from plan_store import PlanStore
+
+PLAN = {
+    "meal_plan": {"Monday": {"breakfast": {"meal": "Oats", "ingredients": {"Oats": "80 g"}, "calories": 400}}},
+    "summary": {"estimated_weekly_cost": "CHF 80"},
+}
+
+
+def test_same_plan_gets_same_id_and_round_trips(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"))
+    plan_id = store.save(PLAN, "profile-a", 2000)
+    assert store.save(PLAN) == plan_id
+    assert store.get(plan_id)["plan"] == PLAN
+
+
+def test_existing_plan_is_indexed_under_a_new_profile(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"))
+    plan_id = store.save(PLAN, "profile-a", 2000)
+    assert store.save(PLAN, "profile-b", 2400) == plan_id
+    assert store.latest("profile-a")["target"] == 2000
+    latest = store.latest("profile-b")
+    assert latest["id"] == plan_id and latest["target"] == 2400 and latest["plan"] == PLAN
+
+
+def test_texts(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"))
+    assert store.get_text("recipe:x") is None
+    store.put_text("recipe:x", "Boil the oats.")
+    assert store.get_text("recipe:x") == "Boil the oats."
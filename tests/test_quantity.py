@@ -0,0 +1,39 @@
+import pytest
+
+from helpers import numeric_scale
+from quantity import Quantity
+from rescale import rescale_mealplan
+
+
+@pytest.mark.parametrize(
+    "text, scale, expected",
+    [
+        ("1/2 cup", 2, "1 cup"),
+        ("1 1/2 tbsp", 2, "3 tbsp"),
+        ("1/2 cup", 3, "1 1/2 cup"),
+        ("1/3 cup", 2, "2/3 cup"),
+        ("3/4 cup", 1, "3/4 cup"),
+        ("2 slices (60 g)", 1.5, "3 slices (90 g)"),
+        ("150 g", 0.5, "75 g"),
+        ("1/0 x", 2, "2/0 x"),
+    ],
+)
+def test_scaling(text, scale, expected):
+    assert Quantity.parse(text).scaled(scale).format() == expected
+
+
+def test_mixed_number_is_one_amount():
+    assert Quantity.parse("1 1/2 tbsp").amounts == (1.5,)
+
+
+def test_numeric_scale_and_week_rescale_agree():
+    plan = {
+        "Monday": {
+            "breakfast": {"meal": "Oats", "ingredients": {"Milk": "1/2 cup"}, "calories": 500},
+            "lunch": {"meal": "Soup", "ingredients": {"Oil": "1 1/2 tbsp"}, "calories": 500},
+            "dinner": {"meal": "Rice", "ingredients": {"Rice": "100 g"}, "calories": 500},
+        }
+    }
+    scaled = rescale_mealplan(plan, 3000)["Monday"]
+    assert scaled["breakfast"]["ingredients"]["Milk"] == numeric_scale("1/2 cup", 2) == "1 cup"
+    assert scaled["lunch"]["ingredients"]["Oil"] == "3 tbsp"
@@ -0,0 +1,54 @@
+import pytest
+
+from restrictions import compile_restrictions, scan_plan
+
+
+def matched(restrictions, text):
+    return [label for _, label in compile_restrictions(restrictions).matches(text)]
+
+
+@pytest.mark.parametrize(
+    "restrictions, text",
+    [
+        ("peanut", "Peanut butter"),
+        ("tree nut", "Almond milk"),
+        ("tree nut", "almond flour"),
+        ("tree nut", "Almond butter"),
+        ("soy", "Soy milk"),
+        ("nut", "Cashew butter"),
+        ("gluten", "Rice noodles with soy sauce"),
+    ],
+)
+def test_allergen_inside_safe_term_is_flagged(restrictions, text):
+    assert matched(restrictions, text)
+
+
+@pytest.mark.parametrize(
+    "restrictions, text",
+    [
+        ("dairy", "Peanut butter"),
+        ("milk", "Almond milk"),
+        ("lactose", "Coconut milk"),
+        ("gluten", "almond flour"),
+        ("gluten", "Rice noodles"),
+        ("gluten", "Corn tortillas"),
+        ("nut", "Coconut flakes"),
+        ("nut", "Nutmeg"),
+    ],
+)
+def test_safe_term_cancels_only_its_own_term(restrictions, text):
+    assert matched(restrictions, text) == []
+
+
+def test_dairy_still_flagged_next_to_safe_term():
+    assert matched("dairy", "Peanut butter and butter") == ["dairy"]
+
+
+def test_scan_plan_reports_peanut_butter_for_peanut_allergy():
+    plan = {
+        "Monday": {
+            "breakfast": {"meal": "Toast", "ingredients": {"Peanut butter": "2 tbsp", "Bread": "2 slices"}},
+        }
+    }
+    violations = scan_plan(plan, "peanut")
+    assert [(v.day, v.slot, v.restriction) for v in violations] == [("Monday", "breakfast", "peanut")]